@@ -1,6 +1,11 @@
 """
 Scapes PDB database for proteus 300 data set.
 
+Entries already downloaded are skipped, -f fetches them again if they changed
+on the server.
+
+Usage: scrape.py [-f] [-j jobs] [-r requests per second] [-u base url]
+
 @see http://www.irisa.fr/symbiose/old/softwares/resources/p_300_set
 @see http://astral.berkeley.edu/pdbstyle-1.75.html
 @see ./README.txt
@@ -9,15 +14,36 @@ Scapes PDB database for proteus 300 data set.
 @copyright 2011 (c) Aaron Zampaglione
 @license MIT
 """
+from compbio.util.fetch import FAILED, Fetcher
+
+import getopt
 import os
 import re
 import sys
-import time
-import urllib
 
 BASE_URL = 'http://astral.berkeley.edu/pdbstyle.cgi?id='
 EXT = 'ent'
 
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':fj:r:u:')
+
+# Optional refresh of entries on disk, concurrent downloads, requests per
+#  second and mirror of the astral server.
+refresh = False
+jobs = 4
+rate = 2.0
+for opt, value in opts:
+    if opt == '-f':
+        refresh = True
+    elif opt == '-j':
+        jobs = int(value)
+    elif opt == '-r':
+        rate = float(value)
+    elif opt == '-u':
+        BASE_URL = value
+
+entries = []
+
 readme = open('README.txt', 'r')
 line = readme.readline()
 for match in re.finditer(r"<td>(?P<domains>.*?)(\s<br />)?</td>.*?<td>(?P<fold>.*?)(\s<br />)?</td>.*?<td>(?P<family>.*?)(\s<br />)?</td>", line, re.I | re.S):
@@ -30,15 +56,21 @@ for match in re.finditer(r"<td>(?P<domains>.*?)(\s<br />)?</td>.*?<td>(?P<fold>.
     
     # Create the fold directory.
     if not os.path.exists(EXT + '/' + fold):
-        os.mkdir(EXT + '/' + fold)
+        os.makedirs(EXT + '/' + fold)
     
      # Clean the domains.
     domains = match.group('domains').lower().strip().split(', ')
     for domain in domains:
-        result = urllib.urlopen(BASE_URL + domain)
-        ent = open(EXT + '/' + fold + '/' + domain + '.' + EXT, 'w')
-        ent.write(result.read())
-        ent.close()
-        time.sleep(2)
+        entries.append((BASE_URL + domain, EXT + '/' + fold + '/' + domain + '.' + EXT))
+
+readme.close()
+
+results = Fetcher(jobs, rate).fetch(entries, refresh)
+for url, path, result, error in results:
+    if result == FAILED:
+        print('Failed ' + url + ': ' + error)
 
-readme.close()
\ No newline at end of file
+counts = {}
+for _, _, result, _ in results:
+    counts[result] = counts.get(result, 0) + 1
+print(', '.join('{0} {1}'.format(counts[result], result) for result in sorted(counts)))
@@ -1,6 +1,11 @@
 """
 Scapes PDB database for skolnick data set.
 
+Entries already downloaded are skipped, -f fetches them again if they changed
+on the server.
+
+Usage: scrape.py [-f] [-j jobs] [-r requests per second] [-u base url]
+
 @see http://astral.berkeley.edu/pdbstyle-1.75.html
 @see ./README.txt
 
@@ -8,14 +13,33 @@ Scapes PDB database for skolnick data set.
 @copyright 2011 (c) Aaron Zampaglione
 @license MIT
 """
+from compbio.util.fetch import FAILED, Fetcher
+
+import getopt
 import os
 import sys
-import time
-import urllib
 
 BASE_URL = 'http://astral.berkeley.edu/pdbstyle.cgi?id='
 EXT = 'ent'
 
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':fj:r:u:')
+
+# Optional refresh of entries on disk, concurrent downloads, requests per
+#  second and mirror of the astral server.
+refresh = False
+jobs = 4
+rate = 2.0
+for opt, value in opts:
+    if opt == '-f':
+        refresh = True
+    elif opt == '-j':
+        jobs = int(value)
+    elif opt == '-r':
+        rate = float(value)
+    elif opt == '-u':
+        BASE_URL = value
+
 # Skolnick dictionary.
 skolnick = {}
 
@@ -29,7 +53,7 @@ for line in readme:
     if line == "\n":
         continue
     
-    line = line[:-1].split(" ")
+    line = line.split()
     
     # Line contains the fold name.
     if len(line) == 1:
@@ -41,16 +65,22 @@ for line in readme:
     skolnick[last_fold].append(line[1])
 readme.close()
 
-# Create directories.
+# Create directories, entries already downloaded are kept.
 for fold in skolnick.keys():
-    if os.path.exists(EXT + '/' + fold):
-        os.removedirs(EXT + '/' + fold)
-    os.mkdir(EXT + '/' + fold)
+    if not os.path.exists(EXT + '/' + fold):
+        os.makedirs(EXT + '/' + fold)
 
+entries = []
 for fold, proteins in skolnick.items():
     for protein in proteins:
-        result = urllib.urlopen(BASE_URL + protein)
-        ent = open(EXT + '/' + fold + '/' + protein + '.' + EXT, 'w')
-        ent.write(result.read())
-        ent.close()
-        time.sleep(2)
\ No newline at end of file
+        entries.append((BASE_URL + protein, EXT + '/' + fold + '/' + protein + '.' + EXT))
+
+results = Fetcher(jobs, rate).fetch(entries, refresh)
+for url, path, result, error in results:
+    if result == FAILED:
+        print('Failed ' + url + ': ' + error)
+
+counts = {}
+for _, _, result, _ in results:
+    counts[result] = counts.get(result, 0) + 1
+print(', '.join('{0} {1}'.format(counts[result], result) for result in sorted(counts)))
@@ -0,0 +1,211 @@
+"""
+All-vs-all comparison of proteins with the EIGAs algorithm.
+
+Each protein is fingerprinted once by the caller. Every ordered pair
+(including each protein against itself) is compared, since a comparison of
+two proteins doesn't have to give the result of the reverse one. Pairs can be
+spread over a pool of processes, and results are always returned in the same
+(row-major) order. An optional
+prefilter skips the pairs that can't reach its threshold, their result is
+None. With a journal, finished pairs are recorded as they come back and the
+ones finished by an earlier run are not compared again.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import EIGAs
+from .exception import EIGAsException
+from .protein.core import Protein
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def local_compare(protein1, protein2):
+    """
+    Returns the length and value of the best local alignment.
+    
+    Key arguments:
+    protein1 -- the first protein.
+    protein2 -- the second protein.
+    """
+    _, seqs = EIGAs.local_align(protein1, protein2, k=1)
+    
+    if not seqs:
+        return 0, 0
+    
+    return len(seqs[0][1]), seqs[0][0].value
+
+def global_compare(protein1, protein2):
+    """
+    Returns the number of aligned residues and the length of the global
+    alignment.
+    
+    Key arguments:
+    protein1 -- the first protein.
+    protein2 -- the second protein.
+    """
+    return EIGAs.global_counts(protein1, protein2)
+
+class AllVsAll(object):
+    
+    # Pairs queued per process.
+    QUEUE = 4
+    
+    def __init__(self, proteins, compare=local_compare, jobs=1, prefilter=None):
+        """
+        Init.
+        
+        Key arguments:
+        proteins  -- the fingerprinted proteins.
+        compare   -- module level function comparing two proteins. [optional]
+        jobs      -- number of processes. [optional]
+        prefilter -- prefilter matching the comparison. [optional]
+        """
+        # Workers only need the fingerprints.
+        self.proteins = [Protein.restore(protein.name, None, None, protein.fingerprint) for protein in proteins]
+        self.compare = compare
+        self.jobs = jobs
+        self.prefilter = prefilter
+    
+    def pairs(self):
+        """
+        Returns every ordered pair, in row-major order.
+        """
+        l = len(self.proteins)
+        
+        return [(i, j) for i in range(l) for j in range(l)]
+    
+    def run(self, pairs=None, journal=None):
+        """
+        Compares the pairs, yielding (i, j, result) in the order of the pairs.
+        
+        Key arguments:
+        pairs   -- the pairs to compare, all of them by default. [optional]
+        journal -- journal of the finished pairs. [optional]
+        """
+        if pairs is None:
+            pairs = self.pairs()
+        
+        if journal is None:
+            return self._run(pairs)
+        
+        return self._resume(pairs, journal)
+    
+    def _resume(self, pairs, journal):
+        """
+        Yields the results of the pairs, finished ones from the journal,
+        recording the others as they come back.
+        
+        Key arguments:
+        pairs   -- the pairs to compare.
+        journal -- journal of the finished pairs.
+        """
+        done = journal.results()
+        
+        results = self._run([pair for pair in pairs if pair not in done])
+        for i, j in pairs:
+            if (i, j) in done:
+                yield i, j, done[(i, j)]
+            else:
+                _, _, result = next(results)
+                journal.append(i, j, result)
+                yield i, j, result
+    
+    def _run(self, pairs):
+        """
+        Compares the pairs, yielding (i, j, result) in the order of the pairs.
+        
+        Key arguments:
+        pairs -- the pairs to compare.
+        """
+        proteins = self.proteins
+        compare = self.compare
+        prefilter = self.prefilter
+        
+        if self.jobs <= 1:
+            for i, j in pairs:
+                if prefilter is not None and prefilter.prune(proteins[i], proteins[j]):
+                    yield i, j, None
+                else:
+                    yield i, j, compare(proteins[i], proteins[j])
+            return
+        
+        # Keep a bounded number of pairs in flight, and hand the results back
+        #  in order as soon as the oldest one is done.
+        executor = ProcessPoolExecutor(max_workers=self.jobs)
+        pending = deque()
+        try:
+            for i, j in pairs:
+                # Pruned pairs keep their place in line without a future.
+                if prefilter is not None and prefilter.prune(proteins[i], proteins[j]):
+                    pending.append((i, j, None))
+                else:
+                    pending.append((i, j, executor.submit(compare, proteins[i], proteins[j])))
+                
+                if len(pending) >= self.jobs * AllVsAll.QUEUE:
+                    i, j, future = pending.popleft()
+                    yield i, j, future.result() if future is not None else None
+            
+            while pending:
+                i, j, future = pending.popleft()
+                yield i, j, future.result() if future is not None else None
+        finally:
+            # Don't start pairs nobody is waiting for anymore.
+            for _, _, future in pending:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=False)
+    
+    @staticmethod
+    def remap(results, names, new_names):
+        """
+        Returns the results of a run on other proteins keyed by the pairs of
+        new_names, for the pairs of proteins found in both.
+        
+        Key arguments:
+        results   -- the results keyed by pair.
+        names     -- the protein names of the pairs of the results.
+        new_names -- the protein names of the new pairs.
+        """
+        index = dict((name, i) for i, name in enumerate(new_names))
+        
+        remapped = {}
+        for (i, j), result in results.items():
+            if names[i] in index and names[j] in index:
+                remapped[(index[names[i]], index[names[j]])] = result
+        
+        return remapped
+    
+    @staticmethod
+    def rows(results, l):
+        """
+        Yields (i, row) for each row of the matrix of results, as soon as its
+        last pair comes back.
+        
+        Key arguments:
+        results -- (i, j, result) of every ordered pair, in row-major order.
+        l       -- number of proteins.
+        """
+        i = 0
+        row = []
+        for first, second, result in results:
+            # Results aren't mirrored, every pair has to come back.
+            if (first, second) != (i, len(row)):
+                raise EIGAsException('Missing result of pair: ' + str((i, len(row))))
+            
+            row.append(result)
+            if len(row) == l:
+                yield i, row
+                i += 1
+                row = []
+        
+        if i < l:
+            raise EIGAsException('Missing result of pair: ' + str((i, len(row))))
+    
+    def matrix(self):
+        """
+        Returns the matrix (list of rows) of results.
+        """
+        return [row for _, row in AllVsAll.rows(self.run(), len(self.proteins))]
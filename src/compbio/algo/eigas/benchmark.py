@@ -0,0 +1,290 @@
+"""
+Reproducible benchmarks of the EIGAs stages.
+
+Every stage is timed on its own over fixed sets of proteins and pairs from the
+bundled data sets, with the inputs of the stage computed beforehand. The
+results are plain dictionaries that can be written as JSON and compared
+across commits.
+
+Protein stages (parse, distance, contact, eigen) run once per protein of a
+set, alignment stages once per pair. The align stages time the public
+EIGAs.global_align and local_align calls as the all-vs-all comparisons make
+them, the fill and traceback stages their parts. Cells are residues for
+parsing and matrix cells for every other stage, so the DP fills and their
+tracebacks are measured on the same scale.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import EIGAs
+from .exception import EIGAsException
+from .precision import Precision
+from .protein.core import Protein
+from .protein.parser.core import ProteinParser
+from compbio.common.data import HARD, LOCAL, SKOLNICK
+
+from numpy import median, percentile
+from numpy.linalg import svd
+from timeit import default_timer
+
+import gc
+import numpy
+import os
+import platform
+import scipy
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class Benchmark(object):
+    
+    # Stages in the order they run.
+    STAGES = ('parse', 'distance', 'contact', 'eigen',
+              'global_fill', 'global_traceback', 'global_align',
+              'local_fill', 'local_traceback', 'local_align')
+    
+    # Percentiles reported besides the median.
+    PERCENTILES = (10, 25, 75, 90)
+    
+    # Fixed pairs of each data set, the hard pairs of the hard analysis, the
+    #  first two proteins of each Skolnick family and neighbours of the local
+    #  analysis.
+    PAIRS = {'hard': [(HARD['1FXIa'], HARD['1UBQ']),
+                      (HARD['1TEN'], HARD['3HHRb']),
+                      (HARD['3HLAb'], HARD['2RHE']),
+                      (HARD['2AZAa'], HARD['1PAZ']),
+                      (HARD['1CEWi'], HARD['1MOLa']),
+                      (HARD['1CID'], HARD['2RHE']),
+                      (HARD['1CRL'], HARD['1EDE']),
+                      (HARD['2SIM'], HARD['1NSBa']),
+                      (HARD['1BGEb'], HARD['2GMFa']),
+                      (HARD['1TIE'], HARD['4FGF'])],
+             'skolnick': [tuple([SKOLNICK[family][name] for name in sorted(SKOLNICK[family])[:2]])
+                          for family in sorted(SKOLNICK)],
+             'local': [(LOCAL['1ADF'], LOCAL['2JHF']),
+                       (LOCAL['1MGO'], LOCAL['1EE2']),
+                       (LOCAL['1QV6'], LOCAL['1A71']),
+                       (LOCAL['1KUV'], LOCAL['1KUY']),
+                       (LOCAL['1IB1e'], LOCAL['1IB1f'])]}
+    
+    def __init__(self, repeat=5, limit=None, memory=True):
+        """
+        Init.
+        
+        Key arguments:
+        repeat -- timed runs of each stage. [optional]
+        limit  -- only use the first pairs of each data set. [optional]
+        memory -- measure the peak memory of each stage. [optional]
+        """
+        if repeat < 1:
+            raise EIGAsException('Benchmarks need at least one run: ' + str(repeat))
+        
+        self.repeat = repeat
+        self.limit = limit
+        
+        # Peak memory is the growth of the resident set of a forked process.
+        self.memory = memory and resource is not None and hasattr(os, 'fork')
+    
+    @staticmethod
+    def settings():
+        """
+        Returns the settings and versions the results depend on.
+        """
+        return {'cutoff': Protein.cutoff,
+                'fast': Protein.fast,
+                'gap_penalty': EIGAs.GAP_PENALTY,
+                'precision': Precision.policy,
+                'python': platform.python_version(),
+                'numpy': numpy.__version__,
+                'scipy': scipy.__version__,
+                'platform': platform.platform()}
+    
+    def run(self, datasets=None):
+        """
+        Returns the results of the benchmarks of the data sets.
+        
+        Key arguments:
+        datasets -- names of the data sets, all by default. [optional]
+        """
+        if datasets is None:
+            datasets = sorted(Benchmark.PAIRS)
+        
+        results = {}
+        for dataset in datasets:
+            if dataset not in Benchmark.PAIRS:
+                raise EIGAsException('Unknown benchmark data set: ' + str(dataset))
+            
+            results[dataset] = self.dataset(Benchmark.PAIRS[dataset][:self.limit])
+        
+        return {'settings': dict(Benchmark.settings(), repeat=self.repeat),
+                'datasets': results}
+    
+    def dataset(self, pairs):
+        """
+        Returns the pairs and the results of every stage on them.
+        
+        Key arguments:
+        pairs -- the pdb parser arguments of each pair.
+        """
+        # Each protein once, in a fixed order.
+        entries = sorted(set(entry for pair in pairs for entry in pair), key=lambda entry: entry[0])
+        
+        stages = {}
+        
+        coords = [ProteinParser.factory('ca', entry).coords() for entry in entries]
+        stages['parse'] = self.measure(lambda entry: ProteinParser.factory('ca', entry).coords(),
+                                       entries, sum(len(c) for c in coords))
+        
+        cells = sum(len(c) ** 2 for c in coords)
+        
+        dmatrices = [Protein.dmatrix(c) for c in coords]
+        stages['distance'] = self.measure(Protein.dmatrix, coords, cells)
+        
+        cmatrices = [Protein.cmatrix(dmatrix) for dmatrix in dmatrices]
+        stages['contact'] = self.measure(Protein.cmatrix, dmatrices, cells)
+        
+        if Protein.fast:
+            eigen = Protein.eigen
+        else:
+            eigen = svd
+        stages['eigen'] = self.measure(eigen, cmatrices, cells)
+        
+        proteins = dict((entry, Protein(ProteinParser.factory('ca', entry))) for entry in entries)
+        aligned = [(proteins[entry1], proteins[entry2]) for entry1, entry2 in pairs]
+        fingerprints = [(protein1.fingerprint, protein2.fingerprint) for protein1, protein2 in aligned]
+        
+        cells = sum(len(fingerprint1) * len(fingerprint2) for fingerprint1, fingerprint2 in fingerprints)
+        
+        def global_fill(fingerprints):
+            return EIGAs._global_fill(EIGAs.scores(*fingerprints))
+        
+        def local_fill(fingerprints):
+            return EIGAs._local_fill_wavefront(EIGAs.scores(*fingerprints))
+        
+        # Tracebacks as the all-vs-all comparisons run them.
+        directions = [global_fill(f)[1] for f in fingerprints]
+        stages['global_fill'] = self.measure(global_fill, fingerprints, cells)
+        stages['global_traceback'] = self.measure(EIGAs._global_traceback, directions, cells)
+        
+        fills = [local_fill(f) for f in fingerprints]
+        stages['local_fill'] = self.measure(local_fill, fingerprints, cells)
+        stages['local_traceback'] = self.measure(lambda fill: EIGAs._local_traceback(fill[0], fill[1], fill[2], 0, k=1),
+                                                 fills, cells)
+        
+        # The whole calls, scores included.
+        stages['global_align'] = self.measure(lambda pair: EIGAs.global_align(*pair), aligned, cells)
+        stages['local_align'] = self.measure(lambda pair: EIGAs.local_align(*pair, k=1), aligned, cells)
+        
+        return {'pairs': [[entry1[0], entry2[0]] for entry1, entry2 in pairs],
+                'stages': stages}
+    
+    def measure(self, function, items, cells):
+        """
+        Returns the timings of a stage run over every item.
+        
+        One untimed run warms up the caches first. The garbage collector is
+        off while timing, like timeit.
+        
+        Key arguments:
+        function -- the stage, called with each item.
+        items    -- the inputs of the stage.
+        cells    -- the number of cells the stage computes per run.
+        """
+        def once():
+            for item in items:
+                function(item)
+        
+        once()
+        
+        samples = []
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.repeat):
+                gc.collect()
+                start = default_timer()
+                once()
+                samples.append(default_timer() - start)
+        finally:
+            if enabled:
+                gc.enable()
+        
+        result = {'runs': len(samples),
+                  'median': float(median(samples)),
+                  'min': min(samples),
+                  'max': max(samples),
+                  'cells': cells,
+                  'peak_memory': self.peak(once) if self.memory else None}
+        for p in Benchmark.PERCENTILES:
+            result['p' + str(p)] = float(percentile(samples, p))
+        
+        result['cells_per_second'] = cells / result['median'] if result['median'] > 0 else None
+        
+        return result
+    
+    @staticmethod
+    def peak(once):
+        """
+        Returns the bytes the resident set grows by while a stage runs.
+        
+        The stage runs in a forked process, so the peak of earlier stages in
+        this one doesn't hide it.
+        
+        Key arguments:
+        once -- runs the stage once.
+        """
+        # The peak is in kilobytes, except on Mac OS.
+        unit = 1 if sys.platform == 'darwin' else 1024
+        
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                once()
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start
+                os.write(write, str(peak * unit).encode('ascii'))
+            finally:
+                os._exit(0)
+        
+        os.close(write)
+        try:
+            output = b''
+            while True:
+                data = os.read(read, 64)
+                if not data:
+                    break
+                output += data
+        finally:
+            os.close(read)
+            os.waitpid(pid, 0)
+        
+        return int(output) if output else None
+    
+    @staticmethod
+    def compare(baseline, results):
+        """
+        Returns the ratio of the median of every stage to the baseline, below
+        one when faster.
+        
+        Key arguments:
+        baseline -- earlier results.
+        results  -- the results to compare.
+        """
+        ratios = {}
+        for dataset, result in results['datasets'].items():
+            if dataset not in baseline['datasets']:
+                continue
+            
+            before = baseline['datasets'][dataset]['stages']
+            ratios[dataset] = dict((stage, timings['median'] / before[stage]['median'])
+                                   for stage, timings in result['stages'].items()
+                                   if stage in before and before[stage]['median'] > 0)
+        
+        return ratios
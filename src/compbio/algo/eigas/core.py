@@ -9,31 +9,45 @@ Yosi Shibberu and Allen Holder
 @copyright 2011 Aaron Zampaglione
 @license MIT
 """
-from numpy import empty
+from numpy import absolute, arange, argpartition, asarray, flatnonzero, int8, int64, maximum, rec, sort, subtract, where, zeros
+
+from .exception import EIGAsException
+from .instrument import Instrument
+from .precision import Precision
+
+from collections import namedtuple
+from heapq import heappush, heappushpop
 
 class EIGAs(object):
     
     # Gap penalty.
     GAP_PENALTY = 1
     
-    class Node(object):
-        """
-        Node of the DP matrix.
-        """
-        
-        def __init__(self, score=0):
-            """
-            Initializes the node.
-            
-            Key arguments:
-            score -- initial score
-            """
-            self.prev = None
-            self.score = score
-            self.value = 0
-            self.gaps = 0
-            self.indices1 = None
-            self.indices2 = None
+    # Global alignment modes.
+    BANDED = 'banded'
+    FULL = 'full'
+    LINEAR = 'linear'
+    
+    # Half width of the band of the banded mode.
+    BAND = 16
+    
+    # Global alignments with more DP cells than this use the linear mode.
+    CELL_BUDGET = 2 ** 24
+    
+    # DP cells of directions kept at once by the linear mode.
+    LINEAR_BLOCK = 2 ** 16
+    
+    # DP cells scanned at once for the optimal cells of local alignments.
+    LOCAL_BLOCK = 2 ** 16
+    
+    # DP directions.
+    NONE = 0
+    TOP = 1
+    DIAG = 2
+    LEFT = 3
+    
+    # Optimal cell of a local alignment.
+    Cell = namedtuple('Cell', ('value', 'gaps', 'row', 'col'))
     
     @staticmethod
     def aligned(protein1=None, protein2=None, seq1=None, seq2=None):
@@ -50,9 +64,9 @@ class EIGAs(object):
         """
         aligned = 0
         
-        # Align the proteins if the sequences weren't provided.
+        # Only count the aligned proteins if the sequences weren't provided.
         if not seq1 or not seq2:
-            _, seq1, seq2 = EIGAs.global_align(protein1, protein2)
+            return EIGAs.global_counts(protein1, protein2)[0]
         
         for i in range(len(seq1)):
             if seq1[i] != None and seq2[i] != None:
@@ -61,228 +75,991 @@ class EIGAs(object):
         return aligned
     
     @classmethod
-    def global_align(cls, protein1, protein2):
+    def global_counts(cls, protein1, protein2):
+        """
+        Returns the number of aligned residues and the length of the global
+        alignment, without building the DP matrix or the traceback.
+        
+        Key arguments:
+        protein1 -- the first protein.
+        protein2 -- the second protein.
+        """
+        with Instrument.stage('global.counts', (len(protein1.fingerprint), len(protein2.fingerprint))):
+            return EIGAs._global_counts(protein1.fingerprint, protein2.fingerprint)
+    
+    @staticmethod
+    def _global_counts(fingerprint1, fingerprint2):
+        """
+        Counts the aligned pairs and the length of the global alignment.
+        
+        The traceback from a cell always follows the same path, so along with
+        its value each cell keeps the aligned pairs and the length of the
+        alignment ending there, packed in one integer. The border cell a
+        traceback stops on pairs its two residues and adds a gap for each one
+        before them.
+        
+        Only two lines of the DP matrix are kept, along the shortest
+        fingerprint, so memory is O(min(rows, cols)).
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        """
+        fingerprint1 = asarray(fingerprint1, dtype=Precision.floating())
+        fingerprint2 = asarray(fingerprint2, dtype=Precision.floating())
+        
+        # Walk over the longest fingerprint. The previous line is then the
+        #  top of each cell, or the left when transposed.
+        transposed = len(fingerprint2) > len(fingerprint1)
+        if transposed:
+            outer, inner = fingerprint2, fingerprint1
+        else:
+            outer, inner = fingerprint1, fingerprint2
+        
+        size = len(inner)
+        gap = EIGAs.GAP_PENALTY
+        
+        # Counts are aligned * pair + length, a gap adds one and a pair adds
+        #  pair + 1.
+        pair = len(outer) + size + 1
+        step = pair + 1
+        
+        # Init first line.
+        prev_score = absolute(outer[0] - inner).tolist()
+        prev_value = [float(b) for b in range(size)]
+        prev_count = [pair + b + 1 for b in range(size)]
+        
+        # Determine the counts using DP.
+        for a in range(1, len(outer)):
+            line_score = absolute(outer[a] - inner).tolist()
+            line_value = [float(a)] * size
+            line_count = [pair + a + 1] * size
+            
+            for b in range(1, size):
+                # Find the scores, from the previous line (up) or this one (back).
+                up_score = prev_value[b] + prev_score[b] + gap
+                diag_score = prev_value[b - 1] + prev_score[b - 1]
+                back_score = line_value[b - 1] + line_score[b - 1] + gap
+                
+                # Ties are broken top, then diagonal, then left.
+                if transposed:
+                    if (back_score <= diag_score and back_score <= up_score):
+                        line_value[b] = line_value[b - 1] + gap
+                        line_count[b] = line_count[b - 1] + 1
+                    elif (diag_score <= back_score and diag_score <= up_score):
+                        line_value[b] = prev_value[b - 1]
+                        line_count[b] = prev_count[b - 1] + step
+                    else:
+                        line_value[b] = prev_value[b] + gap
+                        line_count[b] = prev_count[b] + 1
+                else:
+                    if (up_score <= diag_score and up_score <= back_score):
+                        line_value[b] = prev_value[b] + gap
+                        line_count[b] = prev_count[b] + 1
+                    elif (diag_score <= up_score and diag_score <= back_score):
+                        line_value[b] = prev_value[b - 1]
+                        line_count[b] = prev_count[b - 1] + step
+                    else:
+                        line_value[b] = line_value[b - 1] + gap
+                        line_count[b] = line_count[b - 1] + 1
+            
+            prev_score = line_score
+            prev_value = line_value
+            prev_count = line_count
+        
+        return divmod(prev_count[-1], pair)
+    
+    @classmethod
+    def global_align(cls, protein1, protein2, matrix=False, mode=None, band=None):
         """
         Globally aligns two proteins.
         
+        The DP matrix is only built when requested, otherwise None is returned
+        in its place.
+        
+        Three modes are supported:
+        full   -- keeps the whole DP matrix in memory.
+        linear -- divide and conquer over the rows, only keeping a few rows of
+                  the DP matrix in memory.
+        banded -- only computes the cells near the diagonal, doubling the band
+                  until no cell of the path depends on a cell outside of it.
+                  Fast when the proteins have similar lengths and folds.
+        
+        By default the linear mode is used when the DP matrix would have more
+        than EIGAs.CELL_BUDGET cells and no matrix was requested.
+        
         Key arguments:
         protein1 -- the first protein.
         protein2 -- the second protein.
+        matrix   -- return the DP matrix (score, value and direction
+                    fields). [optional]
+        mode     -- full, linear or banded. [optional]
+        band     -- initial half width of the band, EIGAs.BAND by
+                    default. [optional]
         """
-        # Quick reference the protein fingerprints.
         fingerprint1 = protein1.fingerprint
         fingerprint2 = protein2.fingerprint
         
+        if mode is None:
+            if not matrix and len(fingerprint1) * len(fingerprint2) > EIGAs.CELL_BUDGET:
+                mode = EIGAs.LINEAR
+            else:
+                mode = EIGAs.FULL
+        
+        if mode == EIGAs.LINEAR:
+            if matrix:
+                raise EIGAsException('The DP matrix is not available in linear mode.')
+            
+            with Instrument.stage('global.linear', (len(fingerprint1), len(fingerprint2))):
+                s1, s2 = EIGAs._global_linear(fingerprint1, fingerprint2)
+            return None, s1, s2
+        
+        if mode == EIGAs.BANDED:
+            if matrix:
+                raise EIGAsException('The DP matrix is not available in banded mode.')
+            
+            if band is None:
+                band = EIGAs.BAND
+            
+            # The path is the one of the full DP once none of its cells
+            #  depends on a cell outside of the band, which is always the
+            #  case when the band covers the matrix.
+            s1, s2, touched = EIGAs._global_band(fingerprint1, fingerprint2, band)
+            while touched:
+                band = max(1, 2 * band)
+                s1, s2, touched = EIGAs._global_band(fingerprint1, fingerprint2, band)
+            
+            return None, s1, s2
+        
+        if mode != EIGAs.FULL:
+            raise EIGAsException('Global alignment mode not supported: ' + str(mode))
+        
+        # Difference in fingerprints for every pair of residues.
+        with Instrument.stage('global.scores', (len(fingerprint1), len(fingerprint2))):
+            score = EIGAs.scores(fingerprint1, fingerprint2)
+        
+        with Instrument.stage('global.fill', score.shape):
+            value, direction = EIGAs._global_fill(score)
+        
+        with Instrument.stage('global.traceback', score.shape):
+            s1, s2 = EIGAs._global_traceback(direction)
+        
+        if matrix:
+            return rec.fromarrays((score, value, direction), names=('score', 'value', 'direction')), s1, s2
+        
+        return None, s1, s2
+    
+    @staticmethod
+    def scores(fingerprint1, fingerprint2):
+        """
+        Returns the matrix of absolute fingerprint differences.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        """
+        return absolute(subtract.outer(asarray(fingerprint1, dtype=Precision.floating()),
+                                       asarray(fingerprint2, dtype=Precision.floating())))
+    
+    @staticmethod
+    def _global_row(i, prev_score, prev_value, row_score):
+        """
+        Computes one row of the global DP value and direction matrices.
+        
+        Ties are broken top, then diagonal, then left. Plain lists are used
+        since they are much faster than numpy scalars inside the loop.
+        
+        Key arguments:
+        i          -- index of the row.
+        prev_score -- fingerprint differences of the previous row.
+        prev_value -- values of the previous row.
+        row_score  -- fingerprint differences of this row.
+        """
+        cols = len(row_score)
+        
+        gap = EIGAs.GAP_PENALTY
+        top, diag, left = EIGAs.TOP, EIGAs.DIAG, EIGAs.LEFT
+        
+        row_value = [float(i)] * cols
+        row_direction = [EIGAs.NONE] * cols
+        
+        for j in range(1, cols):
+            # Find the scores.
+            top_score = prev_value[j] + prev_score[j] + gap
+            diag_score = prev_value[j - 1] + prev_score[j - 1]
+            left_score = row_value[j - 1] + row_score[j - 1] + gap
+            
+            # Top
+            if (top_score <= diag_score and top_score <= left_score):
+                row_value[j] = prev_value[j] + gap
+                row_direction[j] = top
+            # Diagonal
+            elif (diag_score <= top_score and diag_score <= left_score):
+                row_value[j] = prev_value[j - 1]
+                row_direction[j] = diag
+            # Left
+            else:
+                row_value[j] = row_value[j - 1] + gap
+                row_direction[j] = left
+        
+        return row_value, row_direction
+    
+    @staticmethod
+    def _global_fill(score):
+        """
+        Fills the global DP value and direction matrices.
+        
+        Key arguments:
+        score -- matrix of fingerprint differences.
+        """
+        rows, cols = score.shape
+        
+        value = zeros((rows, cols), dtype=score.dtype)
+        direction = zeros((rows, cols), dtype=int8)
+        
+        # Init first row.
+        value[0, :] = arange(cols)
+        
+        prev_score = score[0].tolist()
+        prev_value = value[0].tolist()
+        
+        # Determine score using DP.
+        for i in range(1, rows):
+            row_score = score[i].tolist()
+            row_value, row_direction = EIGAs._global_row(i, prev_score, prev_value, row_score)
+            
+            value[i] = row_value
+            direction[i] = row_direction
+            
+            prev_score = row_score
+            prev_value = row_value
+        
+        return value, direction
+    
+    @staticmethod
+    def _global_traceback(direction):
+        """
+        Rebuilds the globally aligned index sequences.
+        
+        Key arguments:
+        direction -- matrix of DP directions.
+        """
+        s1 = []
+        s2 = []
+        
+        i, j, _ = EIGAs._global_walk(direction.tolist(), 0, direction.shape[0] - 1, direction.shape[1] - 1, 0, s1, s2)
+        
+        return EIGAs._global_finish(s1, s2, i, j)
+    
+    @staticmethod
+    def _global_walk(direction, offset, i, j, stop, s1, s2):
+        """
+        Follows the directions backwards from (i, j) until reaching a border
+        cell or the row stop.
+        
+        The reversed indices are appended to s1 and s2. Returns the cell the
+        walk ended on and whether it is a border cell.
+        
+        Key arguments:
+        direction -- rows of DP directions.
+        offset    -- row index of the first row in direction.
+        i         -- row to start from.
+        j         -- column to start from.
+        stop      -- row to stop at.
+        s1        -- reversed indices of the first sequence.
+        s2        -- reversed indices of the second sequence.
+        """
+        top, diag, left = EIGAs.TOP, EIGAs.DIAG, EIGAs.LEFT
+        
+        while i > stop:
+            d = direction[i - offset][j]
+            if d == top:
+                s1.append(i)
+                s2.append(None)
+                i -= 1
+            elif d == diag:
+                s1.append(i)
+                s2.append(j)
+                i -= 1
+                j -= 1
+            elif d == left:
+                s1.append(None)
+                s2.append(j)
+                j -= 1
+            else:
+                return i, j, True
+        
+        return i, j, False
+    
+    @staticmethod
+    def _global_finish(s1, s2, i, j):
+        """
+        Completes the reversed index sequences ending at the border cell (i, j).
+        
+        Key arguments:
+        s1   -- reversed indices of the first sequence.
+        s2   -- reversed indices of the second sequence.
+        i    -- row of the border cell.
+        j    -- column of the border cell.
+        """
+        s1.append(i)
+        s2.append(j)
+        
+        # Fill in missing indices in the beginning.
+        while i:
+            i -= 1
+            s1.append(i)
+            s2.append(None)
+        while j:
+            j -= 1
+            s1.append(None)
+            s2.append(j)
+        
+        s1.reverse()
+        s2.reverse()
+        
+        return s1, s2
+    
+    @staticmethod
+    def _global_linear(fingerprint1, fingerprint2):
+        """
+        Globally aligns two fingerprints without building the DP matrix.
+        
+        The traceback is found by dividing the rows in half: the middle row is
+        computed from the first one, the bottom half is traced back down to
+        the middle row, then the top half from where the path entered it.
+        Only blocks of at most EIGAs.LINEAR_BLOCK cells of directions are
+        kept at a time, so memory is O(cols * log(rows)).
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        """
+        fingerprint1 = asarray(fingerprint1, dtype=Precision.floating())
+        fingerprint2 = asarray(fingerprint2, dtype=Precision.floating())
+        
         rows = len(fingerprint1)
         cols = len(fingerprint2)
         
-        #Build a matrix full of Prefix objects
-        matrix = empty((rows, cols), dtype=object)
-        # Initialize the matrix.
-        for i in range(rows):
-            for j in range(cols):
-                # Initialize matrix with difference in fingerprints.
-                matrix[i][j] = EIGAs._Node(abs(fingerprint1[i] - fingerprint2[j]))
+        # Row zero of the DP matrix.
+        score = absolute(fingerprint1[0] - fingerprint2).tolist()
+        value = [float(j) for j in range(cols)]
         
-        # Init first row.
-        for i in range(rows):
-            matrix[i][0].value = float(i)
-            matrix[i][0].indices1 = i
-            matrix[i][0].indices2 = 0
+        s1 = []
+        s2 = []
+        
+        i, j, _ = EIGAs._global_linear_walk(fingerprint1, fingerprint2, 0, score, value,
+                                            rows - 1, cols - 1, s1, s2)
+        
+        return EIGAs._global_finish(s1, s2, i, j)
     
-        # Init first col.
-        for j in range(cols):
-            matrix[0][j].value = float(j)
-            matrix[0][j].indices1 = 0
-            matrix[0][j].indices2 = j
+    @staticmethod
+    def _global_linear_walk(fingerprint1, fingerprint2, first, score, value, last, j, s1, s2):
+        """
+        Traces back from (last, j) to the row first.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        first        -- row to stop at.
+        score        -- fingerprint differences of the row first.
+        value        -- values of the row first.
+        last         -- row to start from.
+        j            -- column to start from.
+        s1           -- reversed indices of the first sequence.
+        s2           -- reversed indices of the second sequence.
+        """
+        cols = len(fingerprint2)
+        
+        # Small enough to keep the directions of every row.
+        if (last - first) * cols <= EIGAs.LINEAR_BLOCK or last - first == 1:
+            direction = []
+            for i in range(first + 1, last + 1):
+                row_score = absolute(fingerprint1[i] - fingerprint2).tolist()
+                value, row_direction = EIGAs._global_row(i, score, value, row_score)
+                direction.append(row_direction)
+                score = row_score
             
+            return EIGAs._global_walk(direction, first + 1, last, j, first, s1, s2)
+        
+        # Compute the middle row.
+        middle = (first + last) // 2
+        middle_score = score
+        middle_value = value
+        for i in range(first + 1, middle + 1):
+            row_score = absolute(fingerprint1[i] - fingerprint2).tolist()
+            middle_value, _ = EIGAs._global_row(i, middle_score, middle_value, row_score)
+            middle_score = row_score
+        
+        # Bottom half, then the top half if the path didn't end on a border.
+        i, j, done = EIGAs._global_linear_walk(fingerprint1, fingerprint2, middle, middle_score, middle_value,
+                                               last, j, s1, s2)
+        if done:
+            return i, j, done
+        
+        return EIGAs._global_linear_walk(fingerprint1, fingerprint2, first, score, value,
+                                         middle, j, s1, s2)
+    
+    @classmethod
+    def banded_align(cls, protein1, protein2, band=None):
+        """
+        Globally aligns two proteins, only computing the DP cells near the
+        diagonal.
+        
+        Returns whether the path depends on a cell outside of the band and
+        the aligned index sequences. When it doesn't, the path is the one of
+        the full DP; the global_align banded mode widens the band until then.
+        
+        Key arguments:
+        protein1 -- the first protein.
+        protein2 -- the second protein.
+        band     -- half width of the band, EIGAs.BAND by default. [optional]
+        """
+        if band is None:
+            band = EIGAs.BAND
+        
+        s1, s2, touched = EIGAs._global_band(protein1.fingerprint, protein2.fingerprint, band)
+        
+        return touched, s1, s2
+    
+    @staticmethod
+    def _global_band(fingerprint1, fingerprint2, band):
+        """
+        Runs and records one banded global alignment.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        band         -- half width of the band.
+        """
+        rows = len(fingerprint1)
+        cols = len(fingerprint2)
+        
+        # Only the cells of the band are computed.
+        with Instrument.stage('global.banded', (rows, min(cols, 2 * max(0, band) + 1 + abs(cols - rows)))):
+            return EIGAs._global_banded(fingerprint1, fingerprint2, band)
+    
+    @staticmethod
+    def _global_banded(fingerprint1, fingerprint2, band):
+        """
+        Globally aligns two fingerprints in a band of the DP matrix.
+        
+        Row i only keeps the columns from i - band to i + band, widened by the
+        difference in lengths so both corners are in the band. Cells outside
+        of it are never chosen, which is the same as the full DP with an
+        infinite difference in fingerprints outside of the band. Memory and
+        time are O(rows * band).
+        
+        A cell is dirty when a neighbour outside of the band, or a dirty one,
+        could score as well as the chosen neighbour in the full DP; the path
+        is the one of the full DP when none of its cells is dirty.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        band         -- half width of the band.
+        """
+        if band < 0:
+            raise EIGAsException('Band width must not be negative: ' + str(band))
+        
+        fingerprint1 = asarray(fingerprint1, dtype=Precision.floating())
+        fingerprint2 = asarray(fingerprint2, dtype=Precision.floating())
+        
+        rows = len(fingerprint1)
+        cols = len(fingerprint2)
+        
+        gap = EIGAs.GAP_PENALTY
+        top, diag, left = EIGAs.TOP, EIGAs.DIAG, EIGAs.LEFT
+        inf = float('inf')
+        
+        # A path to cell (i, j) has at least |i - j| gaps, so its value is at
+        #  least floor * |i - j|, in the band or not.
+        floor = min(1, gap)
+        
+        # Offsets of the first and last columns of the band from the row.
+        low = min(0, cols - rows) - band
+        high = max(0, cols - rows) + band
+        
+        # Init first row, with an extra cell after the band. Its values are
+        #  the same as in the full DP.
+        firsts = [0]
+        lasts = [min(cols - 1, high)]
+        direction = [[EIGAs.NONE] * (lasts[0] + 1)]
+        dirty = [[False] * (lasts[0] + 1)]
+        
+        prev_value = [float(j) for j in range(lasts[0] + 2)]
+        prev_score = absolute(fingerprint1[0] - fingerprint2[:lasts[0] + 2]).tolist()
+        prev_dirty = [False] * (lasts[0] + 2)
+        
         # Determine score using DP.
         for i in range(1, rows):
-            for j in range(1, cols):                
-                # Find the previous top, diag, and left components.
-                top = matrix[i - 1][j]
-                diag = matrix[i - 1][j - 1]
-                left = matrix[i][j - 1]
+            first = max(0, i + low)
+            last = min(cols - 1, i + high)
+            
+            # The previous row starts one column before this one, or on the
+            #  border like this one.
+            shift = first - firsts[i - 1]
+            
+            row_score = absolute(fingerprint1[i] - fingerprint2[first:last + 1]).tolist()
+            row_value = [inf] * (last - first + 1)
+            row_direction = [EIGAs.NONE] * (last - first + 1)
+            row_dirty = [False] * (last - first + 1)
+            
+            # Border cell, in the band or just before it. Neighbours that
+            #  may differ from the full DP keep the lowest score they could
+            #  have there, None otherwise.
+            if first == 0:
+                row_value[0] = left_value = float(i)
+                left_score = left_value + row_score[0] + gap
+                left_low = None
+            elif first == 1:
+                left_value = float(i)
+                left_score = left_value + abs(fingerprint1[i] - fingerprint2[0]) + gap
+                left_low = None
+            else:
+                left_value = left_score = inf
+                left_low = floor * abs(i - first + 1) + gap
+            
+            for k in range(1 if first == 0 else 0, last - first + 1):
+                p = k + shift
+                j = first + k
                 
-                # Find the scores.
-                top_score = top.value + matrix[i - 1][j].score + EIGAs.GAP_PENALTY
-                diag_score = diag.value + matrix[i - 1][j - 1].score
-                left_score = left.value + matrix[i][j - 1].score + EIGAs.GAP_PENALTY
+                # Find the scores, there is no top cell after the band.
+                if p < len(prev_score):
+                    top_score = prev_value[p] + prev_score[p] + gap
+                    top_low = floor * abs(i - 1 - j) + prev_score[p] + gap if prev_dirty[p] else None
+                else:
+                    top_score = inf
+                    top_low = floor * abs(i - 1 - j) + gap
+                diag_score = prev_value[p - 1] + prev_score[p - 1]
+                diag_low = floor * abs(i - j) + prev_score[p - 1] if prev_dirty[p - 1] else None
                 
                 # Top
                 if (top_score <= diag_score and top_score <= left_score):
-                    matrix[i][j].prev = top
-                    matrix[i][j].value = top.value + EIGAs.GAP_PENALTY
-                    matrix[i][j].indices1 = i
+                    row_value[k] = prev_value[p] + gap
+                    row_direction[k] = top
                 # Diagonal
                 elif (diag_score <= top_score and diag_score <= left_score):
-                    matrix[i][j].prev = diag
-                    matrix[i][j].value = diag.value
-                    matrix[i][j].indices1 = i
-                    matrix[i][j].indices2 = j
+                    row_value[k] = prev_value[p - 1]
+                    row_direction[k] = diag
                 # Left
                 else:
-                    matrix[i][j].prev = left
-                    matrix[i][j].value = left.value + EIGAs.GAP_PENALTY
-                    matrix[i][j].indices2 = j
+                    row_value[k] = left_value + gap
+                    row_direction[k] = left
+                
+                # The choice is the one of the full DP unless a neighbour
+                #  that may differ could score as well as the best one,
+                #  which covers a chosen neighbour that may differ.
+                if top_low is not None or diag_low is not None or left_low is not None:
+                    best = min(top_score, diag_score, left_score)
+                    row_dirty[k] = ((top_low is not None and top_low <= best) or
+                                    (diag_low is not None and diag_low <= best) or
+                                    (left_low is not None and left_low <= best))
+                
+                left_value = row_value[k]
+                left_score = left_value + row_score[k] + gap
+                left_low = floor * abs(i - j) + row_score[k] + gap if row_dirty[k] else None
+            
+            firsts.append(first)
+            lasts.append(last)
+            direction.append(row_direction)
+            dirty.append(row_dirty)
+            
+            prev_value = row_value
+            prev_score = row_score
+            prev_dirty = row_dirty
         
-        # Follow the pointers backwards to rebuild the globally aligned sequences.
+        # Follow the directions back to a border cell, noting whether any
+        #  cell of the path may differ from the full DP.
         s1 = []
         s2 = []
-        node = matrix[-1][-1]
-        while node != None:
-            s1.insert(0, node.indices1)
-            s2.insert(0, node.indices2)
-            node = node.prev
+        touched = False
         
-        # Fill in missing indices in the beginning.
-        while s1[0]:
-            s1.insert(0, s1[0] - 1)
-            s2.insert(0, None)
-        while s2[0]:
-            s1.insert(0, None)
-            s2.insert(0, s2[0] - 1)
-                
-        return matrix, s1, s2
+        i = rows - 1
+        j = cols - 1
+        while i > 0 and j > 0:
+            if dirty[i][j - firsts[i]]:
+                touched = True
+            
+            d = direction[i][j - firsts[i]]
+            if d == top:
+                s1.append(i)
+                s2.append(None)
+                i -= 1
+            elif d == diag:
+                s1.append(i)
+                s2.append(j)
+                i -= 1
+                j -= 1
+            else:
+                s1.append(None)
+                s2.append(j)
+                j -= 1
+        
+        s1, s2 = EIGAs._global_finish(s1, s2, i, j)
+        
+        return s1, s2, touched
     
     @classmethod
-    def local_align(cls, protein1, protein2, max_gaps=0):
+    def local_align(cls, protein1, protein2, max_gaps=0, matrix=False, wavefront=True, k=None, min_score=None):
         """
         Local alignment.
         
+        Returns the DP matrix (None unless requested) and a list of
+        (cell, seq1, seq2) tuples ordered from the best to the worst cell.
+        
         Key arguments:
         protein1  -- the first protein.
         protein2  -- the second protein.
-        min_value -- only return alignments that meet a minimum value (think
-                     of this as a threshold for the minimum number of structurally
-                     aligned residues). [optional]
+        max_gaps  -- only consider alignments that end in a cell with at most
+                     this many gaps. [optional]
+        matrix    -- return the DP matrix (score, value, gaps and direction
+                     fields). [optional]
+        wavefront -- compute each anti-diagonal of the DP matrix in a single
+                     vectorized step. [optional]
+        k         -- only return the k best alignments. [optional]
+        min_score -- only return alignments with at least this value. [optional]
         """
-        # Quick reference the protein fingerprints.
-        fingerprint1 = protein1.fingerprint
-        fingerprint2 = protein2.fingerprint
+        # Difference in fingerprints for every pair of residues.
+        with Instrument.stage('local.scores', (len(protein1.fingerprint), len(protein2.fingerprint))):
+            score = EIGAs.scores(protein1.fingerprint, protein2.fingerprint)
         
-        rows = len(fingerprint1) + 1
-        cols = len(fingerprint2) + 1
+        with Instrument.stage('local.fill', score.shape):
+            if wavefront:
+                value, gaps, direction = EIGAs._local_fill_wavefront(score)
+            else:
+                value, gaps, direction = EIGAs._local_fill(score)
         
-        #Build a matrix full of Prefix objects
-        matrix = empty((rows, cols), dtype=object)
-        # Initialize the matrix.
-        for i in range(1, rows):
-            for j in range(1, cols):
-                # Initialize matrix with difference in fingerprints.
-                matrix[i][j] = EIGAs.Node(abs(fingerprint1[i - 1] - fingerprint2[j - 1]))
+        with Instrument.stage('local.traceback', score.shape):
+            seqs = EIGAs._local_traceback(value, gaps, direction, max_gaps, k, min_score)
         
-        # Init first row.
-        for i in range(1, rows):
-            matrix[i][0] = EIGAs.Node()
-            matrix[i][0].gaps = i
-            matrix[i][0].indices1 = i
-            matrix[i][0].indices2 = None
+        if matrix:
+            rows, cols = value.shape
+            padded = zeros((rows, cols), dtype=score.dtype)
+            padded[1:, 1:] = score
+            return rec.fromarrays((padded, value, gaps, direction), names=('score', 'value', 'gaps', 'direction')), seqs
+        
+        return None, seqs
     
-        # Init first col.
-        for j in range(1, cols):
-            matrix[0][j] = EIGAs.Node()
-            matrix[0][j].gaps = j
-            matrix[0][j].indices1 = None
-            matrix[0][j].indices2 = j
+    @staticmethod
+    def _local_init(score):
+        """
+        Initializes the local DP value, gaps and direction matrices.
         
-        # Top left corner.
-        matrix[0][0] = EIGAs.Node()
+        The matrices have an extra leading row and column.
+        
+        Key arguments:
+        score -- matrix of fingerprint differences.
+        """
+        rows = score.shape[0] + 1
+        cols = score.shape[1] + 1
+        
+        value = zeros((rows, cols), dtype=Precision.integer())
+        gaps = zeros((rows, cols), dtype=Precision.integer())
+        direction = zeros((rows, cols), dtype=int8)
+        
+        # Init first column and first row.
+        gaps[:, 0] = arange(rows)
+        gaps[0, :] = arange(cols)
+        
+        return value, gaps, direction
+    
+    @staticmethod
+    def _local_fill(score):
+        """
+        Fills the local DP matrices one cell at a time.
+        
+        Key arguments:
+        score -- matrix of fingerprint differences.
+        """
+        value, gaps, direction = EIGAs._local_init(score)
+        rows, cols = value.shape
+        
+        gap = EIGAs.GAP_PENALTY
+        top, diag, left = EIGAs.TOP, EIGAs.DIAG, EIGAs.LEFT
+        
+        prev_value = value[0].tolist()
+        prev_gaps = gaps[0].tolist()
         
-        optimals = []
-            
         # Determine score using DP.
         for i in range(1, rows):
-            for j in range(1, cols):                
-                # Find the previous top, diag, and left components.
-                top = matrix[i - 1][j]
-                diag = matrix[i - 1][j - 1]
-                left = matrix[i][j - 1]
-                
+            row_score = score[i - 1].tolist()
+            row_value = value[i].tolist()
+            row_gaps = gaps[i].tolist()
+            row_direction = [0] * cols
+            
+            for j in range(1, cols):
                 # See if the fingeprints at the current position 'match'.
-                if matrix[i][j].score < EIGAs.GAP_PENALTY:
-                    value = 2 * EIGAs.GAP_PENALTY
+                if row_score[j - 1] < gap:
+                    match = 2 * gap
                 else:
-                    value = -1 * EIGAs.GAP_PENALTY
+                    match = -1 * gap
                 
                 # Find the values for each direction.
-                top_score = top.value - EIGAs.GAP_PENALTY
-                diag_score = diag.value + value
-                left_score = left.value - EIGAs.GAP_PENALTY
+                top_score = prev_value[j] - gap
+                diag_score = prev_value[j - 1] + match
+                left_score = row_value[j - 1] - gap
                 
                 # Diagonal
                 if (diag_score >= top_score and diag_score >= left_score and diag_score >= 0):
-                    matrix[i][j].prev = diag
-                    matrix[i][j].gaps = diag.gaps
-                    matrix[i][j].value = diag_score
-                    matrix[i][j].indices1 = i
-                    matrix[i][j].indices2 = j 
+                    row_direction[j] = diag
+                    row_gaps[j] = prev_gaps[j - 1]
+                    row_value[j] = diag_score
                 # Top
                 elif (top_score >= diag_score and top_score >= left_score and top_score >= 0):
-                    matrix[i][j].prev = top
-                    matrix[i][j].gaps = top.gaps + 1
-                    matrix[i][j].value = top_score
-                    matrix[i][j].indices1 = i
+                    row_direction[j] = top
+                    row_gaps[j] = prev_gaps[j] + 1
+                    row_value[j] = top_score
                 # Left
                 elif (left_score >= 0):
-                    matrix[i][j].prev = left
-                    matrix[i][j].gaps = left.gaps + 1
-                    matrix[i][j].value = left_score
-                    matrix[i][j].indices2 = j                               
-                # Fall through not necessary, it's handled during init.
-                #else:
-                #    matrix[i][j].prev = None
-                #    matrix[i][j].value = 0
-                
-                # If the value is greater than 0, we'll consider it for now.
-                #  We need to preserve the order, so add to the front of the list.
-                if matrix[i][j].gaps <= max_gaps:
-                    optimals.append(matrix[i][j])
+                    row_direction[j] = left
+                    row_gaps[j] = row_gaps[j - 1] + 1
+                    row_value[j] = left_score
+            
+            value[i] = row_value
+            gaps[i] = row_gaps
+            direction[i] = row_direction
+            
+            prev_value = row_value
+            prev_gaps = row_gaps
+        
+        return value, gaps, direction
+    
+    @staticmethod
+    def _local_fill_wavefront(score):
+        """
+        Fills the local DP matrices one anti-diagonal at a time.
+        
+        Every cell on an anti-diagonal only depends on the two previous
+        anti-diagonals, so each one is computed with a handful of array
+        operations. In the flattened matrices an anti-diagonal is a slice
+        with a step of (cols - 1), and its top, diagonal and left neighbors
+        are the same slice shifted by cols, cols + 1 and 1.
+        
+        Key arguments:
+        score -- matrix of fingerprint differences.
+        """
+        value, gaps, direction = EIGAs._local_init(score)
+        rows, cols = value.shape
+        
+        gap = EIGAs.GAP_PENALTY
+        
+        # Value gained by moving diagonally into each cell.
+        match = zeros((rows, cols), dtype=value.dtype)
+        match[1:, 1:] = where(score < gap, 2 * gap, -1 * gap)
+        match = match.ravel()
+        
+        value = value.ravel()
+        gaps = gaps.ravel()
+        direction = direction.ravel()
+        
+        step = cols - 1
+        for d in range(2, rows + cols - 1):
+            # Flat positions of the first and last interior cells on this anti-diagonal.
+            first = d + max(1, d - step) * step
+            last = d + min(rows - 1, d - 1) * step
+            cell = slice(first, last + 1, step)
+            top = slice(first - cols, last - cols + 1, step)
+            diag = slice(first - cols - 1, last - cols, step)
+            left = slice(first - 1, last, step)
+            
+            top_score = value[top] - gap
+            diag_score = value[diag] + match[cell]
+            left_score = value[left] - gap
+            
+            # The chosen direction always holds the largest value, so the
+            #  precedence (diagonal, top, left) only matters on ties.
+            best = maximum(maximum(diag_score, top_score), maximum(left_score, 0))
+            is_diag = diag_score == best
+            is_top = ~is_diag & (top_score == best)
+            is_left = ~is_diag & ~is_top & (left_score == best)
+            
+            value[cell] = best
+            gaps[cell] = where(is_diag, gaps[diag],
+                               where(is_top, gaps[top] + 1,
+                                     where(is_left, gaps[left] + 1, 0)))
+            direction[cell] = where(is_diag, EIGAs.DIAG,
+                                    where(is_top, EIGAs.TOP,
+                                          where(is_left, EIGAs.LEFT, EIGAs.NONE)))
+        
+        return value.reshape(rows, cols), gaps.reshape(rows, cols), direction.reshape(rows, cols)
+    
+    @staticmethod
+    def _local_traceback(value, gaps, direction, max_gaps, k=None, min_score=None):
+        """
+        Rebuilds the locally aligned index sequences.
+        
+        Cells with at most max_gaps gaps are considered from the highest
+        value down (the cell deepest into the matrix wins ties). Cells that
+        are part of an earlier alignment are not considered again.
+        
+        Key arguments:
+        value     -- matrix of DP values.
+        gaps      -- matrix of DP gap counts.
+        direction -- matrix of DP directions.
+        max_gaps  -- maximum number of gaps of the optimal cell.
+        k         -- maximum number of alignments. [optional]
+        min_score -- minimum value of the optimal cell. [optional]
+        """
+        rows, cols = value.shape
+        
+        top, diag, left = EIGAs.TOP, EIGAs.DIAG, EIGAs.LEFT
         
-        # Sort the optimal list, order is preserved so the top valued node deepest into
-        #  the matrix is considered first.
-        optimals.sort(key=lambda node: node.value)
+        direction_flat = direction.ravel()
         
-        # We could probably do some post filtering here as well...
-        #  for now, lets just return the top node
-        #optimals = optimals[:1]
+        # Flat cells of the alignments so far.
+        visited = set()
         
         seqs = []
-        while optimals:
-            optimal = optimals.pop()
+        for i, j in EIGAs._local_candidates(value, gaps, direction, max_gaps, visited, k, min_score):
+            optimal = EIGAs.Cell(value.item(i, j), gaps.item(i, j), i, j)
             
+            # The true indices need to be shifted back one due to DP.
             seq1 = []
             seq2 = []
-            node = optimal
-            
-            while node != None:
-                # If this node is in the list, remove it so we don't process this path again!
-                try:
-                    optimals.remove(node)
-                except ValueError:
-                    pass
-                
-                # The true indices need to be shifted back one due to DP.
-                index1 = node.indices1
-                if index1 != None:
-                    index1 -= 1
-                index2 = node.indices2
-                if index2 != None:
-                    index2 -= 1
+            while True:
+                visited.add(i * cols + j)
                 
-                seq1.insert(0, index1)
-                seq2.insert(0, index2)
-                
-                node = node.prev
+                d = direction_flat.item(i * cols + j)
+                if d == diag:
+                    seq1.append(i - 1)
+                    seq2.append(j - 1)
+                    i -= 1
+                    j -= 1
+                elif d == top:
+                    seq1.append(i - 1)
+                    seq2.append(None)
+                    i -= 1
+                elif d == left:
+                    seq1.append(None)
+                    seq2.append(j - 1)
+                    j -= 1
+                else:
+                    # First row, first column or a cell that starts fresh.
+                    seq1.append(i - 1 if i and not j else None)
+                    seq2.append(j - 1 if j and not i else None)
+                    break
             
-            # Remove unnecessary gap due to first node at 0,0.
+            seq1.reverse()
+            seq2.reverse()
+            
+            # Remove unnecessary gap due to the first node.
             if seq1[0] == None and seq2[0] == None:
                 seq1.pop(0)
                 seq2.pop(0)
             
-            # This will the trim a lot of unecessary alignments that might have passed the
-            #  max gap threshold.
             if len(seq1) > 0 and len(seq2) > 0:
                 seqs.append((optimal, seq1, seq2))
         
-        return matrix, seqs
\ No newline at end of file
+        return seqs
+    
+    @staticmethod
+    def _local_candidates(value, gaps, direction, max_gaps, visited, k=None, min_score=None):
+        """
+        Yields the row and column of each candidate optimal cell that is not
+        part of an earlier alignment, from the highest value down and the
+        cell deepest into the matrix first on ties.
+        
+        Without k every candidate is sorted at once. Otherwise the matrices
+        are scanned a block of rows at a time into a heap of the best
+        candidates, as many as the alignments still wanted plus the visited
+        cells skipped so far, and only scanned again, below the last
+        candidate of the heap, once visited cells used it up. Memory is then
+        O(k + cells of the alignments).
+        
+        Key arguments:
+        value     -- matrix of DP values.
+        gaps      -- matrix of DP gap counts.
+        direction -- matrix of DP directions.
+        max_gaps  -- maximum number of gaps of the optimal cell.
+        visited   -- flat cells that are part of an earlier alignment.
+        k         -- maximum number of alignments. [optional]
+        min_score -- minimum value of the optimal cell. [optional]
+        """
+        rows, cols = value.shape
+        
+        size = (rows - 1) * (cols - 1)
+        block = max(1, EIGAs.LOCAL_BLOCK // max(1, cols - 1))
+        
+        found = 0
+        skipped = 0
+        bound = None
+        while k is None or found < k:
+            if k is None:
+                capacity = None
+                batch = sort(EIGAs._local_keys(value, gaps, direction, max_gaps, min_score, 1, rows))[::-1].tolist()
+            else:
+                capacity = k - found + skipped
+                
+                heap = []
+                for start in range(1, rows, block):
+                    keys = EIGAs._local_keys(value, gaps, direction, max_gaps, min_score,
+                                             start, min(rows, start + block))
+                    
+                    # Only the keys below the previous heap that make it into
+                    #  this one.
+                    if bound is not None:
+                        keys = keys[keys < bound]
+                    if len(heap) >= capacity:
+                        keys = keys[keys > heap[0]]
+                    if len(keys) > capacity:
+                        keys = keys[argpartition(keys, len(keys) - capacity)[len(keys) - capacity:]]
+                    
+                    for key in keys.tolist():
+                        if len(heap) < capacity:
+                            heappush(heap, key)
+                        else:
+                            heappushpop(heap, key)
+                
+                batch = sorted(heap, reverse=True)
+            
+            for key in batch:
+                i = (key % size) // (cols - 1) + 1
+                j = (key % size) % (cols - 1) + 1
+                
+                # Skip cells that are already part of an alignment.
+                if i * cols + j in visited:
+                    skipped += 1
+                    continue
+                
+                yield i, j
+                
+                found += 1
+                if k is not None and found >= k:
+                    return
+            
+            # A batch that isn't full held every candidate left.
+            if capacity is None or len(batch) < capacity:
+                return
+            
+            bound = batch[-1]
+    
+    @staticmethod
+    def _local_keys(value, gaps, direction, max_gaps, min_score, start, stop):
+        """
+        Returns the keys of the candidate optimal cells of a block of rows,
+        ordered by value, then by position.
+        
+        Key arguments:
+        value     -- matrix of DP values.
+        gaps      -- matrix of DP gap counts.
+        direction -- matrix of DP directions.
+        max_gaps  -- maximum number of gaps of the optimal cell.
+        min_score -- minimum value of the optimal cell, or None.
+        start     -- first row of the block.
+        stop      -- row after the block.
+        """
+        rows, cols = value.shape
+        
+        inner = value[start:stop, 1:]
+        mask = (gaps[start:stop, 1:] <= max_gaps) & (direction[start:stop, 1:] != EIGAs.NONE)
+        if min_score is not None:
+            mask &= inner >= min_score
+        
+        candidates = flatnonzero(mask)
+        
+        # Unique keys, the value and then the flat position in the matrix
+        #  without the extra row and column.
+        keys = inner.ravel()[candidates].astype(int64) * ((rows - 1) * (cols - 1))
+        
+        return keys + (start - 1) * (cols - 1) + candidates
@@ -0,0 +1,196 @@
+"""
+Searches one protein against a database of fingerprints with the EIGAs
+algorithm.
+
+Targets are scored in batches, in this process or in a pool of processes
+that only receives the query once per batch, and the best hits are kept in
+the order of the targets for equal scores. An optional prefilter skips the targets that can't make it
+into the hits.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .allvsall import global_compare, local_compare
+from .exception import EIGAsException
+from .protein.core import Protein
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heapreplace
+
+def search_batch(compare, query, targets):
+    """
+    Returns the results of comparing the query with each target.
+    
+    Key arguments:
+    compare -- module level function comparing two proteins.
+    query   -- the query protein.
+    targets -- the target proteins.
+    """
+    return [compare(query, target) for target in targets]
+
+class FingerprintDatabase(object):
+    
+    GLOBAL = 'global'
+    LOCAL = 'local'
+    
+    # Comparison of each mode and the position of the ranking score in its
+    #  result. Global hits are ranked by aligned residues, local hits by value.
+    MODES = {GLOBAL: (global_compare, 0),
+             LOCAL: (local_compare, 1)}
+    
+    # Targets scored per task.
+    BATCH = 32
+    
+    # A search hit, score is the number of aligned residues (global) or the
+    #  alignment value (local).
+    Hit = namedtuple('Hit', ('index', 'name', 'score', 'length'))
+    
+    def __init__(self, proteins, jobs=1):
+        """
+        Init.
+        
+        Key arguments:
+        proteins -- the fingerprinted target proteins.
+        jobs     -- number of processes. [optional]
+        """
+        # Searches only need the fingerprints.
+        self.proteins = [Protein.restore(protein.name, None, None, protein.fingerprint) for protein in proteins]
+        self.jobs = jobs
+    
+    @classmethod
+    def open(cls, corpus, jobs=1):
+        """
+        Returns the database of every protein in a corpus.
+        
+        Key arguments:
+        corpus -- the protein corpus.
+        jobs   -- number of processes. [optional]
+        """
+        return cls(corpus.proteins(), jobs)
+    
+    def search(self, query, k=10, mode=GLOBAL, prefilter=None):
+        """
+        Returns the k best hits of the query, best first.
+        
+        With a prefilter, targets are compared from the highest bound down and
+        the ones that can't reach the k-th best hit so far, or the threshold of
+        the prefilter, are skipped. Only hits reaching the threshold are
+        returned.
+        
+        Key arguments:
+        query     -- the query protein.
+        k         -- the number of hits. [optional]
+        mode      -- global or local alignment. [optional]
+        prefilter -- prefilter of the same mode. [optional]
+        """
+        if mode not in FingerprintDatabase.MODES:
+            raise EIGAsException('Search mode not supported: ' + str(mode))
+        
+        if prefilter is not None and prefilter.mode != mode:
+            raise EIGAsException('Prefilter mode does not match the search mode: ' + str(prefilter.mode))
+        
+        compare, rank = FingerprintDatabase.MODES[mode]
+        
+        query = Protein.restore(query.name, None, None, query.fingerprint)
+        
+        order = list(range(len(self.proteins)))
+        bounds = None
+        if prefilter is not None:
+            # Most promising targets first, so the k-th best hit rises quickly.
+            bounds = [prefilter.bound(query, target) for target in self.proteins]
+            order.sort(key=lambda i: -bounds[i])
+        
+        # The k best hits so far, worst first. Equal scores rank the first
+        #  target higher.
+        best = []
+        
+        def threshold():
+            """
+            Returns the result a target has to reach, None if any will do.
+            """
+            values = []
+            if prefilter.threshold is not None:
+                values.append(prefilter.threshold)
+            if k > 0 and len(best) == k:
+                values.append(best[0][0])
+            return max(values) if values else None
+        
+        for i, result in self._results(compare, query, order, prefilter, bounds, threshold):
+            hit = FingerprintDatabase.Hit(i, self.proteins[i].name, result[rank], result[1 - rank])
+            
+            if prefilter is not None and prefilter.threshold is not None and hit.score < prefilter.threshold:
+                continue
+            
+            item = (hit.score, -i, hit)
+            if len(best) < k:
+                heappush(best, item)
+            elif best and item > best[0]:
+                heapreplace(best, item)
+        
+        return [hit for _, _, hit in sorted(best, reverse=True)]
+    
+    def _results(self, compare, query, order, prefilter, bounds, threshold):
+        """
+        Yields the index and result of each target compared.
+        
+        Key arguments:
+        compare   -- module level function comparing two proteins.
+        query     -- the query protein.
+        order     -- the order to compare the targets in.
+        prefilter -- the prefilter, or None.
+        bounds    -- the bound of each target, or None.
+        threshold -- function returning the result a target has to reach.
+        """
+        order = deque(order)
+        
+        def batch(size):
+            """
+            Returns up to size targets that can still make it.
+            """
+            targets = []
+            while order and len(targets) < size:
+                i = order.popleft()
+                if prefilter is None or not prefilter.prune(query, self.proteins[i], threshold(), bounds[i]):
+                    targets.append(i)
+            return targets
+        
+        # Smaller batches when there are too few targets to keep every process
+        #  busy, or to let the threshold rise between batches.
+        size = max(1, min(FingerprintDatabase.BATCH, -(-len(order) // (4 * max(1, self.jobs)))))
+        
+        # The same batches are scored in this process, without a pool.
+        if self.jobs <= 1:
+            while True:
+                targets = batch(size)
+                if not targets:
+                    break
+                for i, result in zip(targets, search_batch(compare, query, [self.proteins[i] for i in targets])):
+                    yield i, result
+            return
+        
+        # Keep a bounded number of batches in flight, so the threshold used to
+        #  prune is never far behind.
+        executor = ProcessPoolExecutor(max_workers=self.jobs)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < 2 * self.jobs:
+                    targets = batch(size)
+                    if not targets:
+                        break
+                    pending.append((targets, executor.submit(search_batch, compare, query,
+                                                             [self.proteins[i] for i in targets])))
+                
+                if not pending:
+                    break
+                
+                targets, future = pending.popleft()
+                for i, result in zip(targets, future.result()):
+                    yield i, result
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
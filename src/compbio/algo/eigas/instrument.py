@@ -0,0 +1,207 @@
+"""
+Opt-in instrumentation of the EIGAs stages.
+
+Parsing, the steps of fingerprinting a protein and the steps of the global and
+local alignments are recorded as stages with their wall time and matrix
+shape. Recording is off by default; a disabled stage is a shared object doing
+nothing, so the cost is one call per stage, never per DP cell.
+
+The stages can be summarized as a table (calls, time, cells per second) or
+exported as a Chrome trace, to be viewed on a timeline in chrome://tracing or
+Perfetto.
+
+Stages run in other processes (e.g. parallel all-vs-all jobs) are not
+recorded.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from collections import namedtuple
+from timeit import default_timer
+
+import json
+import os
+import threading
+
+class Instrument(object):
+    
+    # Record stages.
+    enabled = False
+    
+    # A recorded stage, start and duration in seconds, shape of its matrix
+    #  (rows, cols) or sequence (length,), if any.
+    Event = namedtuple('Event', ('name', 'start', 'duration', 'shape', 'pid', 'tid'))
+    
+    # Recorded stages, in the order they finished.
+    events = []
+    
+    @classmethod
+    def start(cls):
+        """
+        Clears the recorded stages and starts recording.
+        """
+        Instrument.events = []
+        Instrument.enabled = True
+    
+    @classmethod
+    def stop(cls):
+        """
+        Stops recording, returning the recorded stages.
+        """
+        Instrument.enabled = False
+        return Instrument.events
+    
+    @classmethod
+    def stage(cls, name, shape=None):
+        """
+        Returns a context manager recording a stage.
+        
+        The shape can also be set on the returned stage before it finishes.
+        
+        Key arguments:
+        name  -- the stage, e.g. protein.eigen.
+        shape -- the shape of the matrix the stage computes. [optional]
+        """
+        if not Instrument.enabled:
+            return _NULL
+        
+        return _Stage(name, shape)
+    
+    @staticmethod
+    def cells(shape):
+        """
+        Returns the number of cells of a shape.
+        
+        Key arguments:
+        shape -- the shape, or None.
+        """
+        if shape is None:
+            return 0
+        
+        cells = 1
+        for size in shape:
+            cells *= size
+        return cells
+    
+    @classmethod
+    def summary(cls, events=None):
+        """
+        Returns the calls, total time, cells and cells per second of each
+        stage, ordered by the time of their first call.
+        
+        Key arguments:
+        events -- the recorded stages, the current ones by default. [optional]
+        """
+        if events is None:
+            events = Instrument.events
+        
+        stages = {}
+        for event in sorted(events, key=lambda event: event.start):
+            if event.name not in stages:
+                stages[event.name] = {'order': len(stages), 'calls': 0, 'time': 0.0, 'cells': 0, 'largest': None}
+            
+            stage = stages[event.name]
+            stage['calls'] += 1
+            stage['time'] += event.duration
+            stage['cells'] += Instrument.cells(event.shape)
+            if event.shape is not None and (stage['largest'] is None or
+                                            Instrument.cells(event.shape) > Instrument.cells(stage['largest'])):
+                stage['largest'] = tuple(event.shape)
+        
+        for stage in stages.values():
+            stage['cells_per_second'] = stage['cells'] / stage['time'] if stage['cells'] and stage['time'] > 0 else None
+        
+        return sorted(stages.items(), key=lambda item: item[1]['order'])
+    
+    @classmethod
+    def table(cls, events=None):
+        """
+        Returns the summary as a text table.
+        
+        Key arguments:
+        events -- the recorded stages, the current ones by default. [optional]
+        """
+        lines = ['{0:<20}{1:>8}{2:>12}{3:>12}{4:>14}{5:>16}  {6}'.format('stage', 'calls', 'total (s)', 'mean (ms)',
+                                                                         'cells', 'cells/s', 'largest')]
+        for name, stage in Instrument.summary(events):
+            lines.append('{0:<20}{1:>8}{2:>12.4f}{3:>12.3f}{4:>14}{5:>16}  {6}'.format(
+                name, stage['calls'], stage['time'], 1000 * stage['time'] / stage['calls'], stage['cells'],
+                '{0:.0f}'.format(stage['cells_per_second']) if stage['cells_per_second'] else '-',
+                'x'.join(str(size) for size in stage['largest']) if stage['largest'] else '-'))
+        
+        return '\n'.join(lines)
+    
+    @classmethod
+    def trace(cls, file_name, events=None):
+        """
+        Writes the stages as a Chrome trace.
+        
+        Key arguments:
+        file_name -- the location of the trace file.
+        events    -- the recorded stages, the current ones by default. [optional]
+        """
+        if events is None:
+            events = Instrument.events
+        
+        trace = []
+        for event in events:
+            args = {}
+            if event.shape is not None:
+                args['shape'] = list(event.shape)
+                args['cells'] = Instrument.cells(event.shape)
+            
+            # Complete events, in microseconds.
+            trace.append({'name': event.name,
+                          'cat': event.name.split('.')[0],
+                          'ph': 'X',
+                          'ts': event.start * 1e6,
+                          'dur': event.duration * 1e6,
+                          'pid': event.pid,
+                          'tid': event.tid,
+                          'args': args})
+        
+        with open(file_name, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+class _Stage(object):
+    
+    __slots__ = ('name', 'shape', '_start')
+    
+    def __init__(self, name, shape):
+        """
+        Init.
+        
+        Key arguments:
+        name  -- the stage.
+        shape -- the shape of the matrix the stage computes.
+        """
+        self.name = name
+        self.shape = shape
+    
+    def __enter__(self):
+        self._start = default_timer()
+        return self
+    
+    def __exit__(self, *exc):
+        duration = default_timer() - self._start
+        Instrument.events.append(Instrument.Event(self.name, self._start, duration, self.shape,
+                                                  os.getpid(), threading.current_thread().ident))
+        return False
+
+class _NullStage(object):
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def __setattr__(self, name, value):
+        # Shapes of disabled stages are dropped.
+        pass
+
+_NULL = _NullStage()
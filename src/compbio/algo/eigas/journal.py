@@ -0,0 +1,210 @@
+"""
+Durable journal of the pairs finished by an all-vs-all run.
+
+Every result is appended as one JSON line and synced to disk before the
+next pair, so a run that crashes or is preempted loses at most the pair it
+was working on. Reopening the journal returns the finished results, which
+the run skips. A line cut short by a crash is dropped.
+
+The first line holds the key of the run (e.g. the protein names and the
+comparison), a journal of another run is refused rather than mixed in.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .exception import EIGAsException
+
+import json
+import os
+
+class PairJournal(object):
+    
+    # Layout version of the journal.
+    VERSION = 1
+    
+    def __init__(self, path, key, sync=True):
+        """
+        Opens a journal, creating it if needed.
+        
+        Key arguments:
+        path -- the journal file.
+        key  -- JSON compatible identity of the run.
+        sync -- sync every result to disk. [optional]
+        """
+        self.path = path
+        self.sync = sync
+        
+        # Normalized the way it is read back.
+        header = json.loads(json.dumps({'version': PairJournal.VERSION, 'key': key}))
+        
+        self._results = {}
+        
+        if os.path.exists(path) and os.path.getsize(path):
+            found, self._results, end = PairJournal._read(path)
+            
+            if found != header:
+                raise EIGAsException('Journal of another run: ' + path)
+            
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+            
+            # Appended to, so a sharded worker that lost the journal to
+            #  another one never writes over its lines.
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'ab')
+            self._write(header)
+    
+    @staticmethod
+    def _read(path):
+        """
+        Returns the header, the results and the end of the last complete line
+        of a journal.
+        
+        Key arguments:
+        path -- the journal file.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        # Only complete lines count.
+        end = data.rfind(b'\n') + 1
+        lines = data[:end].decode('utf-8').splitlines()
+        
+        if not lines:
+            raise EIGAsException('Not a journal: ' + path)
+        
+        results = {}
+        for line in lines[1:]:
+            i, j, result = json.loads(line)
+            results[(i, j)] = PairJournal._restore(result)
+        
+        return json.loads(lines[0]), results, end
+    
+    @staticmethod
+    def load(path):
+        """
+        Returns the key and the results of a journal, without opening it for
+        more results.
+        
+        Key arguments:
+        path -- the journal file.
+        """
+        header, results, _ = PairJournal._read(path)
+        
+        if header.get('version') != PairJournal.VERSION:
+            raise EIGAsException('Journal version not supported: ' + path)
+        
+        return header['key'], results
+    
+    @staticmethod
+    def replace(path, key, results, sync=True):
+        """
+        Replaces a journal, e.g. of an earlier run on fewer proteins, with a
+        journal of another run holding the results.
+        
+        The new journal is written next to the old one and renamed over it
+        once synced, so a crash leaves either of them whole.
+        
+        Key arguments:
+        path    -- the journal file.
+        key     -- JSON compatible identity of the run.
+        results -- the results keyed by pair.
+        sync    -- sync the new journal to disk. [optional]
+        """
+        temporary = path + '.new'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        
+        journal = PairJournal(temporary, key, sync)
+        journal.extend(results)
+        journal.close()
+        
+        os.rename(temporary, path)
+        
+        # The rename itself is only durable once the directory is synced.
+        if sync:
+            directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+    
+    @staticmethod
+    def _restore(result):
+        """
+        Returns a result read back as a list as the tuple it was written as.
+        
+        Key arguments:
+        result -- the result.
+        """
+        if isinstance(result, list):
+            return tuple(PairJournal._restore(item) for item in result)
+        
+        return result
+    
+    @staticmethod
+    def _plain(value):
+        """
+        Returns a numpy scalar as a python one, for JSON.
+        
+        Key arguments:
+        value -- the value.
+        """
+        if hasattr(value, 'item'):
+            return value.item()
+        
+        raise TypeError('Not JSON serializable: ' + repr(value))
+    
+    def _write(self, *entries):
+        """
+        Appends entries as lines, synced to disk.
+        
+        Key arguments:
+        entries -- the JSON compatible entries.
+        """
+        for entry in entries:
+            self._file.write((json.dumps(entry, default=PairJournal._plain) + '\n').encode('utf-8'))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+    
+    def results(self):
+        """
+        Returns the results finished before the journal was opened, or added
+        with extend, keyed by pair.
+        """
+        return self._results
+    
+    def append(self, i, j, result):
+        """
+        Records the result of a finished pair.
+        
+        Key arguments:
+        i      -- index of the first protein.
+        j      -- index of the second protein.
+        result -- the result of the pair.
+        """
+        self._write([i, j, result])
+    
+    def extend(self, results):
+        """
+        Records the results of pairs finished elsewhere, e.g. by an earlier run
+        on fewer proteins, with a single sync.
+        
+        Key arguments:
+        results -- the results keyed by pair.
+        """
+        pairs = sorted(results)
+        self._write(*[[i, j, results[(i, j)]] for i, j in pairs])
+        
+        for pair in pairs:
+            self._results[pair] = results[pair]
+    
+    def close(self):
+        """
+        Closes the journal.
+        """
+        self._file.close()
@@ -0,0 +1,59 @@
+"""
+Precision policy of the EIGAs pipeline.
+
+The coordinates, distance and contact matrices, eigenvalues, fingerprints
+and protein corpora are stored with the floating point type of the policy.
+The full DP matrices of the alignments are too, the fingerprint differences
+and global values with its floating point type and the local values and
+gaps with its integer type. The recurrences compare sums of those stored
+values in Python floats, so the alignments only differ from double precision
+through the rounding of the fingerprints and their differences.
+
+Single precision halves the memory and bandwidth of every matrix and the
+size of a corpus; fingerprints then only agree with double precision to
+about six digits, which can flip near ties in the alignments.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .exception import EIGAsException
+
+from numpy import float32, float64, int32, int64
+
+class Precision(object):
+    
+    # Supported policies, with their floating point and integer types.
+    TYPES = {'float64': (float64, int64),
+             'float32': (float32, int32)}
+    
+    # Current policy.
+    policy = 'float64'
+    
+    @classmethod
+    def set(cls, policy):
+        """
+        Sets the policy of every protein and alignment from now on.
+        
+        Key arguments:
+        policy -- float64 or float32.
+        """
+        if policy not in Precision.TYPES:
+            raise EIGAsException('Precision policy not supported: ' + str(policy))
+        
+        Precision.policy = policy
+    
+    @classmethod
+    def floating(cls):
+        """
+        Returns the floating point type of the policy.
+        """
+        return Precision.TYPES[Precision.policy][0]
+    
+    @classmethod
+    def integer(cls):
+        """
+        Returns the integer type of the policy.
+        """
+        return Precision.TYPES[Precision.policy][1]
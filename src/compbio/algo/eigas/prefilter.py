@@ -0,0 +1,163 @@
+"""
+Cheap upper bounds of EIGAs alignments, used to skip pairs before the DP.
+
+Global alignments can't align more residues than the shortest protein has,
+and the alignment is at least as long as the longest protein, so the length
+ratio bounds the aligned fraction.
+
+Local alignments only gain value on the diagonal moves between residues
+whose fingerprints differ by less than the gap penalty. Each residue is used
+at most once, so the value is bounded by twice the gap penalty times the
+largest number of such pairs. Since residues only match values within a
+fixed distance, that number is found greedily on the sorted fingerprints.
+
+That bound ignores the order of the residues, and most residues find a
+match somewhere. An alignment ending in a cell with at most max_gaps gaps is
+at most max_gaps + 1 runs of diagonal moves, each worth no more than the best
+run of matches and mismatches along any diagonal, with a gap between two
+runs. The best run is found one row at a time, for every diagonal at once.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import EIGAs
+from .exception import EIGAsException
+
+from numpy import maximum, where, zeros
+
+class Prefilter(object):
+    
+    GLOBAL = 'global'
+    LOCAL = 'local'
+    
+    def __init__(self, mode=GLOBAL, threshold=None, max_gaps=0):
+        """
+        Init.
+        
+        Key arguments:
+        mode      -- global (aligned residues) or local (alignment value). [optional]
+        threshold -- pairs bounded below this are pruned. [optional]
+        max_gaps  -- maximum number of gaps of the optimal cell of the local
+                     alignments, as in EIGAs.local_align. [optional]
+        """
+        if mode not in (Prefilter.GLOBAL, Prefilter.LOCAL):
+            raise EIGAsException('Prefilter mode not supported: ' + str(mode))
+        
+        self.mode = mode
+        self.threshold = threshold
+        self.max_gaps = max_gaps
+        
+        # Pairs checked and pruned.
+        self.pairs = 0
+        self.pruned = 0
+    
+    @staticmethod
+    def matches(fingerprint1, fingerprint2):
+        """
+        Returns the largest number of residue pairs, each residue used once,
+        whose fingerprints differ by less than the gap penalty.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        """
+        gap = EIGAs.GAP_PENALTY
+        
+        values1 = sorted(fingerprint1)
+        values2 = sorted(fingerprint2)
+        l1 = len(values1)
+        l2 = len(values2)
+        
+        matches = i = j = 0
+        while i < l1 and j < l2:
+            if abs(values1[i] - values2[j]) < gap:
+                matches += 1
+                i += 1
+                j += 1
+            elif values1[i] < values2[j]:
+                i += 1
+            else:
+                j += 1
+        
+        return matches
+    
+    @staticmethod
+    def run(fingerprint1, fingerprint2):
+        """
+        Returns the largest value of a run of diagonal moves, matches scoring
+        twice the gap penalty and mismatches minus the gap penalty as in the
+        local DP.
+        
+        Key arguments:
+        fingerprint1 -- the first fingerprint.
+        fingerprint2 -- the second fingerprint.
+        """
+        gap = EIGAs.GAP_PENALTY
+        
+        match = where(EIGAs.scores(fingerprint1, fingerprint2) < gap, 2 * gap, -1 * gap)
+        if not match.size:
+            return 0
+        
+        # Best value of a run ending in each cell of the row, along its
+        #  diagonal.
+        best = 0
+        run = zeros(match.shape[1], dtype=match.dtype)
+        for row in match:
+            run[1:] = maximum(run[:-1] + row[1:], 0)
+            run[0] = max(row[0], 0)
+            best = max(best, int(run.max()))
+        
+        return best
+    
+    def bound(self, protein1, protein2):
+        """
+        Returns an upper bound of the aligned residues (global) or the value
+        (local) of the alignment of two proteins.
+        
+        Key arguments:
+        protein1 -- the first protein.
+        protein2 -- the second protein.
+        """
+        if self.mode == Prefilter.GLOBAL:
+            return min(len(protein1.fingerprint), len(protein2.fingerprint))
+        
+        gap = EIGAs.GAP_PENALTY
+        
+        run = Prefilter.run(protein1.fingerprint, protein2.fingerprint)
+        
+        return min(2 * gap * Prefilter.matches(protein1.fingerprint, protein2.fingerprint),
+                   run + self.max_gaps * max(0, run - gap))
+    
+    def prune(self, protein1, protein2, threshold=None, bound=None):
+        """
+        Returns whether the pair can't reach the threshold, counting it.
+        
+        Key arguments:
+        protein1  -- the first protein.
+        protein2  -- the second protein.
+        threshold -- the result to reach, the prefilter's by default. [optional]
+        bound     -- the bound of the pair, when already known. [optional]
+        """
+        self.pairs += 1
+        
+        if threshold is None:
+            threshold = self.threshold
+            if threshold is None:
+                return False
+        
+        if bound is None:
+            bound = self.bound(protein1, protein2)
+        
+        if bound < threshold:
+            self.pruned += 1
+            return True
+        
+        return False
+    
+    def report(self):
+        """
+        Returns a summary of the pruned pairs.
+        """
+        return 'Pruned {0} of {1} pairs.'.format(self.pruned, self.pairs)
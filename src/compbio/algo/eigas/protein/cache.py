@@ -0,0 +1,214 @@
+"""
+Persistent on-disk cache of protein fingerprints.
+
+Entries are keyed by the content of the protein file, the chain, the contact
+matrix cutoff, the precision policy and the fingerprint version, so a changed
+file or definition never returns a stale fingerprint. Each entry is a numpy .npz file holding
+the coordinates, eigenvalues and fingerprint.
+
+Entries are written to a temporary file and renamed into place, so several
+processes can share the same cache directory. The least recently used
+entries are evicted once the cache grows past its maximum size.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import Protein
+from .parser.core import ProteinParser
+from ..exception import EIGAsException
+from ..precision import Precision
+
+from numpy import asarray, load, savez
+
+import hashlib
+import os
+import tempfile
+
+class ProteinCache(object):
+    
+    # Parser types that read a file (the second parser argument).
+    FILE_TYPES = ('ca', 'pdb', 'txt')
+    
+    # Extension of the cache entries.
+    EXT = '.npz'
+    
+    def __init__(self, directory, max_size=2 ** 30):
+        """
+        Init.
+        
+        Key arguments:
+        directory -- the cache directory, created if missing.
+        max_size  -- maximum size of the cache in bytes. [optional]
+        """
+        self.directory = directory
+        self.max_size = max_size
+        
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another process may have just created it.
+                if not os.path.isdir(directory):
+                    raise
+    
+    def key(self, type, args):
+        """
+        Returns the cache key of a protein.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, txt).
+        args -- the parser arguments.
+        """
+        if type not in ProteinCache.FILE_TYPES:
+            raise EIGAsException('Protein parser type can not be cached: ' + type)
+        
+        digest = hashlib.sha1()
+        with open(args[1], 'rb') as f:
+            for block in iter(lambda: f.read(2 ** 20), b''):
+                digest.update(block)
+        
+        chain = args[2] if len(args) > 2 else None
+        
+        key = hashlib.sha1()
+        key.update(repr((type, digest.hexdigest(), chain, Protein.cutoff, Protein.fast,
+                         Protein.components if Protein.sparse else None, Protein.VERSION,
+                         Precision.policy)).encode('utf-8'))
+        
+        return key.hexdigest()
+    
+    def path(self, key):
+        """
+        Returns the location of a cache entry.
+        
+        Key arguments:
+        key -- the cache key.
+        """
+        return os.path.join(self.directory, key + ProteinCache.EXT)
+    
+    def get(self, type, args):
+        """
+        Returns the cached protein, or None if it is not cached.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, txt).
+        args -- the parser arguments.
+        """
+        path = self.path(self.key(type, args))
+        
+        try:
+            with open(path, 'rb') as f:
+                data = load(f)
+                coords = data['coords']
+                eigenvalues = data['eigenvalues']
+                fingerprint = data['fingerprint']
+        except (IOError, OSError, ValueError, KeyError):
+            # Missing, evicted or unreadable entry.
+            return None
+        
+        # Mark the entry as recently used.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        
+        return Protein.restore(args[0], coords, eigenvalues, fingerprint)
+    
+    def put(self, type, args, protein):
+        """
+        Stores a protein in the cache.
+        
+        Key arguments:
+        type    -- the type of parser (ca, pdb, txt).
+        args    -- the parser arguments.
+        protein -- the protein.
+        """
+        path = self.path(self.key(type, args))
+        
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                savez(f,
+                      coords=asarray(protein.coords, dtype=Precision.floating()),
+                      eigenvalues=asarray(protein.eigenvalues, dtype=Precision.floating()),
+                      fingerprint=asarray(protein.fingerprint, dtype=Precision.floating()))
+            os.rename(tmp, path)
+        except OSError:
+            # Renaming over an existing entry fails on some platforms, another
+            #  process already stored the same protein.
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if not os.path.exists(path):
+                raise
+        
+        self.evict()
+    
+    def protein(self, type, args):
+        """
+        Returns the cached protein, parsing and caching it when missing.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, txt).
+        args -- the parser arguments.
+        """
+        protein = self.get(type, args)
+        
+        if protein is None:
+            protein = Protein(ProteinParser.factory(type, args))
+            self.put(type, args, protein)
+        
+        return protein
+    
+    def proteins(self, type, args):
+        """
+        Returns the cached proteins, in the same order, parsing the missing
+        ones together so a file holding several of them is read once.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, txt).
+        args -- the list of parser arguments.
+        """
+        proteins = [self.get(type, a) for a in args]
+        
+        missing = [i for i, protein in enumerate(proteins) if protein is None]
+        if missing:
+            parsers = ProteinParser.factories(type, [args[i] for i in missing])
+            for i, parser in zip(missing, parsers):
+                proteins[i] = Protein(parser)
+                self.put(type, args[i], proteins[i])
+        
+        return proteins
+    
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its
+        maximum size.
+        """
+        entries = []
+        size = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(ProteinCache.EXT):
+                continue
+            
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            
+            entries.append((stat.st_mtime, name, stat.st_size))
+            size += stat.st_size
+        
+        entries.sort()
+        
+        for _, name, entry_size in entries:
+            if size <= self.max_size:
+                break
+            
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Already evicted by another process.
+                pass
+            
+            size -= entry_size
@@ -13,15 +13,61 @@ Terre Haute, IN 47803
 @copyright 2011 Aaron Zampaglione
 @license MIT
 """
-from numpy import diag, dot, float, zeros
-from numpy.linalg import svd
+from numpy import absolute, arange, argmax, argsort, asarray, concatenate, empty, float64, ones, sign, sqrt, where
+from numpy.linalg import eigh, svd
+from numpy.random import RandomState
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import eigsh
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 
+from ..instrument import Instrument
+from ..precision import Precision
+
 class Protein(object):
     
     # Contact matrix cutoff.
     cutoff = 8
     
+    # Use the symmetric eigensolver instead of the SVD.
+    fast = False
+    
+    # Use a sparse contact matrix and only find the largest eigenvalues.
+    sparse = False
+    
+    # Number of eigenvalues found with a sparse contact matrix.
+    components = 64
+    
+    # Rows of the distance matrix computed at once in single precision.
+    BLOCK = 256
+    
+    # Version of the fingerprint definition (part of the cache keys).
+    VERSION = 1
+    
+    @classmethod
+    def dmatrix(cls, coords):
+        """
+        Creates a distance matrix.
+        
+        In single precision the distances are computed a block of rows at a
+        time, so no double precision matrix of the whole protein is built.
+        
+        Key arguments:
+        coords -- the alpha carbon atom coordinates.
+        """
+        coords = asarray(coords, dtype=Precision.floating()).reshape(-1, 3)
+        
+        if coords.dtype == float64:
+            return cdist(coords, coords)
+        
+        l = len(coords)
+        
+        dmatrix = empty((l, l), dtype=coords.dtype)
+        for start in range(0, l, Protein.BLOCK):
+            dmatrix[start:start + Protein.BLOCK] = cdist(coords[start:start + Protein.BLOCK], coords)
+        
+        return dmatrix
+    
     @classmethod
     def cmatrix(cls, dmatrix):
         """
@@ -30,21 +76,118 @@ class Protein(object):
         Key arguments:
         dmatrix -- distance matrix
         """
-        l = len(dmatrix)
-        rows = range(l)
-        cols = range(l)
+        dmatrix = asarray(dmatrix, dtype=Precision.floating())
         
         k = 1 / Protein.cutoff
         
-        cmatrix = zeros((l, l), dtype=float)
+        return where((dmatrix >= 0.0) & (dmatrix <= Protein.cutoff), 1 - k * dmatrix, 0.0)
+    
+    @classmethod
+    def sparse_cmatrix(cls, coords):
+        """
+        Creates a sparse contact matrix.
+        
+        Only residues within the cutoff of each other are compared, using a
+        KD-tree.
+        
+        Key arguments:
+        coords -- the alpha carbon atom coordinates.
+        """
+        coords = asarray(coords, dtype=Precision.floating()).reshape(-1, 3)
+        l = len(coords)
+        
+        k = 1 / Protein.cutoff
+        
+        pairs = cKDTree(coords).query_pairs(Protein.cutoff, output_type='ndarray')
+        i = pairs[:, 0]
+        j = pairs[:, 1]
         
-        for i in rows:
-            for j in cols:
-                value = dmatrix[i][j]
-                if value >= 0.0 and value <= Protein.cutoff:
-                    cmatrix[i][j] = 1 - k * value
+        values = 1 - k * sqrt(((coords[i] - coords[j]) ** 2).sum(axis=1))
         
-        return cmatrix
+        # Both halves of the symmetric matrix plus the diagonal.
+        diagonal = arange(l)
+        return coo_matrix((concatenate((values, values, ones(l, dtype=coords.dtype))),
+                           (concatenate((i, j, diagonal)), concatenate((j, i, diagonal)))),
+                          shape=(l, l)).tocsr()
+    
+    @classmethod
+    def eigen(cls, cmatrix):
+        """
+        Returns the eigenvalues and transposed eigenvectors of a contact matrix
+        using the symmetric eigensolver.
+        
+        Key arguments:
+        cmatrix -- contact matrix
+        """
+        return Protein._canonical(*eigh(cmatrix))
+    
+    @classmethod
+    def sparse_eigen(cls, cmatrix, components):
+        """
+        Returns the largest eigenvalues and their transposed eigenvectors of a
+        sparse contact matrix using an iterative eigensolver.
+        
+        Key arguments:
+        cmatrix    -- sparse contact matrix
+        components -- number of eigenvalues to find.
+        """
+        l = cmatrix.shape[0]
+        
+        # The iterative solver needs fewer components than rows.
+        if components >= l - 1:
+            eigvalues, eigvectorsT = Protein.eigen(cmatrix.toarray())
+            return eigvalues[:components], eigvectorsT[:components]
+        
+        # Fixed start vector so the result is reproducible.
+        v0 = RandomState(0).rand(l)
+        
+        return Protein._canonical(*eigsh(cmatrix, k=components, which='LM', v0=v0))
+    
+    @staticmethod
+    def _canonical(eigvalues, eigvectors):
+        """
+        Orders eigenvalues and eigenvectors like the SVD.
+        
+        The absolute eigenvalues are returned in decreasing order with the
+        transposed eigenvectors. The sign of an eigenvector is arbitrary, so
+        each one is flipped to make its largest component positive.
+        
+        Key arguments:
+        eigvalues  -- the eigenvalues.
+        eigvectors -- the eigenvectors (columns).
+        """
+        eigvalues = absolute(eigvalues)
+        order = argsort(-eigvalues, kind='mergesort')
+        
+        eigvalues = eigvalues[order]
+        eigvectorsT = eigvectors[:, order].T
+        
+        largest = argmax(absolute(eigvectorsT), axis=1)
+        eigvectorsT *= sign(eigvectorsT[arange(len(eigvectorsT)), largest])[:, None]
+        
+        return eigvalues, eigvectorsT
+    
+    @classmethod
+    def restore(cls, name, coords, eigenvalues, fingerprint):
+        """
+        Restores a protein from a previously computed fingerprint.
+        
+        The R matrix is not restored.
+        
+        Key arguments:
+        name        -- the name of this protein.
+        coords      -- the alpha carbon atom coordinates.
+        eigenvalues -- the eigenvalues of the contact matrix.
+        fingerprint -- the fingerprint.
+        """
+        protein = cls.__new__(cls)
+        protein.name = name
+        protein.coords = coords
+        protein.eigenvalues = eigenvalues
+        protein.fingerprint = list(fingerprint)
+        protein.r = None
+        
+        return protein
     
     def __init__(self, parser):
         """
@@ -54,37 +197,51 @@ class Protein(object):
         name   -- the name of this protein.
         parser -- the protein parser.
         """
-        # Initialize fingerprint.
-        self.fingerprint = []
-        
         # Set the protein name.
         self.name = parser.name()
         
         # Find the atomic coordinates from the parser.
-        self.coords = parser.coords()
-        
-        # Calculate distance matrix
-        dmatrix = cdist(self.coords, self.coords)
+        self.coords = asarray(parser.coords(), dtype=Precision.floating()).reshape(-1, 3)
         
-        # Create the contact matrix.
-        cmatrix = Protein.cmatrix(dmatrix)
+        shape = (len(self.coords), len(self.coords))
         
-        # Test definition 1
-        #ei = zeros((1, len(cmatrix[0:])), dtype=float)[0]
-        #ei[0] = 1.0
-        #ej = zeros((1, len(cmatrix[0:])), dtype=float)[0]
-        #ej[1] = 1.0
-        #print(inner(ei, inner(cmatrix, ej)) == cmatrix[0][1])
-        
-        # Find the eigvalues and eigvectors of the contact matrix.
-        _, eigvalues, eigvectorsT = svd(cmatrix)
+        if Protein.sparse:
+            # Only the largest eigenvalues of a sparse contact matrix.
+            with Instrument.stage('protein.contact', shape):
+                cmatrix = Protein.sparse_cmatrix(self.coords)
+            with Instrument.stage('protein.eigen', shape):
+                eigvalues, eigvectorsT = Protein.sparse_eigen(cmatrix, Protein.components)
+        else:
+            # Calculate distance matrix
+            with Instrument.stage('protein.distance', shape):
+                dmatrix = Protein.dmatrix(self.coords)
+            
+            # Create the contact matrix.
+            with Instrument.stage('protein.contact', shape):
+                cmatrix = Protein.cmatrix(dmatrix)
             
+            # Test definition 1
+            #ei = zeros((1, len(cmatrix[0:])), dtype=float)[0]
+            #ei[0] = 1.0
+            #ej = zeros((1, len(cmatrix[0:])), dtype=float)[0]
+            #ej[1] = 1.0
+            #print(inner(ei, inner(cmatrix, ej)) == cmatrix[0][1])
+            
+            # Find the eigvalues and eigvectors of the contact matrix.
+            with Instrument.stage('protein.eigen', shape):
+                if Protein.fast:
+                    eigvalues, eigvectorsT = Protein.eigen(cmatrix)
+                else:
+                    _, eigvalues, eigvectorsT = svd(cmatrix)
+        
         # Check SVD decomposition
         #c = dot(eigvectors, dot(diag(eigvalues), eigvectorsT))
         #print(abs(cmatrix - c) < (1 ** -15))
         
+        self.eigenvalues = eigvalues
+        
         # Calculate R
-        self.r = dot(diag(eigvalues) ** 0.5, eigvectorsT)
+        self.r = (eigvalues ** 0.5)[:, None] * eigvectorsT
         
         # Test proof 2
         #from numpy import inner
@@ -97,18 +254,9 @@ class Protein(object):
         #ri = inner(r, ei).transpose()
         #rj = inner(r, ej)
         #print(abs(inner(ri, rj) - cmatrix[i][j]) < (1 ** -15))
-                       
+        
         # For each residue, we want to assign the "best"
         #  eigenvalue.
         #
         # @see section 3.1 of the report
-        for j in range(len(self.coords)):
-            max_index = None
-            max_value = None
-                
-            for i in range(len(self.r[:][0])):
-                if (self.r[i][j] > max_value):
-                    max_index = i
-                    max_value = self.r[i][j]
-                
-            self.fingerprint.append(eigvalues[max_index])
\ No newline at end of file
+        self.fingerprint = list(eigvalues[argmax(self.r, axis=0)])
@@ -0,0 +1,271 @@
+"""
+Precompiled binary corpus of proteins.
+
+A corpus is a single file holding the alpha carbon coordinates, eigenvalues
+and fingerprints of many proteins, concatenated into one array each, along
+with a name, chain and family index. Per protein offsets into each array are
+stored alongside, so a protein is a slice of a memory map and opening a
+corpus does not read any of the arrays. Worker processes opening the same
+corpus share its pages.
+
+File layout:
+    
+    magic (8 bytes) | header length (uint64) | JSON header | arrays
+
+Every array starts on an ALIGN byte boundary, at the offset (relative to the
+end of the padded header) and with the shape and type given in the header.
+
+The coordinates, eigenvalues and fingerprints are stored with the floating
+point type of the precision policy, so a single precision corpus is half the
+size. The policy is part of the settings.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import Protein
+from .parser.core import ProteinParser
+from ..exception import EIGAsException
+from ..precision import Precision
+
+from numpy import asarray, concatenate, cumsum, dtype, int64, integer, memmap, zeros
+
+import json
+import os
+import struct
+import tempfile
+
+class ProteinCorpus(object):
+    
+    # Identifies a corpus file and its layout version.
+    MAGIC = b'EIGASCP2'
+    
+    # Byte boundary of every array.
+    ALIGN = 64
+    
+    # Arrays of a corpus, in file order, with their type or None for the
+    #  floating point type of the policy. The offsets hold, for each
+    #  protein, the first row of its coordinates, eigenvalues and fingerprint.
+    SECTIONS = (('offsets', '<i8'),
+                ('coords', None),
+                ('eigenvalues', None),
+                ('fingerprints', None))
+    
+    def __init__(self, path):
+        """
+        Opens a corpus.
+        
+        Key arguments:
+        path -- the corpus file.
+        """
+        self.path = path
+        
+        with open(path, 'rb') as f:
+            if f.read(len(ProteinCorpus.MAGIC)) != ProteinCorpus.MAGIC:
+                raise EIGAsException('Not a protein corpus: ' + path)
+            
+            length = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(length).decode('utf-8'))
+        
+        # Fingerprints of other settings would be silently wrong.
+        if header['settings'] != ProteinCorpus.settings():
+            raise EIGAsException('Protein corpus built with other fingerprint settings: ' + path)
+        
+        self.names = [str(name) for name in header['names']]
+        self.chains = [str(chain) if chain is not None else None for chain in header['chains']]
+        self.families = [str(family) if family is not None else None for family in header['families']]
+        
+        self._index = dict((name, i) for i, name in enumerate(self.names))
+        
+        start = ProteinCorpus.align(len(ProteinCorpus.MAGIC) + 8 + length)
+        for name, _ in ProteinCorpus.SECTIONS:
+            offset, shape, type = header['sections'][name]
+            shape = tuple(shape)
+            
+            # Empty arrays can't be mapped.
+            if 0 in shape:
+                array = zeros(shape, dtype=type)
+            else:
+                array = memmap(path, dtype=type, mode='r', offset=start + offset, shape=shape)
+            
+            setattr(self, '_' + name, array)
+    
+    @staticmethod
+    def align(offset):
+        """
+        Returns the offset rounded up to the byte boundary of the arrays.
+        
+        Key arguments:
+        offset -- the offset in bytes.
+        """
+        return -(-offset // ProteinCorpus.ALIGN) * ProteinCorpus.ALIGN
+    
+    @staticmethod
+    def types():
+        """
+        Returns the type of each array under the precision policy.
+        """
+        floating = dtype(Precision.floating()).newbyteorder('<').str
+        
+        return dict((name, type or floating) for name, type in ProteinCorpus.SECTIONS)
+    
+    @staticmethod
+    def settings():
+        """
+        Returns the protein settings the fingerprints depend on.
+        """
+        return {'cutoff': Protein.cutoff,
+                'fast': Protein.fast,
+                'components': Protein.components if Protein.sparse else None,
+                'precision': Precision.policy,
+                'version': Protein.VERSION}
+    
+    @staticmethod
+    def build(path, proteins, chains=None, families=None):
+        """
+        Writes a corpus.
+        
+        Key arguments:
+        path     -- the corpus file.
+        proteins -- the proteins.
+        chains   -- the chain of each protein. [optional]
+        families -- the family of each protein. [optional]
+        """
+        l = len(proteins)
+        types = ProteinCorpus.types()
+        
+        coords = [asarray(protein.coords, dtype=types['coords']).reshape(-1, 3) for protein in proteins]
+        eigenvalues = [asarray(protein.eigenvalues, dtype=types['eigenvalues']) for protein in proteins]
+        fingerprints = [asarray(protein.fingerprint, dtype=types['fingerprints']) for protein in proteins]
+        
+        offsets = zeros((l + 1, 3), dtype=int64)
+        for column, arrays in enumerate((coords, eigenvalues, fingerprints)):
+            offsets[1:, column] = cumsum([len(array) for array in arrays])
+        
+        arrays = {'offsets': offsets,
+                  'coords': concatenate(coords) if l else zeros((0, 3)),
+                  'eigenvalues': concatenate(eigenvalues) if l else zeros(0),
+                  'fingerprints': concatenate(fingerprints) if l else zeros(0)}
+        
+        # Place every array on the byte boundary.
+        sections = {}
+        offset = 0
+        for name, _ in ProteinCorpus.SECTIONS:
+            arrays[name] = asarray(arrays[name], dtype=types[name])
+            sections[name] = (offset, arrays[name].shape, types[name])
+            offset = ProteinCorpus.align(offset + arrays[name].nbytes)
+        
+        header = json.dumps({'settings': ProteinCorpus.settings(),
+                             'names': [protein.name for protein in proteins],
+                             'chains': list(chains) if chains is not None else [None] * l,
+                             'families': list(families) if families is not None else [None] * l,
+                             'sections': sections}).encode('utf-8')
+        
+        start = ProteinCorpus.align(len(ProteinCorpus.MAGIC) + 8 + len(header))
+        
+        # Write next to the corpus and rename into place, readers never see
+        #  a partial corpus.
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(ProteinCorpus.MAGIC)
+                f.write(struct.pack('<Q', len(header)))
+                f.write(header)
+                
+                for name, _ in ProteinCorpus.SECTIONS:
+                    f.write(b'\0' * (start + sections[name][0] - f.tell()))
+                    f.write(arrays[name].tobytes())
+            
+            # Readable by the other processes sharing it.
+            os.chmod(tmp, 0o644)
+            os.rename(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    
+    @staticmethod
+    def compile(path, type, args, families=None, registry=None):
+        """
+        Fingerprints proteins, writes them to a corpus and opens it.
+        
+        Key arguments:
+        path     -- the corpus file.
+        type     -- the type of parser (ca, pdb, raw, txt).
+        args     -- the list of parser arguments.
+        families -- the family of each protein. [optional]
+        registry -- protein registry to build the proteins with. [optional]
+        """
+        if registry is not None:
+            proteins = registry.proteins(type, args)
+        else:
+            proteins = [Protein(parser) for parser in ProteinParser.factories(type, args)]
+        
+        chains = [a[2] if len(a) > 2 else None for a in args]
+        
+        ProteinCorpus.build(path, proteins, chains, families)
+        
+        return ProteinCorpus(path)
+    
+    def index(self, name):
+        """
+        Returns the position of a protein.
+        
+        Key arguments:
+        name -- the protein name.
+        """
+        if name not in self._index:
+            raise EIGAsException("Protein not in corpus: '" + name + "'")
+        
+        return self._index[name]
+    
+    def coords(self, i):
+        """
+        Returns the alpha carbon coordinates of a protein.
+        
+        Key arguments:
+        i -- the position of the protein.
+        """
+        return self._coords[self._offsets[i, 0]:self._offsets[i + 1, 0]]
+    
+    def eigenvalues(self, i):
+        """
+        Returns the eigenvalues of a protein.
+        
+        Key arguments:
+        i -- the position of the protein.
+        """
+        return self._eigenvalues[self._offsets[i, 1]:self._offsets[i + 1, 1]]
+    
+    def fingerprint(self, i):
+        """
+        Returns the fingerprint of a protein.
+        
+        Key arguments:
+        i -- the position of the protein.
+        """
+        return self._fingerprints[self._offsets[i, 2]:self._offsets[i + 1, 2]]
+    
+    def protein(self, key):
+        """
+        Returns a protein, restored from its fingerprint.
+        
+        Key arguments:
+        key -- the protein name or position.
+        """
+        i = key if isinstance(key, (int, integer)) else self.index(key)
+        
+        return Protein.restore(self.names[i], self.coords(i), self.eigenvalues(i), self.fingerprint(i))
+    
+    def proteins(self):
+        """
+        Returns every protein, in corpus order.
+        """
+        return [self.protein(i) for i in range(len(self))]
+    
+    def __len__(self):
+        """
+        Returns the number of proteins in the corpus.
+        """
+        return len(self.names)
@@ -0,0 +1,313 @@
+"""
+Parses the alpha carbon atoms of a pdb file without building a structure.
+
+The ATOM and HETATM records of the first model are scanned line by line with
+the fixed pdb columns. Only the bookkeeping Bio.PDB needs to decide which
+alpha carbon it keeps for a residue is tracked (duplicate residues, point
+mutations and alternate locations), so the coordinates are identical to the
+pdb parser.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from ...exception import EIGAsException
+from ...precision import Precision
+from .core import ProteinParser
+
+from collections import OrderedDict
+from numpy import asarray
+
+class CAProteinParser(ProteinParser):
+    
+    def __init__(self, name, file_name, version):
+        """
+        Init.
+        
+        Key arguments:
+        name      -- name of the protein
+        file_name -- the location of the pdb formatted file.
+        version   -- the chain, 'A' by default.
+        """
+        super(CAProteinParser, self).__init__(name)
+        
+        chain = version if version else 'A'
+        
+        chains = CAProteinParser.scan(file_name, (chain,))
+        
+        if chain not in chains:
+            raise EIGAsException("Error reading chain '" + chain + "' for '" + name + "'")
+        
+        self._coords = chains[chain]
+    
+    @staticmethod
+    def parsers(args):
+        """
+        Returns a parser for each set of arguments, in the same order, reading
+        each file only once for all of its chains.
+        
+        Key arguments:
+        args -- the list of (name, file_name, version) arguments.
+        """
+        args = [tuple(a) for a in args]
+        
+        # Chains needed from each file.
+        files = OrderedDict()
+        for name, file_name, version in args:
+            files.setdefault(file_name, set()).add(version if version else 'A')
+        
+        chains = dict((file_name, CAProteinParser.scan(file_name, files[file_name])) for file_name in files)
+        
+        parsers = []
+        for name, file_name, version in args:
+            chain = version if version else 'A'
+            
+            if chain not in chains[file_name]:
+                raise EIGAsException("Error reading chain '" + chain + "' for '" + name + "'")
+            
+            parser = CAProteinParser.__new__(CAProteinParser)
+            ProteinParser.__init__(parser, name)
+            parser._coords = chains[file_name][chain]
+            parsers.append(parser)
+        
+        return parsers
+    
+    @staticmethod
+    def scan(file_name, chains=None):
+        """
+        Returns the alpha carbon coordinates, keyed by chain, of the first model.
+        
+        Key arguments:
+        file_name -- the location of the pdb formatted file.
+        chains    -- the chains to keep, all of them by default. [optional]
+        """
+        # Residues of each chain kept, in the order Bio.PDB stores them.
+        residues = OrderedDict()
+        
+        # Residues of the current chain, None if the chain isn't kept.
+        current = None
+        residue = None
+        
+        chain_id = text = key = None
+        model = False
+        
+        with open(file_name, 'r') as f:
+            for line in f:
+                record = line[0:6]
+                
+                if record == 'ATOM  ' or record == 'HETATM':
+                    model = True
+                    
+                    # Every record changing the chain or residue starts a new
+                    #  residue, even for chains that aren't kept.
+                    if line[21] != chain_id:
+                        chain_id = line[21]
+                        if chain_id in residues:
+                            current = residues[chain_id]
+                        elif chains is None or chain_id in chains:
+                            current = residues[chain_id] = OrderedDict()
+                        else:
+                            current = None
+                        text = key = None
+                    
+                    # Residues are told apart by record, name, number and
+                    #  insertion code, the raw columns are only a shortcut.
+                    if line[17:27] != text or record != key[0]:
+                        text = line[17:27]
+                        residue_key = (record, line[17:20], int(line[22:26].split()[0]), line[26])
+                        if residue_key != key:
+                            key = residue_key
+                            if current is not None:
+                                residue = CAProteinParser._residue(current, key)
+                    
+                    if current is not None and residue is not None:
+                        CAProteinParser._atom(residue, line)
+                
+                elif record == 'MODEL ':
+                    # Only the first model is kept.
+                    if model:
+                        break
+                    model = True
+                    chain_id = text = key = None
+                
+                elif record == 'ENDMDL':
+                    if model:
+                        break
+                    chain_id = text = key = None
+                
+                elif record == 'END   ' or record == 'CONECT':
+                    break
+        
+        coords = {}
+        for chain, chain_residues in residues.items():
+            ca = []
+            for residue in chain_residues.values():
+                if isinstance(residue, _DisorderedResidue):
+                    residue = residue.selected
+                atom = residue.atoms.get('CA')
+                if atom is not None and atom.coord is not None:
+                    ca.append(atom.coord)
+            
+            coords[chain] = asarray(ca, dtype=Precision.floating()).reshape(-1, 3)
+        
+        return coords
+    
+    @staticmethod
+    def _residue(residues, residue_key):
+        """
+        Returns the residue new atoms are added to, None if they are dropped.
+        
+        Key arguments:
+        residues    -- the residues of the chain.
+        residue_key -- the record type, residue name, number and insertion code.
+        """
+        record, resname, resseq, icode = residue_key
+        
+        if record == 'HETATM':
+            field = 'W' if resname == 'HOH' or resname == 'WAT' else 'H_' + resname
+        else:
+            field = ' '
+        
+        key = (field, resseq, icode)
+        
+        if key not in residues:
+            residue = residues[key] = _Residue(resname)
+            return residue
+        
+        # Hetero residues can't be defined twice.
+        if field != ' ':
+            return None
+        
+        duplicate = residues[key]
+        
+        # Point mutation, the residue read last is selected.
+        if isinstance(duplicate, _DisorderedResidue):
+            if resname not in duplicate.children:
+                duplicate.children[resname] = _Residue(resname)
+            duplicate.selected = duplicate.children[resname]
+            return duplicate.selected
+        
+        if resname == duplicate.resname:
+            return duplicate
+        
+        # Both residues of a point mutation need alternate locations.
+        if duplicate.blank:
+            return None
+        
+        del residues[key]
+        
+        disordered = residues[key] = _DisorderedResidue()
+        disordered.children[duplicate.resname] = duplicate
+        disordered.selected = disordered.children[resname] = _Residue(resname)
+        
+        return disordered.selected
+    
+    @staticmethod
+    def _atom(residue, line):
+        """
+        Adds an atom to a residue.
+        
+        Key arguments:
+        residue -- the residue.
+        line    -- the record.
+        """
+        atoms = residue.atoms
+        
+        fullname = line[12:16]
+        names = fullname.split()
+        name = names[0] if len(names) == 1 else fullname
+        
+        # Names only differing in spaces keep their spaces.
+        duplicate = atoms.get(name)
+        if duplicate is not None and duplicate.fullname != fullname:
+            name = fullname
+            duplicate = atoms.get(name)
+        
+        # Only the alpha carbon coordinates are of interest.
+        if name == 'CA':
+            coord = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+            try:
+                occupancy = float(line[54:60])
+            except ValueError:
+                occupancy = None
+        else:
+            coord = occupancy = None
+        
+        if line[16] == ' ':
+            # The first atom with the same name is kept.
+            if duplicate is None:
+                atoms[name] = _Atom(fullname, coord, occupancy, False)
+                residue.blank = True
+            return
+        
+        if duplicate is None:
+            atom = atoms[name] = _Atom(fullname, None, -999999, True)
+            atom.add(fullname, coord, occupancy)
+        elif duplicate.disordered:
+            duplicate.add(fullname, coord, occupancy)
+        else:
+            atom = atoms[name] = _Atom(fullname, None, -999999, True)
+            atom.add(fullname, coord, occupancy)
+            atom.add(duplicate.fullname, duplicate.coord, duplicate.occupancy)
+
+class _Residue(object):
+    
+    __slots__ = ('resname', 'atoms', 'blank')
+    
+    def __init__(self, resname):
+        """
+        Init.
+        
+        Key arguments:
+        resname -- the residue name.
+        """
+        self.resname = resname
+        self.atoms = {}
+        
+        # Whether an atom without an alternate location was added.
+        self.blank = False
+
+class _DisorderedResidue(object):
+    
+    __slots__ = ('children', 'selected')
+    
+    def __init__(self):
+        """
+        Init.
+        """
+        self.children = {}
+        self.selected = None
+
+class _Atom(object):
+    
+    __slots__ = ('fullname', 'coord', 'occupancy', 'disordered')
+    
+    def __init__(self, fullname, coord, occupancy, disordered):
+        """
+        Init.
+        
+        Key arguments:
+        fullname   -- the atom name, with spaces.
+        coord      -- the coordinates.
+        occupancy  -- the occupancy, or the highest one of the alternate locations.
+        disordered -- whether the atom has alternate locations.
+        """
+        self.fullname = fullname
+        self.coord = coord
+        self.occupancy = occupancy
+        self.disordered = disordered
+    
+    def add(self, fullname, coord, occupancy):
+        """
+        Adds an alternate location, selecting the first one with the highest occupancy.
+        
+        Key arguments:
+        fullname  -- the atom name, with spaces.
+        coord     -- the coordinates.
+        occupancy -- the occupancy.
+        """
+        if occupancy is not None and occupancy > self.occupancy:
+            self.fullname = fullname
+            self.coord = coord
+            self.occupancy = occupancy
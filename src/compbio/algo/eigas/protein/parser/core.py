@@ -9,6 +9,7 @@ Currently only supports alpha carbon atom coordinates.
 @license MIT
 """
 from ...exception import EIGAsException
+from ...instrument import Instrument
 
 from abc import ABCMeta
 
@@ -16,28 +17,66 @@ class ProteinParser(object):
     __metaclass__ = ABCMeta
     
     # Different implementations of the protein parser.
-    TYPES = {'pdb': ('compbio.algo.eigas.protein.parser.pdb', 'PDBProteinParser'),
+    TYPES = {'ca': ('compbio.algo.eigas.protein.parser.ca', 'CAProteinParser'),
+             'pdb': ('compbio.algo.eigas.protein.parser.pdb', 'PDBProteinParser'),
              'raw': ('compbio.algo.eigas.protein.parser.raw', 'RAWProteinParser'),
              'txt': ('compbio.algo.eigas.protein.parser.txt', 'TXTProteinParser'),
              }
     
     @classmethod
-    def factory(cls, name, args):
+    def implementation(cls, name):
         """
-        Returns a specific protein parser implementation.
+        Returns a specific protein parser class.
         
         Key arguments:
-        name -- the type of parser (pdb, raw, txt).
-        args -- the arguments to pass to the new object.
+        name -- the type of parser (ca, pdb, raw, txt).
         """
         if name in ProteinParser.TYPES:
             meta = ProteinParser.TYPES[name]
             mod = __import__(meta[0], fromlist=[meta[1]])
-            kls = getattr(mod, meta[1])
-            return kls(*args)
+            return getattr(mod, meta[1])
         
         raise EIGAsException('Protein parser type not supported: ' + name)
+    
+    @classmethod
+    def factory(cls, name, args):
+        """
+        Returns a specific protein parser implementation.
+        
+        Key arguments:
+        name -- the type of parser (ca, pdb, raw, txt).
+        args -- the arguments to pass to the new object.
+        """
+        with Instrument.stage('protein.parse') as stage:
+            parser = ProteinParser.implementation(name)(*args)
+            stage.shape = (len(parser.coords()),)
+        
+        return parser
+    
+    @classmethod
+    def factories(cls, name, args):
+        """
+        Returns a specific protein parser implementation for each set of
+        arguments, in the same order.
+        
+        Implementations able to read several chains of a file at once provide
+        a parsers method.
         
+        Key arguments:
+        name -- the type of parser (ca, pdb, raw, txt).
+        args -- the list of arguments to pass to the new objects.
+        """
+        kls = ProteinParser.implementation(name)
+        
+        with Instrument.stage('protein.parse') as stage:
+            if hasattr(kls, 'parsers'):
+                parsers = kls.parsers(args)
+            else:
+                parsers = [kls(*a) for a in args]
+            stage.shape = (sum(len(parser.coords()) for parser in parsers),)
+        
+        return parsers
+    
     def __init__(self, name):
         """
         Init.
@@ -7,10 +7,11 @@ Parses a pdb file containing protein data.
 @license MIT
 """
 from ...exception import EIGAsException
-from core import ProteinParser
+from ...precision import Precision
+from .core import ProteinParser
 
 from Bio.PDB.PDBParser import PDBParser
-from decimal import Decimal
+from numpy import around, asarray, float64
 
 class PDBProteinParser(ProteinParser):
     
@@ -47,10 +48,14 @@ class PDBProteinParser(ProteinParser):
             chain = model['A']
             
         # Keep track of the alpha carbon coordinates.
-        self._coords = []
+        coords = []
         
         for residue in chain:
             for atom in residue:
                 # We're only looking at the primary carbon atom.
                 if atom.get_name() == 'CA':
-                    self._coords.append(map(Decimal, (map(str, atom.get_coord()))))
\ No newline at end of file
+                    coords.append(atom.get_coord())
+        
+        # Bio.PDB keeps single precision coordinates, the file has three
+        #  decimals.
+        self._coords = around(asarray(coords, dtype=float64).reshape(-1, 3), 3).astype(Precision.floating())
\ No newline at end of file
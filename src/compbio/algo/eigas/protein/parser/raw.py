@@ -6,7 +6,7 @@ Protein parser based on raw data.
 @copyright 2011 Aaron Zampaglione
 @license MIT
 """
-from core import ProteinParser
+from .core import ProteinParser
 
 class RAWProteinParser(ProteinParser):
     
@@ -16,9 +16,10 @@ File format should be in the following:
 @copyright 2011 Aaron Zampaglione
 @license MIT
 """
-from core import ProteinParser
+from ...precision import Precision
+from .core import ProteinParser
 
-from decimal import Decimal
+from numpy import asarray
 
 class TXTProteinParser(ProteinParser):
     
@@ -32,7 +33,9 @@ class TXTProteinParser(ProteinParser):
         """
         super(self.__class__, self).__init__(name)
         
-        self._coords = []
+        coords = []
         
         for line in open(file_name, 'r'):
-            self._coords.append(tuple(map(Decimal, line[:-1].split('\t'))))
\ No newline at end of file
+            coords.append(tuple(map(float, line[:-1].split('\t'))))
+        
+        self._coords = asarray(coords, dtype=Precision.floating()).reshape(-1, 3)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+In-process registry of proteins.
+
+Proteins are memoized by parser type, name, file (the coordinates of raw
+data), chain and the fingerprint settings, so looking up the same protein
+again during a run is free. The least recently used proteins are dropped
+once the registry grows past its memory cap.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .core import Protein
+from .parser.core import ProteinParser
+from ..precision import Precision
+
+from numpy import asarray, float64
+
+from collections import OrderedDict
+
+import hashlib
+
+class ProteinRegistry(object):
+    
+    def __init__(self, max_size=2 ** 30, cache=None):
+        """
+        Init.
+        
+        Key arguments:
+        max_size -- approximate maximum memory of the proteins in bytes. [optional]
+        cache    -- on-disk protein cache used on a miss. [optional]
+        """
+        self.max_size = max_size
+        self.cache = cache
+        
+        # Proteins from the least to the most recently used.
+        self._proteins = OrderedDict()
+        self.size = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def key(type, args):
+        """
+        Returns the registry key of a protein.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, raw, txt).
+        args -- the parser arguments.
+        """
+        chain = args[2] if len(args) > 2 else None
+        
+        # Raw data isn't hashable, its coordinates are.
+        if type == 'raw':
+            source = hashlib.sha1(asarray(args[1]['coords'], dtype=float64).tobytes()).hexdigest()
+        else:
+            source = args[1]
+        
+        return (type, args[0], source, chain, Protein.cutoff, Protein.fast,
+                Protein.components if Protein.sparse else None, Precision.policy)
+    
+    @staticmethod
+    def nbytes(protein):
+        """
+        Returns the approximate memory used by a protein in bytes.
+        
+        Key arguments:
+        protein -- the protein.
+        """
+        size = asarray(protein.fingerprint).nbytes + asarray(protein.coords).nbytes
+        
+        if protein.eigenvalues is not None:
+            size += asarray(protein.eigenvalues).nbytes
+        if protein.r is not None:
+            size += protein.r.nbytes
+        
+        return size
+    
+    def protein(self, type, args):
+        """
+        Returns the protein, building it on a miss.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, raw, txt).
+        args -- the parser arguments.
+        """
+        key = ProteinRegistry.key(type, args)
+        
+        if key in self._proteins:
+            self.hits += 1
+            
+            # Mark as the most recently used.
+            protein, size = self._proteins.pop(key)
+            self._proteins[key] = (protein, size)
+            
+            return protein
+        
+        self.misses += 1
+        
+        if self.cache is not None and type in self.cache.FILE_TYPES:
+            protein = self.cache.protein(type, args)
+        else:
+            protein = Protein(ProteinParser.factory(type, args))
+        
+        self._add(key, protein)
+        
+        return protein
+    
+    def proteins(self, type, args):
+        """
+        Returns the proteins, in the same order, building the missing ones
+        together so a file holding several of them is read once.
+        
+        Key arguments:
+        type -- the type of parser (ca, pdb, raw, txt).
+        args -- the list of parser arguments.
+        """
+        keys = [ProteinRegistry.key(type, a) for a in args]
+        
+        # Build every missing protein once, even if it is requested twice.
+        missing = OrderedDict()
+        for key, a in zip(keys, args):
+            if key not in self._proteins and key not in missing:
+                missing[key] = a
+        
+        built = {}
+        if missing:
+            if self.cache is not None and type in self.cache.FILE_TYPES:
+                proteins = self.cache.proteins(type, list(missing.values()))
+            else:
+                proteins = [Protein(parser) for parser in ProteinParser.factories(type, list(missing.values()))]
+            built = dict(zip(missing, proteins))
+        
+        proteins = []
+        for key, a in zip(keys, args):
+            if key in built:
+                self.misses += 1
+                protein = built.pop(key)
+                self._add(key, protein)
+            else:
+                protein = self.protein(type, a)
+            proteins.append(protein)
+        
+        return proteins
+    
+    def _add(self, key, protein):
+        """
+        Adds a protein as the most recently used one.
+        
+        Key arguments:
+        key     -- the registry key.
+        protein -- the protein.
+        """
+        size = ProteinRegistry.nbytes(protein)
+        self._proteins[key] = (protein, size)
+        self.size += size
+        
+        # Evict the least recently used proteins, but always keep this one.
+        while self.size > self.max_size and len(self._proteins) > 1:
+            _, (_, evicted) = self._proteins.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+    
+    def clear(self):
+        """
+        Removes every protein from the registry.
+        """
+        self._proteins.clear()
+        self.size = 0
+    
+    def stats(self):
+        """
+        Returns the hit, miss and eviction counts along with the size.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'proteins': len(self._proteins),
+                'size': self.size}
+    
+    def __len__(self):
+        """
+        Returns the number of proteins in the registry.
+        """
+        return len(self._proteins)
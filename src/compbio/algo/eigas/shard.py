@@ -0,0 +1,314 @@
+"""
+Sharded all-vs-all runs over a shared directory.
+
+The pairs of the run, in row-major order, are split into a fixed number of
+contiguous shards. Workers on any number of machines sharing the directory
+claim a shard by creating its lock file, which only one of them can do, and
+journal its pairs as they come back. A finished shard leaves a done
+marker behind.
+
+A worker refreshes its lock after every pair. Locks left behind by a worker
+that died are stale once they haven't been refreshed for a while, and are
+taken over by the next worker, which resumes the shard from its journal.
+Every lock holds its owner, a worker that finds its lock taken over stops
+working on the shard and leaves the lock alone.
+
+Once every shard is done, the results are read back in the order of the
+pairs, so the rows of the matrix can be rebuilt as in a single run.
+
+@author Aaron Zampaglione <azampagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from .exception import EIGAsException
+from .journal import PairJournal
+
+import errno
+import json
+import os
+import socket
+import time
+
+class ShardQueue(object):
+    
+    # Seconds without progress before the lock of a shard is stale.
+    TIMEOUT = 600
+    
+    def __init__(self, directory, pairs, shards, key, timeout=None):
+        """
+        Opens the queue in a directory, creating it if needed.
+        
+        Every worker has to open the queue with the same pairs, number of
+        shards and key.
+        
+        Key arguments:
+        directory -- the shared directory.
+        pairs     -- the pairs, in row-major order.
+        shards    -- number of shards.
+        key       -- JSON compatible identity of the run.
+        timeout   -- seconds before a lock is stale, ShardQueue.TIMEOUT by
+                     default. [optional]
+        """
+        if shards < 1:
+            raise EIGAsException('Shard queues need at least one shard: ' + str(shards))
+        
+        self.directory = directory
+        self.pairs = pairs
+        self.shards = shards
+        self.key = key
+        self.timeout = ShardQueue.TIMEOUT if timeout is None else timeout
+        
+        # Owner written to the lock of each shard claimed.
+        self._owners = {}
+        
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        
+        # The first worker describes the run, the others have to match it.
+        manifest = json.loads(json.dumps({'key': key, 'pairs': len(pairs), 'shards': shards}))
+        path = os.path.join(directory, 'queue.json')
+        if not ShardQueue._create(path, json.dumps(manifest)):
+            with open(path, 'r') as f:
+                if json.load(f) != manifest:
+                    raise EIGAsException('Shard queue of another run: ' + directory)
+    
+    @staticmethod
+    def _create(path, text):
+        """
+        Creates a file with the text, returning False if it already exists.
+        
+        Key arguments:
+        path -- the file.
+        text -- the contents.
+        """
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+            raise
+        
+        try:
+            os.write(fd, text.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        
+        return True
+    
+    def _path(self, shard, ext):
+        """
+        Returns the path of a file of a shard.
+        
+        Key arguments:
+        shard -- the shard.
+        ext   -- lock, done or journal.
+        """
+        return os.path.join(self.directory, 'shard-{0:05d}.{1}'.format(shard, ext))
+    
+    def shard(self, shard):
+        """
+        Returns the pairs of a shard.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        l = len(self.pairs)
+        
+        return self.pairs[shard * l // self.shards:(shard + 1) * l // self.shards]
+    
+    def done(self, shard=None):
+        """
+        Returns whether a shard, or every shard, is done.
+        
+        Key arguments:
+        shard -- the shard, every shard by default. [optional]
+        """
+        if shard is None:
+            return all(self.done(shard) for shard in range(self.shards))
+        
+        return os.path.exists(self._path(shard, 'done'))
+    
+    def claim(self):
+        """
+        Returns the first shard neither done nor locked by a live worker,
+        locking it, or None if there is none.
+        """
+        for shard in range(self.shards):
+            if self.done(shard):
+                continue
+            
+            if self._lock(shard):
+                # Finished while the lock was checked.
+                if self.done(shard):
+                    self.release(shard)
+                    continue
+                
+                return shard
+        
+        return None
+    
+    def _lock(self, shard):
+        """
+        Returns whether the lock of a shard was taken, taking over stale locks.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        # Unique to this claim, even for queues of the same process.
+        owner = '{0} {1} {2} {3!r}'.format(socket.gethostname(), os.getpid(), id(self), time.time())
+        
+        if not self._take(self._path(shard, 'lock'), owner):
+            return False
+        
+        self._owners[shard] = owner
+        
+        return True
+    
+    def _take(self, path, owner):
+        """
+        Returns whether a lock file was created with the owner, taking over
+        a stale lock.
+        
+        Key arguments:
+        path  -- the lock file.
+        owner -- the owner of the lock.
+        """
+        if ShardQueue._create(path, owner):
+            return True
+        
+        try:
+            stale = time.time() - os.path.getmtime(path) > self.timeout
+        except OSError:
+            # Released in the meantime.
+            return ShardQueue._create(path, owner)
+        
+        if not stale:
+            return False
+        
+        # Only one worker can move the stale lock out of the way.
+        moved = path + '.' + socket.gethostname() + '.' + str(os.getpid())
+        try:
+            os.rename(path, moved)
+        except OSError:
+            return False
+        os.remove(moved)
+        
+        return ShardQueue._create(path, owner)
+    
+    def owns(self, shard):
+        """
+        Returns whether this queue still holds the lock of a shard.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        if shard not in self._owners:
+            return False
+        
+        try:
+            with open(self._path(shard, 'lock'), 'rb') as f:
+                return f.read().decode('utf-8') == self._owners[shard]
+        except (IOError, OSError):
+            return False
+    
+    def touch(self, shard):
+        """
+        Refreshes the lock of a shard, returning False if it was lost to
+        another worker.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        if not self.owns(shard):
+            return False
+        
+        try:
+            os.utime(self._path(shard, 'lock'), None)
+        except OSError:
+            return False
+        
+        return True
+    
+    def release(self, shard):
+        """
+        Releases the lock of a shard, unless it was lost to another worker.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        if not self.owns(shard):
+            self._owners.pop(shard, None)
+            return
+        
+        del self._owners[shard]
+        try:
+            os.remove(self._path(shard, 'lock'))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+    
+    def journal(self, shard):
+        """
+        Returns the journal of a shard.
+        
+        Key arguments:
+        shard -- the shard.
+        """
+        return PairJournal(self._path(shard, 'journal'), {'key': self.key, 'shard': shard, 'shards': self.shards})
+    
+    def work(self, allvsall):
+        """
+        Compares the pairs of shards until none is left, returning the shards
+        finished.
+        
+        A shard whose lock is lost to another worker is left to it.
+        
+        Key arguments:
+        allvsall -- the all-vs-all comparison of the proteins.
+        """
+        finished = []
+        
+        while True:
+            shard = self.claim()
+            if shard is None:
+                return finished
+            
+            journal = self.journal(shard)
+            results = allvsall.run(self.shard(shard), journal)
+            lost = False
+            try:
+                for _ in results:
+                    if not self.touch(shard):
+                        lost = True
+                        break
+                
+                if not lost:
+                    ShardQueue._create(self._path(shard, 'done'), '')
+            finally:
+                results.close()
+                journal.close()
+                self.release(shard)
+            
+            if not lost:
+                finished.append(shard)
+    
+    def results(self):
+        """
+        Yields (i, j, result) for every pair, in order.
+        """
+        for shard in range(self.shards):
+            if not self.done(shard):
+                raise EIGAsException('Shard not done: ' + str(shard))
+            
+            journal = self.journal(shard)
+            journal.close()
+            
+            done = journal.results()
+            for i, j in self.shard(shard):
+                yield i, j, done[(i, j)]
@@ -0,0 +1,60 @@
+"""
+Benchmarks the EIGAs stages on the fixed pairs of the bundled data sets
+(hard, skolnick, local) and writes the results as JSON.
+
+With a baseline from an earlier run, e.g. of another commit or precision
+policy, the ratio of the median of every stage to the baseline is printed.
+
+Usage: benchmark_anlys.py [-r repeat] [-n pairs] [-p precision] [-b baseline] output [dataset ...]
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from compbio.algo.eigas.benchmark import Benchmark
+from compbio.algo.eigas.precision import Precision
+
+import getopt
+import json
+import sys
+
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':b:n:p:r:')
+if not len(args):
+    raise Exception('Missing output file.')
+
+# Optional baseline results, number of pairs per data set, precision policy
+#  and timed runs.
+baseline = None
+limit = None
+repeat = 5
+for opt, value in opts:
+    if opt == '-b':
+        with open(value) as f:
+            baseline = json.load(f)
+    elif opt == '-n':
+        limit = int(value)
+    elif opt == '-p':
+        Precision.set(value)
+    elif opt == '-r':
+        repeat = int(value)
+
+results = Benchmark(repeat, limit).run(args[1:] or None)
+
+with open(args[0], 'w') as f:
+    json.dump(results, f, indent=2, sort_keys=True)
+
+ratios = Benchmark.compare(baseline, results) if baseline is not None else {}
+
+for dataset in sorted(results['datasets']):
+    print(dataset)
+    stages = results['datasets'][dataset]['stages']
+    for stage in Benchmark.STAGES:
+        line = '  {0:<18}{1:>10.4f}s{2:>14.0f} cells/s'.format(stage, stages[stage]['median'],
+                                                              stages[stage]['cells_per_second'] or 0)
+        if stage in ratios.get(dataset, {}):
+            line += '{0:>8.2f}x'.format(ratios[dataset][stage])
+        print(line)
+
+print('Complete.')
@@ -0,0 +1,60 @@
+"""
+Compiles a bundled data set (hard, skolnick, motif, local) into a protein
+corpus, so analysis runs don't have to parse and fingerprint it again.
+
+Usage: corpus_build.py [-c cache] dataset output
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from compbio.algo.eigas.protein.cache import ProteinCache
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.registry import ProteinRegistry
+from compbio.common.data import HARD, LOCAL, MOTIF, SKOLNICK
+
+import getopt
+import sys
+import time
+
+DATASETS = {'hard': HARD,
+            'local': LOCAL,
+            'motif': MOTIF,
+            'skolnick': SKOLNICK}
+
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':c:')
+if len(args) < 2:
+    raise Exception('Missing data set or output file.')
+
+if args[0] not in DATASETS:
+    raise Exception('Unknown data set: ' + args[0])
+
+# Optional fingerprint cache directory.
+cache = None
+for opt, value in opts:
+    if opt == '-c':
+        cache = ProteinCache(value)
+
+# Flatten the data set, families of proteins are nested dictionaries.
+entries = []
+families = []
+dataset = DATASETS[args[0]]
+for key in sorted(dataset):
+    if isinstance(dataset[key], dict):
+        for name in sorted(dataset[key]):
+            entries.append(dataset[key][name])
+            families.append(key)
+    else:
+        entries.append(dataset[key])
+        families.append(None)
+
+start = time.time()
+corpus = ProteinCorpus.compile(args[1], 'ca', entries, families, ProteinRegistry(cache=cache))
+print('Compiled {0} proteins in {1:.2f}s.'.format(len(corpus), time.time() - start))
+
+start = time.time()
+ProteinCorpus(args[1]).proteins()
+print('Opened in {0:.3f}s.'.format(time.time() - start))
+print('Complete.')
@@ -6,18 +6,51 @@ Analysis of hard alignment proteins
 @license MIT
 """
 from compbio.algo.eigas.core import EIGAs
-from compbio.algo.eigas.protein.core import Protein
-from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.algo.eigas.instrument import Instrument
+from compbio.algo.eigas.protein.cache import ProteinCache
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.registry import ProteinRegistry
 from compbio.common.data import HARD
 
 import getopt
 import sys
 
 # Get command line args.
-opts, args = getopt.getopt(sys.argv[1:], ':o')
+opts, args = getopt.getopt(sys.argv[1:], ':oc:i:k:')
 if not len(args):
     raise Exception('Missing output file.')
 
+# Optional fingerprint cache directory, precompiled corpus and trace of the
+#  stages.
+cache = None
+corpus = None
+trace = None
+for opt, value in opts:
+    if opt == '-c':
+        cache = ProteinCache(value)
+    elif opt == '-i':
+        trace = value
+    elif opt == '-k':
+        corpus = ProteinCorpus(value)
+
+if trace is not None:
+    Instrument.start()
+
+# Every protein is only built once per run.
+registry = ProteinRegistry(cache=cache)
+
+def protein(args):
+    """
+    Returns the protein from the corpus, or else the registry.
+    
+    Key arguments:
+    args -- the pdb parser arguments.
+    """
+    if corpus is not None:
+        return corpus.protein(args[0])
+    
+    return registry.protein('ca', args)
+
 PROTEIN_PAIRS = [(HARD['1FXIa'], HARD['1UBQ'], 74),
                  (HARD['1TEN'], HARD['3HHRb'], 88),
                  (HARD['3HLAb'], HARD['2RHE'], 95),
@@ -42,8 +75,8 @@ html = """
 """
 
 for pair in PROTEIN_PAIRS:
-    protein1 = Protein(ProteinParser.factory('pdb', (pair[0])))
-    protein2 = Protein(ProteinParser.factory('pdb', (pair[1])))
+    protein1 = protein(pair[0])
+    protein2 = protein(pair[1])
     aligned = EIGAs.aligned(protein1=protein1, protein2=protein2)
     
     s = """
@@ -64,4 +97,8 @@ html += """
 """
 
 open(args[0], 'w').write(html)
+print('Proteins: {hits} hits, {misses} misses.'.format(**registry.stats()))
+if trace is not None:
+    Instrument.trace(trace, Instrument.stop())
+    print(Instrument.table())
 print('Complete.')
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Analysis of the single precision policy against double precision.
+
+Every protein of the bundled data sets is fingerprinted with both policies.
+For each data set, reports the largest fingerprint difference, relative to
+the largest eigenvalue of its protein, and the fraction of residues whose
+fingerprint agrees within TOLERANCE. The all-vs-all comparison of each data
+set (global counts for hard and skolnick, the best local alignment for
+local) then runs with both policies, reporting the pairs whose results
+differ and the largest difference of each part of the result. The alignments
+only see the rounding of the fingerprints, their DP recurrences compare sums
+in Python floats with both policies. Last, the size of the corpus of each
+data set is reported for both policies.
+
+Usage: precision_anlys.py [-j jobs] output [dataset ...]
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from compbio.algo.eigas.allvsall import AllVsAll, global_compare, local_compare
+from compbio.algo.eigas.precision import Precision
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD, LOCAL, SKOLNICK
+
+from numpy import absolute, asarray, float64
+
+import getopt
+import os
+import shutil
+import sys
+import tempfile
+
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':oj:')
+if not len(args):
+    raise Exception('Missing output file.')
+
+# Optional number of processes.
+jobs = 1
+for opt, value in opts:
+    if opt == '-j':
+        jobs = int(value)
+
+# Largest fingerprint difference, relative to the largest eigenvalue, that
+#  still agrees.
+TOLERANCE = 1e-4
+
+# Proteins, comparison and parts of the result of each data set.
+DATASETS = {'hard': (sorted(HARD.values()), global_compare, ('Aligned', 'Length')),
+            'skolnick': (sorted(entry for family in SKOLNICK.values() for entry in family.values()),
+                         global_compare, ('Aligned', 'Length')),
+            'local': (sorted(LOCAL.values()), local_compare, ('Length', 'Value'))}
+
+datasets = args[1:] or sorted(DATASETS)
+for dataset in datasets:
+    if dataset not in DATASETS:
+        raise Exception('Unknown data set: ' + dataset)
+
+# Corpora are written here and only their sizes kept.
+directory = tempfile.mkdtemp()
+
+fingerprints = {}
+comparisons = {}
+sizes = {}
+for dataset in datasets:
+    entries, compare, parts = DATASETS[dataset]
+    
+    # Both policies, double precision first.
+    proteins = {}
+    results = {}
+    sizes[dataset] = []
+    for policy in ('float64', 'float32'):
+        Precision.set(policy)
+        proteins[policy] = [Protein(parser) for parser in ProteinParser.factories('ca', entries)]
+        results[policy] = list(AllVsAll(proteins[policy], compare, jobs).run())
+        
+        path = os.path.join(directory, dataset + '.' + policy)
+        ProteinCorpus.build(path, proteins[policy])
+        sizes[dataset].append(os.path.getsize(path))
+        print(dataset + ' ' + policy)
+    Precision.set('float64')
+    
+    # Fingerprint agreement.
+    residues = 0
+    agree = 0
+    largest = 0.0
+    for double, single in zip(proteins['float64'], proteins['float32']):
+        scale = max(absolute(double.eigenvalues).max(), 1.0)
+        difference = absolute(asarray(single.fingerprint, dtype=float64) - asarray(double.fingerprint)) / scale
+        
+        residues += len(difference)
+        agree += int((difference <= TOLERANCE).sum())
+        largest = max(largest, float(difference.max()) if len(difference) else 0.0)
+    
+    fingerprints[dataset] = (len(entries), residues, largest, agree / float(max(residues, 1)))
+    
+    # Differences of the comparisons.
+    differ = 0
+    deltas = [0] * len(parts)
+    for (_, _, double), (_, _, single) in zip(results['float64'], results['float32']):
+        if double != single:
+            differ += 1
+        for k in range(len(parts)):
+            deltas[k] = max(deltas[k], abs(single[k] - double[k]))
+    
+    comparisons[dataset] = (len(results['float64']), differ, list(zip(parts, deltas)))
+
+shutil.rmtree(directory)
+
+# Fingerprint agreement.
+html = """
+<h1>Fingerprint agreement (float32 against float64)</h1>
+<table>
+    <tr>
+        <th>Data Set</th>
+        <th>Proteins</th>
+        <th>Residues</th>
+        <th>Largest Relative Difference</th>
+        <th>Residues within {0:g}</th>
+    </tr>
+""".format(TOLERANCE)
+
+for dataset in datasets:
+    html += """
+    <tr>
+        <td>{0}</td>
+        <td>{1}</td>
+        <td>{2}</td>
+        <td>{3:.3e}</td>
+        <td>{4:.4f}</td>
+    </tr>
+    """.format(dataset, *fingerprints[dataset])
+
+html += """
+</table>
+"""
+
+# Alignment differences.
+html += """
+<h1>Alignment differences (float32 against float64)</h1>
+<table>
+    <tr>
+        <th>Data Set</th>
+        <th>Pairs</th>
+        <th>Pairs that Differ</th>
+        <th>Largest Differences</th>
+    </tr>
+"""
+
+for dataset in datasets:
+    pairs, differ, deltas = comparisons[dataset]
+    html += """
+    <tr>
+        <td>{0}</td>
+        <td>{1}</td>
+        <td>{2} ({3:.2%})</td>
+        <td>{4}</td>
+    </tr>
+    """.format(dataset, pairs, differ, differ / float(max(pairs, 1)),
+               ', '.join('{0} {1}'.format(part, delta) for part, delta in deltas))
+
+html += """
+</table>
+"""
+
+# Corpus sizes.
+html += """
+<h1>Corpus sizes</h1>
+<table>
+    <tr>
+        <th>Data Set</th>
+        <th>float64 Bytes</th>
+        <th>float32 Bytes</th>
+        <th>Ratio</th>
+    </tr>
+"""
+
+for dataset in datasets:
+    double, single = sizes[dataset]
+    html += """
+    <tr>
+        <td>{0}</td>
+        <td>{1}</td>
+        <td>{2}</td>
+        <td>{3:.3f}</td>
+    </tr>
+    """.format(dataset, double, single, single / float(double))
+
+html += """
+</table>
+"""
+
+open(args[0], 'w').write(html)
+print('Complete.')
@@ -0,0 +1,223 @@
+"""
+Output of the analysis scripts, shared with the merge of sharded runs so both
+write the same files.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from numpy import average, std
+
+from itertools import product
+
+import csv
+
+# A specific order is necessary due to the GoTERM analysis by another group (mostly for visual effects).
+LOCAL_ORDER = [
+    '1ADF',
+    '2JHF',
+    '1MGO',
+    '1EE2',
+    '1QV6',
+    '1A71',
+    '1N8K',
+    '1N92',
+    '1P1R',
+    '1YE3',
+    '3BTO',
+    '1QV7',
+    '1KUV',
+    '1KUY',
+    '1KUX',
+    '1L0C',
+    '1IB1e',
+    '1IB1f',
+    '1IB1g',
+    '1IB1h',
+    '1B6B',
+    '1B6Bb',
+    '1B73',
+    '2DWU',
+    '1ZUW',
+    '1B74',
+    '3IST',
+    '2JFU',
+    '2GZM',
+    '3ISV',
+    '3HFR',
+    '2JFV',
+    '2OHO',
+    '1EP0',
+    '1PM7',
+    '1NXM',
+    '2IXK',
+    '1WLT',
+    '1DZR',
+    '1RTV',
+    '2B9U',
+    '1NZC',
+    '1NYW',
+    '1CLK',
+    '1A0C',
+    '1MUW',
+    '1BXB',
+    '2GLK',
+    '1QT1',
+    '1XIM',
+    '1XLA',
+    '1DXI',
+    '2GYI',
+    '1XYL',
+    '1S5N',
+    '1XYA',
+    '3RUBl',
+    '8RUC',
+    '2VDI',
+    '1UZH',
+    '1UWA',
+    '1UPMs',
+    '1SVDm',
+    '1RXOc',
+    '1IWAb',
+    '1IR1s',
+    '1GK8i'
+]
+
+def combinations_with_replacement(iterable, r):
+    # combinations_with_replacement('ABC', 2) --> AA AB AC BB BC CC
+    pool = tuple(iterable)
+    n = len(pool)
+    for indices in product(range(n), repeat=r):
+        if sorted(indices) == list(indices):
+            yield tuple(pool[i] for i in indices)
+
+def skolnick_html(families, counts):
+    """
+    Returns the html tables of aligned residues of every pair of families.
+    
+    Key arguments:
+    families -- (family, proteins) of each family.
+    counts   -- function returning the aligned residues and the length of
+                the global alignment of two proteins.
+    """
+    html = """
+"""
+    
+    for (family1, proteins1), (family2, proteins2) in combinations_with_replacement(families, 2):
+        title = """
+    <h1>{0} vs. {1}</h1>
+    """.format(family1, family2,)
+        
+        # Table Headers
+        html += title + """
+    <table>
+        <tr>
+            <th>Protein 1</th>
+            <th>Protein 2</th>
+            <th>Aligned</th>
+            <th>Alignment Length</th>
+            <th>Percentage</th>
+        </tr>
+    """
+        alignments = []
+        percentages = []
+        for protein1, protein2 in product(proteins1, proteins2):
+            aligned, length = counts(protein1, protein2)
+            
+            html += """
+        <tr>
+            <td>{0} ({1})</td>
+            <td>{2} ({3})</td>
+            <td>{4}</td>
+            <td>{5}</td>
+            <td>{6}</td>
+        </tr>
+        """.format(protein1.name, len(protein1.fingerprint),
+                   protein2.name, len(protein2.fingerprint),
+                   aligned,
+                   length,
+                   aligned / float(length))
+            
+            alignments.append(aligned)
+            percentages.append(aligned / float(length))
+        
+        html += """
+        <tr>
+            <td colspan="3">&nbsp;</td>
+        </tr>
+        <tr>
+            <td colspan="2">Aligned Average:</td>
+            <td>{0}</td>
+        </tr>
+        <tr>
+            <td colspan="2">Aligned STDEV:</td>
+            <td>{1}</td>
+        </tr>
+        <tr>
+            <td colspan="2">Percentage Average:</td>
+            <td>{2}</td>
+        </tr>
+        <tr>
+            <td colspan="2">Percentage STDEV:</td>
+            <td>{3}</td>
+        </tr>
+    </table>
+    """.format(average(alignments),
+               std(alignments),
+               average(percentages),
+               std(percentages))
+    
+    return html
+
+def local_csvs(directory, proteins, rows):
+    """
+    Writes the len, len-norm, score and score-norm matrices of the local
+    alignments, each row as soon as it comes.
+    
+    Key arguments:
+    directory -- the output directory.
+    proteins  -- the proteins, in the order of the rows.
+    rows      -- (i, row) of the (length, value) results, None when pruned.
+    """
+    names = [protein.name for protein in proteins]
+    
+    files = [open(directory + '/local-align-' + name + '.csv', 'wb') for name in ('len', 'len-norm', 'score', 'score-norm')]
+    writers = [csv.writer(f) for f in files]
+    
+    # write our first header
+    header = [None]
+    header.extend(names)
+    for writer in writers:
+        writer.writerow(header)
+    
+    # Let's spit out the length of the optimal motif.
+    for i, row in rows:
+        lines = [[names[i]] for _ in writers]
+        for j, result in enumerate(row):
+            if result is None:
+                # Pruned, can't reach the minimum score.
+                for line in lines:
+                    line.append('')
+                continue
+            
+            length, value = result
+            
+            # Norm factor will be the smallest protein fingerprint (which is also
+            #  the largest possible alignment).
+            norm1 = min(len(proteins[i].fingerprint), len(proteins[j].fingerprint))
+            # The norm for the second set is the value given when two items 
+            #  match during local alignment (2) and largest possible alignment.
+            norm2 = norm1 * 2
+            
+            lines[0].append(length)
+            lines[1].append(float(length) / norm1)
+            lines[2].append(value)
+            lines[3].append(float(value) / norm2)
+        
+        for writer, f, line in zip(writers, files, lines):
+            writer.writerow(line)
+            f.flush()
+    
+    for f in files:
+        f.close()
@@ -0,0 +1,127 @@
+"""
+All-vs-all comparison of the local or skolnick proteins sharded over
+several machines sharing a directory.
+
+Every worker runs the same command with 'work' and claims shards of pairs
+until none is left, any number of them can run at once. Once every shard is
+done, 'merge' writes the same files as local_align_anlys.py (csv matrices
+in the output directory) or skolnick_anlys.py (html output file).
+
+Usage: shard_anlys.py [-c cache] [-k corpus] [-j jobs] [-n shards] [-t min score] [-w timeout]
+                      work|merge local|skolnick directory [output]
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from compbio.algo.eigas.allvsall import AllVsAll, global_compare, local_compare
+from compbio.algo.eigas.prefilter import Prefilter
+from compbio.algo.eigas.protein.cache import ProteinCache
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.registry import ProteinRegistry
+from compbio.algo.eigas.shard import ShardQueue
+from compbio.anlys.algo.eigas.reports import LOCAL_ORDER, local_csvs, skolnick_html
+from compbio.common.data import LOCAL, SKOLNICK
+
+import getopt
+import sys
+
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':c:j:k:n:t:w:')
+if len(args) < 3 or args[0] not in ('work', 'merge') or args[1] not in ('local', 'skolnick'):
+    raise Exception('Usage: shard_anlys.py [options] work|merge local|skolnick directory [output]')
+
+if args[0] == 'merge' and len(args) < 4:
+    raise Exception('Missing output.')
+
+command, dataset, directory = args[:3]
+
+# Optional fingerprint cache directory, precompiled corpus, number of processes,
+#  number of shards, minimum local score and seconds before a lock is stale.
+cache = None
+corpus = None
+jobs = 1
+shards = 64
+prefilter = None
+timeout = None
+for opt, value in opts:
+    if opt == '-c':
+        cache = ProteinCache(value)
+    elif opt == '-j':
+        jobs = int(value)
+    elif opt == '-k':
+        corpus = ProteinCorpus(value)
+    elif opt == '-n':
+        shards = int(value)
+    elif opt == '-t':
+        prefilter = Prefilter(Prefilter.LOCAL, int(value))
+    elif opt == '-w':
+        timeout = float(value)
+
+if dataset == 'local':
+    entries = [LOCAL[name] for name in LOCAL_ORDER]
+    compare = local_compare
+    report = None
+else:
+    # Sorted, so every machine has the same pairs.
+    entries = [SKOLNICK[family][name] for family in sorted(SKOLNICK) for name in sorted(SKOLNICK[family])]
+    families = [family for family in sorted(SKOLNICK) for _ in SKOLNICK[family]]
+    compare = global_compare
+    
+    # Families in the order of the report.
+    report = list(SKOLNICK.keys())
+    
+    if prefilter is not None:
+        raise Exception('The minimum score only applies to local alignments.')
+
+# Fingerprint every protein once, reading files holding several chains once.
+if corpus is not None:
+    proteins = [corpus.protein(entry[0]) for entry in entries]
+else:
+    proteins = ProteinRegistry(cache=cache).proteins('ca', entries)
+
+allvsall = AllVsAll(proteins, compare, jobs, prefilter)
+
+if report is None:
+    pairs = allvsall.pairs()
+else:
+    # Only the pairs of the report, both ways within a family and from the
+    #  earlier family to the later one otherwise.
+    rank = dict((family, k) for k, family in enumerate(report))
+    pairs = [(i, j) for i, j in allvsall.pairs() if rank[families[i]] <= rank[families[j]]]
+
+queue = ShardQueue(directory, pairs, shards,
+                   {'dataset': dataset,
+                    'names': [entry[0] for entry in entries],
+                    'report': report,
+                    'threshold': prefilter.threshold if prefilter is not None else None,
+                    'settings': ProteinCorpus.settings()},
+                   timeout)
+
+if command == 'work':
+    finished = queue.work(allvsall)
+    print('Finished {0} shards, {1}.'.format(len(finished), 'all done' if queue.done() else 'others still running'))
+    if prefilter is not None:
+        print(prefilter.report())
+else:
+    if dataset == 'local':
+        local_csvs(args[3], proteins, AllVsAll.rows(queue.results(), len(proteins)))
+    else:
+        results = dict(((i, j), result) for i, j, result in queue.results())
+        index = dict((protein.name, i) for i, protein in enumerate(proteins))
+        
+        def counts(protein1, protein2):
+            """
+            Returns the merged result of two proteins.
+            
+            Key arguments:
+            protein1 -- the first protein.
+            protein2 -- the second protein.
+            """
+            return results[(index[protein1.name], index[protein2.name])]
+        
+        open(args[3], 'w').write(skolnick_html([(family, [proteins[index[name]] for name in SKOLNICK[family].keys()])
+                                                for family in report], counts))
+
+print('Complete.')
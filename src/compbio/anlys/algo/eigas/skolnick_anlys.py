@@ -7,98 +7,64 @@ Analysis of skolnick alignment proteins.
 @license MIT
 """
 from compbio.algo.eigas.core import EIGAs
-from compbio.algo.eigas.protein.core import Protein
-from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.algo.eigas.instrument import Instrument
+from compbio.algo.eigas.protein.cache import ProteinCache
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.registry import ProteinRegistry
+from compbio.anlys.algo.eigas.reports import skolnick_html
 from compbio.common.data import SKOLNICK
 
-from numpy import average, std
-
 from getopt import getopt
-from itertools import product
 from sys import argv
 
-def combinations_with_replacement(iterable, r):
-    # combinations_with_replacement('ABC', 2) --> AA AB AC BB BC CC
-    pool = tuple(iterable)
-    n = len(pool)
-    for indices in product(range(n), repeat=r):
-        if sorted(indices) == list(indices):
-            yield tuple(pool[i] for i in indices)
-
 # Get command line args.
-opts, args = getopt(argv[1:], ':o')
+opts, args = getopt(argv[1:], ':oc:i:k:')
 if not len(args):
     raise Exception('Missing output file.')
 
-html = """
-"""
+# Optional fingerprint cache directory, precompiled corpus and trace of the
+#  stages.
+cache = None
+corpus = None
+trace = None
+for opt, value in opts:
+    if opt == '-c':
+        cache = ProteinCache(value)
+    elif opt == '-i':
+        trace = value
+    elif opt == '-k':
+        corpus = ProteinCorpus(value)
+
+if trace is not None:
+    Instrument.start()
+
+# Every protein is only built once per run.
+registry = ProteinRegistry(cache=cache)
 
-for family1, family2 in combinations_with_replacement(SKOLNICK.keys(), 2):
-    title = """
-    <h1>{0} vs. {1}</h1>
-    """.format(family1, family2,)
+def protein(args):
+    """
+    Returns the protein from the corpus, or else the registry.
     
-    # Table Headers
-    html += title + """
-    <table>
-        <tr>
-            <th>Protein 1</th>
-            <th>Protein 2</th>
-            <th>Aligned</th>
-            <th>Alignment Length</th>
-            <th>Percentage</th>
-        </tr>
+    Key arguments:
+    args -- the pdb parser arguments.
     """
-    alignments = []
-    percentages = []
-    for protein1, protein2 in product(SKOLNICK[family1].keys(), SKOLNICK[family2].keys()):
-        protein1 = Protein(ProteinParser.factory('pdb', (SKOLNICK[family1][protein1])))
-        protein2 = Protein(ProteinParser.factory('pdb', (SKOLNICK[family2][protein2])))
-        matrix, seq1, seq2 = EIGAs.global_align(protein1, protein2)
-        aligned = EIGAs.aligned(seq1=seq1, seq2=seq2)
+    if corpus is not None:
+        return corpus.protein(args[0])
     
-        html += """
-        <tr>
-            <td>{0} ({1})</td>
-            <td>{2} ({3})</td>
-            <td>{4}</td>
-            <td>{5}</td>
-            <td>{6}</td>
-        </tr>
-        """.format(protein1.name, len(protein1.fingerprint),
-                   protein2.name, len(protein2.fingerprint),
-                   aligned,
-                   len(seq1),
-                   aligned / float(len(seq1)))
-        
-        alignments.append(aligned)
-        percentages.append(aligned / float(len(seq1)))
-        
-    html += """
-        <tr>
-            <td colspan="3">&nbsp;</td>
-        </tr>
-        <tr>
-            <td colspan="2">Aligned Average:</td>
-            <td>{0}</td>
-        </tr>
-        <tr>
-            <td colspan="2">Aligned STDEV:</td>
-            <td>{1}</td>
-        </tr>
-        <tr>
-            <td colspan="2">Percentage Average:</td>
-            <td>{2}</td>
-        </tr>
-        <tr>
-            <td colspan="2">Percentage STDEV:</td>
-            <td>{3}</td>
-        </tr>
-    </table>
-    """.format(average(alignments),
-               std(alignments),
-               average(percentages),
-               std(percentages))
+    return registry.protein('ca', args)
+
+# Fingerprint every protein up front, reading files holding several chains once.
+if corpus is None:
+    registry.proteins('ca', [entry for family in SKOLNICK.values() for entry in family.values()])
+
+families = [(family, [protein(SKOLNICK[family][name]) for name in SKOLNICK[family].keys()])
+            for family in SKOLNICK.keys()]
+
+html = skolnick_html(families, EIGAs.global_counts)
 
 open(args[0], 'w').write(html)
+print('Proteins: {hits} hits, {misses} misses.'.format(**registry.stats()))
+if trace is not None:
+    Instrument.trace(trace, Instrument.stop())
+    print(Instrument.table())
 print('Complete.')
\ No newline at end of file
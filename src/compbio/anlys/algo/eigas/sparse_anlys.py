@@ -0,0 +1,130 @@
+"""
+Analysis of the sparse contact matrix fingerprint against the dense one.
+
+For each hard protein, reports the density of the contact matrix and the
+fraction of residues whose fingerprint matches the dense fingerprint for
+several numbers of eigenvalues. For the hard alignment pairs, reports the
+number of aligned residues with both fingerprints.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 Aaron Zampaglione
+@license MIT
+"""
+from compbio.algo.eigas.core import EIGAs
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+from numpy import isclose, mean
+
+import getopt
+import sys
+
+# Get command line args.
+opts, args = getopt.getopt(sys.argv[1:], ':o')
+if not len(args):
+    raise Exception('Missing output file.')
+
+# Number of eigenvalues to compare.
+COMPONENTS = [8, 16, 32, 64, 128]
+
+# Same pairs as the hard analysis.
+PROTEIN_PAIRS = [('1FXIa', '1UBQ'),
+                 ('1TEN', '3HHRb'),
+                 ('3HLAb', '2RHE'),
+                 ('2AZAa', '1PAZ'),
+                 ('1CEWi', '1MOLa'),
+                 ('1CID', '2RHE'),
+                 ('1CRL', '1EDE'),
+                 ('2SIM', '1NSBa'),
+                 ('1BGEb', '2GMFa'),
+                 ('1TIE', '4FGF'),
+                 ]
+
+# The sparse fingerprint uses the symmetric eigensolver sign convention.
+Protein.fast = True
+
+dense = {}
+sparse = {}
+density = {}
+for name in sorted(HARD):
+    parser = ProteinParser.factory('ca', HARD[name])
+    
+    Protein.sparse = False
+    dense[name] = Protein(parser)
+    
+    Protein.sparse = True
+    sparse[name] = {}
+    for components in COMPONENTS:
+        Protein.components = components
+        sparse[name][components] = Protein(parser)
+    
+    density[name] = Protein.sparse_cmatrix(parser.coords()).nnz / float(len(dense[name].fingerprint) ** 2)
+
+# Fingerprint agreement.
+html = """
+<h1>Fingerprint agreement</h1>
+<table>
+    <tr>
+        <th>Protein</th>
+        <th>Contact Density</th>
+"""
+for components in COMPONENTS:
+    html += """        <th>{0} Eigenvalues</th>
+""".format(components)
+html += """    </tr>
+"""
+
+for name in sorted(HARD):
+    html += """
+    <tr>
+        <td>{0} ({1})</td>
+        <td>{2:.3f}</td>
+    """.format(name, len(dense[name].fingerprint), density[name])
+    for components in COMPONENTS:
+        html += """    <td>{0:.3f}</td>
+    """.format(mean(isclose(sparse[name][components].fingerprint, dense[name].fingerprint)))
+    html += """</tr>
+    """
+
+html += """
+</table>
+"""
+
+# Aligned residues.
+html += """
+<h1>Aligned residues</h1>
+<table>
+    <tr>
+        <th>Protein 1</th>
+        <th>Protein 2</th>
+        <th>Dense</th>
+"""
+for components in COMPONENTS:
+    html += """        <th>{0} Eigenvalues</th>
+""".format(components)
+html += """    </tr>
+"""
+
+for name1, name2 in PROTEIN_PAIRS:
+    html += """
+    <tr>
+        <td>{0} ({1})</td>
+        <td>{2} ({3})</td>
+        <td>{4}</td>
+    """.format(name1, len(dense[name1].fingerprint),
+               name2, len(dense[name2].fingerprint),
+               EIGAs.aligned(protein1=dense[name1], protein2=dense[name2]))
+    for components in COMPONENTS:
+        html += """    <td>{0}</td>
+    """.format(EIGAs.aligned(protein1=sparse[name1][components], protein2=sparse[name2][components]))
+    html += """</tr>
+    """
+
+html += """
+</table>
+"""
+
+open(args[0], 'w').write(html)
+print('Complete.')
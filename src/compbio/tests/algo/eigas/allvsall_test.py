@@ -0,0 +1,146 @@
+"""
+Unit tests for the all-vs-all comparison.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from compbio.algo.eigas.allvsall import AllVsAll, global_compare, local_compare
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.journal import PairJournal
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+class TestCompbioAlgoEIGAsAllVsAll(unittest.TestCase):
+    
+    # Proteins to compare.
+    NAMES = ['1UBQ', '1TEN', '1FXIa', '1MOLa']
+    
+    def setUp(self):
+        """
+        Fingerprints the proteins.
+        """
+        self.proteins = [Protein(ProteinParser.factory('pdb', HARD[name])) for name in self.NAMES]
+    
+    def testPairs(self):
+        """
+        Tests every ordered pair is compared.
+        """
+        pairs = AllVsAll(self.proteins).pairs()
+        self.assertEqual(len(pairs), 16)
+        self.assertEqual(pairs[:5], [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0)])
+        self.assertEqual(pairs[-1], (3, 3))
+    
+    def testRun(self):
+        """
+        Tests the parallel results match the serial ones, in the same order.
+        """
+        for compare in (local_compare, global_compare):
+            serial = list(AllVsAll(self.proteins, compare).run())
+            parallel = list(AllVsAll(self.proteins, compare, jobs=2).run())
+            self.assertEqual(parallel, serial)
+        
+        matrix = AllVsAll(self.proteins, global_compare).matrix()
+        self.assertEqual(matrix[1][2], global_compare(self.proteins[1], self.proteins[2]))
+        self.assertEqual(matrix[2][1], global_compare(self.proteins[2], self.proteins[1]))
+    
+    def testResume(self):
+        """
+        Tests a run resumed from its journal only compares the pairs left.
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'pairs.journal')
+            
+            expected = list(AllVsAll(self.proteins, global_compare).run())
+            
+            # Interrupted after a few pairs.
+            journal = PairJournal(path, self.NAMES)
+            results = AllVsAll(self.proteins, global_compare).run(journal=journal)
+            partial = [next(results) for _ in range(4)]
+            results.close()
+            journal.close()
+            self.assertEqual(partial, expected[:4])
+            
+            compared = []
+            def compare(protein1, protein2):
+                compared.append((protein1.name, protein2.name))
+                return global_compare(protein1, protein2)
+            
+            journal = PairJournal(path, self.NAMES)
+            self.assertEqual(list(AllVsAll(self.proteins, compare).run(journal=journal)), expected)
+            journal.close()
+            self.assertEqual(len(compared), len(expected) - 4)
+            
+            journal = PairJournal(path, self.NAMES)
+            self.assertEqual(list(AllVsAll(self.proteins, compare, jobs=2).run(journal=journal)), expected)
+            journal.close()
+            self.assertEqual(len(compared), len(expected) - 4)
+        finally:
+            shutil.rmtree(directory)
+    
+    def testRemap(self):
+        """
+        Tests a run on more proteins only compares the pairs with a new one.
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'pairs.journal')
+            
+            journal = PairJournal(path, self.NAMES[:3])
+            list(AllVsAll(self.proteins[:3], global_compare).run(journal=journal))
+            journal.close()
+            
+            names, results = PairJournal.load(path)
+            
+            # One protein added in front, one left out.
+            new_names = [self.NAMES[3], self.NAMES[2], self.NAMES[0]]
+            new_proteins = [self.proteins[3], self.proteins[2], self.proteins[0]]
+            remapped = AllVsAll.remap(results, names, new_names)
+            self.assertEqual(sorted(remapped), [(1, 1), (1, 2), (2, 1), (2, 2)])
+            self.assertEqual(remapped[(1, 2)], results[(2, 0)])
+            self.assertEqual(remapped[(2, 1)], results[(0, 2)])
+            
+            compared = []
+            def compare(protein1, protein2):
+                compared.append((protein1.name, protein2.name))
+                return global_compare(protein1, protein2)
+            
+            journal = PairJournal(os.path.join(directory, 'more.journal'), new_names)
+            journal.extend(remapped)
+            rows = list(AllVsAll.rows(AllVsAll(new_proteins, compare).run(journal=journal), 3))
+            journal.close()
+            
+            # Only the added protein against every protein, both ways.
+            self.assertEqual(len(compared), 5)
+            self.assertEqual([row for _, row in rows], AllVsAll(new_proteins, global_compare).matrix())
+        finally:
+            shutil.rmtree(directory)
+    
+    def testRows(self):
+        """
+        Tests the rows are the rows of the matrix, and a missing pair isn't
+        mirrored.
+        """
+        allvsall = AllVsAll(self.proteins, global_compare)
+        
+        results = list(allvsall.run())
+        rows = list(AllVsAll.rows(results, len(self.proteins)))
+        
+        self.assertEqual([i for i, _ in rows], list(range(len(self.proteins))))
+        self.assertEqual([row for _, row in rows], allvsall.matrix())
+        self.assertEqual([row[:2] for _, row in rows[:2]], [[results[0][2], results[1][2]], [results[4][2], results[5][2]]])
+        
+        upper = [(i, j, result) for i, j, result in results if i <= j]
+        self.assertRaises(EIGAsException, list, AllVsAll.rows(upper, len(self.proteins)))
+        self.assertRaises(EIGAsException, list, AllVsAll.rows(results[:-1], len(self.proteins)))
+
+if __name__ == "__main__":
+    unittest.main()
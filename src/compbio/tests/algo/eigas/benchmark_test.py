@@ -0,0 +1,46 @@
+"""
+Unit tests for the EIGAs benchmarks.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import json
+import unittest
+
+from compbio.algo.eigas.benchmark import Benchmark
+from compbio.algo.eigas.exception import EIGAsException
+
+class TestCompbioAlgoEIGAsBenchmark(unittest.TestCase):
+    
+    def testRun(self):
+        """
+        Tests every stage is timed on the fixed pairs and the results are JSON.
+        """
+        results = json.loads(json.dumps(Benchmark(repeat=2, limit=1).run(['hard'])))
+        
+        self.assertEqual(results['settings']['repeat'], 2)
+        self.assertEqual(results['datasets']['hard']['pairs'], [['1FXIa', '1UBQ']])
+        
+        stages = results['datasets']['hard']['stages']
+        self.assertEqual(sorted(stages), sorted(Benchmark.STAGES))
+        for timings in stages.values():
+            self.assertEqual(timings['runs'], 2)
+            self.assertTrue(timings['min'] <= timings['p25'] <= timings['median'] <= timings['p75'] <= timings['max'])
+            self.assertTrue(timings['cells'] > 0)
+        
+        # Parsing counts residues, the other stages matrix cells.
+        self.assertEqual(stages['parse']['cells'], 96 + 76)
+        self.assertEqual(stages['eigen']['cells'], 96 ** 2 + 76 ** 2)
+        self.assertEqual(stages['global_align']['cells'], 96 * 76)
+        self.assertEqual(stages['global_fill']['cells'], 96 * 76)
+        
+        ratios = Benchmark.compare(results, results)
+        self.assertTrue(all(ratio == 1.0 for ratio in ratios['hard'].values()))
+        
+        self.assertRaises(EIGAsException, Benchmark(repeat=1).run, ['unknown'])
+        self.assertRaises(EIGAsException, Benchmark, 0)
+
+if __name__ == "__main__":
+    unittest.main()
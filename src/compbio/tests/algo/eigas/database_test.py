@@ -0,0 +1,86 @@
+"""
+Unit tests for the fingerprint database search.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.allvsall import global_compare, local_compare
+from compbio.algo.eigas import database
+from compbio.algo.eigas.database import FingerprintDatabase
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+class TestCompbioAlgoEIGAsDatabase(unittest.TestCase):
+    
+    # Target proteins.
+    NAMES = ['1UBQ', '1TEN', '1FXIa', '1MOLa', '2AZAa']
+    
+    def setUp(self):
+        """
+        Fingerprints the proteins.
+        """
+        self.proteins = [Protein(ProteinParser.factory('ca', HARD[name])) for name in self.NAMES]
+    
+    def testSearch(self):
+        """
+        Tests the hits are the best targets, best first.
+        """
+        database = FingerprintDatabase(self.proteins)
+        query = self.proteins[2]
+        
+        for mode, compare, rank in (('global', global_compare, 0), ('local', local_compare, 1)):
+            hits = database.search(query, 3, mode)
+            
+            self.assertEqual(len(hits), 3)
+            self.assertEqual(hits[0].name, '1FXIa')
+            
+            scores = sorted((compare(query, protein)[rank] for protein in self.proteins), reverse=True)
+            self.assertEqual([hit.score for hit in hits], scores[:3])
+            
+            for hit in hits:
+                self.assertEqual(hit.name, self.NAMES[hit.index])
+        
+        self.assertEqual(len(database.search(query, 10)), len(self.NAMES))
+        self.assertRaises(EIGAsException, database.search, query, 3, 'semi')
+    
+    def testSerialBatches(self):
+        """
+        Tests a single process search scores the targets in batches.
+        """
+        sizes = []
+        search_batch = database.search_batch
+        
+        def record(compare, query, targets):
+            sizes.append(len(targets))
+            return search_batch(compare, query, targets)
+        
+        query = self.proteins[0]
+        try:
+            database.search_batch = record
+            hits = FingerprintDatabase(self.proteins * 4).search(query, 5)
+        finally:
+            database.search_batch = search_batch
+        
+        self.assertEqual(sizes, [5, 5, 5, 5])
+        
+        scores = sorted((global_compare(query, protein)[0] for protein in self.proteins * 4), reverse=True)
+        self.assertEqual([hit.score for hit in hits], scores[:5])
+    
+    def testParallel(self):
+        """
+        Tests the parallel hits match the serial ones.
+        """
+        query = self.proteins[0]
+        
+        for mode in ('global', 'local'):
+            self.assertEqual(FingerprintDatabase(self.proteins, jobs=2).search(query, 5, mode),
+                             FingerprintDatabase(self.proteins).search(query, 5, mode))
+
+if __name__ == "__main__":
+    unittest.main()
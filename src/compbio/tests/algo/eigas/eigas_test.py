@@ -6,24 +6,189 @@ Unit tests for the EIGA class.
 @copyright 2011 (c) Aaron Zampaglione
 @license MIT
 """
+import random
 import unittest
 
 from compbio.algo.eigas.core import EIGAs
+from compbio.algo.eigas.exception import EIGAsException
 from compbio.algo.eigas.protein.core import Protein
 from compbio.algo.eigas.protein.parser.core import ProteinParser
 from compbio.common.data import HARD
 
+class Fingerprint(object):
+    """
+    Stand-in for a protein with a known fingerprint.
+    """
+    
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
 class TestCompbioAlgoEIGAs(unittest.TestCase):
     
     def testSelfAlign(self):
         """
         Tests self aligning a protein to itself.
         """
-        protein = Protein(ProteinParser.factory('pdb', ('1BGE', HARD['1BGE'][0], HARD['1BGE'][1])))
+        protein = Protein(ProteinParser.factory('pdb', HARD['1BGEb']))
         
-        matrix, seq1, seq2 = EIGAs.global_align(protein, protein)
+        matrix, seq1, seq2 = EIGAs.global_align(protein, protein, matrix=True)
         self.assertEqual(matrix[-1][-1].value, 0.0)
         self.assertEqual(seq1, seq2)
+    
+    def testGlobalAlign(self):
+        """
+        Tests global alignment of two small fingerprints.
+        """
+        protein1 = Fingerprint([1.0, 2.0, 3.0, 4.0])
+        protein2 = Fingerprint([1.0, 3.0, 4.0])
+        
+        matrix, seq1, seq2 = EIGAs.global_align(protein1, protein2)
+        self.assertEqual(matrix, None)
+        self.assertEqual(seq1, [0, 1, 2, 3])
+        self.assertEqual(seq2, [0, 1, None, 2])
+        self.assertEqual(EIGAs.aligned(seq1=seq1, seq2=seq2), 3)
+    
+    def testGlobalCounts(self):
+        """
+        Tests the counts without traceback against the global alignment.
+        """
+        protein1 = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('pdb', HARD['1FXIa']))
+        
+        # Both orientations, the longest fingerprint is walked over.
+        for p1, p2 in ((protein1, protein2), (protein2, protein1), (protein1, protein1)):
+            _, seq1, seq2 = EIGAs.global_align(p1, p2)
+            aligned = EIGAs.aligned(seq1=seq1, seq2=seq2)
+            
+            self.assertEqual(EIGAs.global_counts(p1, p2), (aligned, len(seq1)))
+            self.assertEqual(EIGAs.aligned(protein1=p1, protein2=p2), aligned)
+        
+        self.assertEqual(EIGAs.global_counts(Fingerprint([1.0, 2.0, 3.0, 4.0]), Fingerprint([1.0, 3.0, 4.0])), (3, 4))
+        self.assertEqual(EIGAs.global_counts(Fingerprint([1.0]), Fingerprint([5.0, 6.0])), (1, 2))
+    
+    def testGlobalAlignLinear(self):
+        """
+        Tests the linear memory global alignment against the full one.
+        """
+        protein1 = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('pdb', HARD['1FXIa']))
+        
+        _, seq1, seq2 = EIGAs.global_align(protein1, protein2, mode=EIGAs.FULL)
+        
+        block = EIGAs.LINEAR_BLOCK
+        budget = EIGAs.CELL_BUDGET
+        try:
+            # Force a few levels of recursion.
+            EIGAs.LINEAR_BLOCK = 4 * len(protein2.fingerprint)
+            self.assertEqual(EIGAs.global_align(protein1, protein2, mode=EIGAs.LINEAR), (None, seq1, seq2))
+            
+            # The linear mode is picked automatically above the budget.
+            EIGAs.CELL_BUDGET = 0
+            self.assertEqual(EIGAs.global_align(protein1, protein2), (None, seq1, seq2))
+            self.assertRaises(EIGAsException, EIGAs.global_align, protein1, protein2, matrix=True, mode=EIGAs.LINEAR)
+        finally:
+            EIGAs.LINEAR_BLOCK = block
+            EIGAs.CELL_BUDGET = budget
+    
+    def testGlobalAlignBanded(self):
+        """
+        Tests the banded global alignment against the full one.
+        """
+        protein1 = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('pdb', HARD['1FXIa']))
+        
+        _, seq1, seq2 = EIGAs.global_align(protein1, protein2, mode=EIGAs.FULL)
+        
+        # A band covering the matrix is the full DP.
+        self.assertEqual(EIGAs.banded_align(protein1, protein2, len(seq1)), (False, seq1, seq2))
+        
+        # The path doesn't fit in a band of zero.
+        touched, banded1, banded2 = EIGAs.banded_align(protein1, protein2, 0)
+        self.assertTrue(touched)
+        self.assertEqual(len([i for i in banded1 if i is not None]), len(protein1.fingerprint))
+        self.assertEqual(len([j for j in banded2 if j is not None]), len(protein2.fingerprint))
+        
+        for band in (0, 4, None):
+            self.assertEqual(EIGAs.global_align(protein1, protein2, mode=EIGAs.BANDED, band=band), (None, seq1, seq2))
+        
+        self.assertRaises(EIGAsException, EIGAs.global_align, protein1, protein2, matrix=True, mode=EIGAs.BANDED)
+        self.assertRaises(EIGAsException, EIGAs.banded_align, protein1, protein2, -1)
+    
+    def testGlobalAlignBandedRandom(self):
+        """
+        Tests banded global alignments whose path stays clear of the band
+        against the full ones, over random fingerprints.
+        """
+        rand = random.Random(0)
+        
+        clear = 0
+        for n in range(400):
+            # Small integers tie often.
+            if n % 2:
+                draw = lambda: float(rand.randint(0, 3))
+            else:
+                draw = lambda: rand.gauss(0.0, 2.0)
+            protein1 = Fingerprint([draw() for _ in range(rand.randint(1, 30))])
+            protein2 = Fingerprint([draw() for _ in range(rand.randint(1, 30))])
+            
+            full = EIGAs.global_align(protein1, protein2, mode=EIGAs.FULL)
+            for band in (0, 1, 2, 4, 8):
+                touched, seq1, seq2 = EIGAs.banded_align(protein1, protein2, band)
+                if not touched:
+                    clear += 1
+                    self.assertEqual((None, seq1, seq2), full)
+            
+            self.assertEqual(EIGAs.global_align(protein1, protein2, mode=EIGAs.BANDED, band=rand.randint(0, 4)), full)
+        
+        self.assertTrue(clear > 0)
+    
+    def testLocalAlign(self):
+        """
+        Tests local alignment of two small fingerprints.
+        """
+        protein1 = Fingerprint([5.0, 1.0, 2.0, 3.0, 9.0])
+        protein2 = Fingerprint([7.0, 1.2, 2.1, 3.3, 0.0])
+        
+        matrix, seqs = EIGAs.local_align(protein1, protein2)
+        self.assertEqual(matrix, None)
+        self.assertEqual([(cell.value, seq1, seq2) for cell, seq1, seq2 in seqs],
+                         [(6, [1, 2, 3], [1, 2, 3]),
+                          (5, [1, 2, 3, 4], [1, 2, 3, 4]),
+                          (4, [2, 3], [1, 2])])
+    
+    def testLocalAlignBest(self):
+        """
+        Tests only the best local alignments are returned.
+        """
+        protein1 = Fingerprint([5.0, 1.0, 2.0, 3.0, 9.0])
+        protein2 = Fingerprint([7.0, 1.2, 2.1, 3.3, 0.0])
+        
+        _, seqs = EIGAs.local_align(protein1, protein2)
+        
+        self.assertEqual(EIGAs.local_align(protein1, protein2, k=2)[1], seqs[:2])
+        self.assertEqual(EIGAs.local_align(protein1, protein2, k=0)[1], [])
+        self.assertEqual(EIGAs.local_align(protein1, protein2, min_score=5)[1], seqs[:2])
+        self.assertEqual(EIGAs.local_align(protein1, protein2, k=1, min_score=7)[1], [])
+        
+        protein1 = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('pdb', HARD['1FXIa']))
+        
+        _, seqs = EIGAs.local_align(protein1, protein2, max_gaps=2)
+        for k in (1, 3, 50):
+            self.assertEqual(EIGAs.local_align(protein1, protein2, max_gaps=2, k=k)[1], seqs[:k])
+    
+    def testLocalAlignWavefront(self):
+        """
+        Tests the wavefront local alignment against the cell by cell one.
+        """
+        protein1 = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('pdb', HARD['1FXIa']))
+        
+        for max_gaps in (0, 2):
+            matrix1, seqs1 = EIGAs.local_align(protein1, protein2, max_gaps=max_gaps, matrix=True)
+            matrix2, seqs2 = EIGAs.local_align(protein1, protein2, max_gaps=max_gaps, matrix=True, wavefront=False)
+            self.assertTrue((matrix1 == matrix2).all())
+            self.assertEqual(seqs1, seqs2)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
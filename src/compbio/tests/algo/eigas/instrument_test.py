@@ -0,0 +1,89 @@
+"""
+Unit tests for the EIGAs instrumentation.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from compbio.algo.eigas.core import EIGAs
+from compbio.algo.eigas.instrument import Instrument
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+class TestCompbioAlgoEIGAsInstrument(unittest.TestCase):
+    
+    def setUp(self):
+        """
+        Creates a directory for the trace.
+        """
+        self.dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """
+        Stops recording and removes the trace.
+        """
+        Instrument.stop()
+        shutil.rmtree(self.dir)
+    
+    def testDisabled(self):
+        """
+        Tests nothing is recorded by default.
+        """
+        Instrument.start()
+        Instrument.stop()
+        
+        protein = Protein(ProteinParser.factory('ca', HARD['1UBQ']))
+        EIGAs.global_align(protein, protein)
+        
+        self.assertEqual(Instrument.events, [])
+    
+    def testStages(self):
+        """
+        Tests every stage is recorded with its shape, summarized and traced.
+        """
+        Instrument.start()
+        
+        protein1 = Protein(ProteinParser.factory('ca', HARD['1UBQ']))
+        protein2 = Protein(ProteinParser.factory('ca', HARD['1FXIa']))
+        EIGAs.global_align(protein1, protein2)
+        EIGAs.global_align(protein1, protein2, mode=EIGAs.BANDED)
+        EIGAs.local_align(protein1, protein2, k=1)
+        
+        events = Instrument.stop()
+        
+        summary = dict(Instrument.summary(events))
+        for name in ('protein.parse', 'protein.distance', 'protein.contact', 'protein.eigen',
+                     'global.scores', 'global.fill', 'global.traceback', 'global.banded',
+                     'local.scores', 'local.fill', 'local.traceback'):
+            self.assertTrue(name in summary, name)
+        
+        self.assertEqual(summary['protein.parse']['calls'], 2)
+        self.assertEqual(summary['protein.parse']['cells'], 76 + 96)
+        self.assertEqual(summary['protein.eigen']['largest'], (96, 96))
+        self.assertEqual(summary['global.fill']['cells'], 76 * 96)
+        self.assertTrue(summary['global.fill']['cells_per_second'] > 0)
+        
+        # Bands are never wider than the matrix.
+        self.assertTrue(summary['global.banded']['largest'][1] <= 96)
+        
+        self.assertTrue('global.fill' in Instrument.table(events))
+        
+        file_name = os.path.join(self.dir, 'trace.json')
+        Instrument.trace(file_name, events)
+        with open(file_name) as f:
+            trace = json.load(f)['traceEvents']
+        
+        self.assertEqual(len(trace), len(events))
+        self.assertEqual(set(event['ph'] for event in trace), set(['X']))
+        self.assertEqual([event for event in trace if event['name'] == 'global.fill'][0]['args']['shape'], [76, 96])
+
+if __name__ == "__main__":
+    unittest.main()
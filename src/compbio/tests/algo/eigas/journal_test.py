@@ -0,0 +1,115 @@
+"""
+Unit tests for the all-vs-all pair journal.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from numpy import int64
+
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.journal import PairJournal
+
+class TestCompbioAlgoEIGAsJournal(unittest.TestCase):
+    
+    def setUp(self):
+        """
+        Creates a directory for the journal.
+        """
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'pairs.journal')
+    
+    def tearDown(self):
+        """
+        Removes the journal.
+        """
+        shutil.rmtree(self.dir)
+    
+    def testResults(self):
+        """
+        Tests the results are read back after a restart.
+        """
+        journal = PairJournal(self.path, {'names': ['A', 'B']})
+        self.assertEqual(journal.results(), {})
+        journal.append(0, 0, (10, int64(20)))
+        journal.append(0, 1, None)
+        journal.close()
+        
+        journal = PairJournal(self.path, {'names': ['A', 'B']})
+        self.assertEqual(journal.results(), {(0, 0): (10, 20), (0, 1): None})
+        journal.append(1, 1, (3, 4))
+        journal.close()
+        
+        self.assertEqual(len(PairJournal(self.path, {'names': ['A', 'B']}).results()), 3)
+    
+    def testCrash(self):
+        """
+        Tests a line cut short is dropped and overwritten.
+        """
+        journal = PairJournal(self.path, ['A', 'B'])
+        journal.append(0, 0, (1, 2))
+        journal.close()
+        
+        with open(self.path, 'ab') as f:
+            f.write(b'[0, 1, [3')
+        
+        journal = PairJournal(self.path, ['A', 'B'])
+        self.assertEqual(journal.results(), {(0, 0): (1, 2)})
+        journal.append(0, 1, (3, 4))
+        journal.close()
+        
+        self.assertEqual(PairJournal(self.path, ['A', 'B']).results(), {(0, 0): (1, 2), (0, 1): (3, 4)})
+    
+    def testKey(self):
+        """
+        Tests the journal of another run is refused.
+        """
+        PairJournal(self.path, ['A', 'B']).close()
+        
+        self.assertRaises(EIGAsException, PairJournal, self.path, ['A', 'C'])
+    
+    def testExtend(self):
+        """
+        Tests results added at once are kept and loaded back.
+        """
+        journal = PairJournal(self.path, {'names': ['A', 'B']})
+        journal.append(0, 0, (1, 2))
+        journal.extend({(1, 1): (5, 6), (0, 1): (3, int64(4))})
+        self.assertEqual(journal.results(), {(0, 1): (3, 4), (1, 1): (5, 6)})
+        journal.close()
+        
+        key, results = PairJournal.load(self.path)
+        self.assertEqual(key, {'names': ['A', 'B']})
+        self.assertEqual(results, {(0, 0): (1, 2), (0, 1): (3, 4), (1, 1): (5, 6)})
+    
+    def testReplace(self):
+        """
+        Tests a journal is swapped whole for one of another run.
+        """
+        journal = PairJournal(self.path, {'names': ['A']})
+        journal.append(0, 0, (1, 2))
+        journal.close()
+        
+        # A crash while writing the new journal leaves the old one.
+        with open(self.path + '.new', 'wb') as f:
+            f.write(b'{"key": {"names"')
+        self.assertEqual(PairJournal.load(self.path), ({'names': ['A']}, {(0, 0): (1, 2)}))
+        
+        PairJournal.replace(self.path, {'names': ['A', 'B']}, {(0, 0): (1, 2)})
+        self.assertEqual(os.listdir(self.dir), ['pairs.journal'])
+        
+        journal = PairJournal(self.path, {'names': ['A', 'B']})
+        self.assertEqual(journal.results(), {(0, 0): (1, 2)})
+        journal.append(0, 1, (3, 4))
+        journal.close()
+        
+        self.assertEqual(PairJournal.load(self.path), ({'names': ['A', 'B']}, {(0, 0): (1, 2), (0, 1): (3, 4)}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for the precision policy.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from numpy import allclose, float32, int32
+from scipy.spatial.distance import cdist
+
+from compbio.algo.eigas.core import EIGAs
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.precision import Precision
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+class TestCompbioAlgoEIGAsPrecision(unittest.TestCase):
+    
+    def tearDown(self):
+        """
+        Restores double precision.
+        """
+        Precision.set('float64')
+    
+    def testSet(self):
+        """
+        Tests only the supported policies are set.
+        """
+        Precision.set('float32')
+        self.assertEqual(Precision.floating(), float32)
+        self.assertEqual(Precision.integer(), int32)
+        
+        self.assertRaises(EIGAsException, Precision.set, 'float16')
+        self.assertEqual(Precision.policy, 'float32')
+    
+    def testProtein(self):
+        """
+        Tests single precision matrices and fingerprints against double
+        precision ones.
+        """
+        double = Protein(ProteinParser.factory('ca', HARD['1UBQ']))
+        
+        Precision.set('float32')
+        parser = ProteinParser.factory('ca', HARD['1UBQ'])
+        self.assertEqual(parser.coords().dtype, float32)
+        
+        dmatrix = Protein.dmatrix(parser.coords())
+        self.assertEqual(dmatrix.dtype, float32)
+        self.assertEqual(Protein.cmatrix(dmatrix).dtype, float32)
+        self.assertTrue(allclose(dmatrix, cdist(double.coords, double.coords), rtol=0, atol=1e-4))
+        
+        single = Protein(parser)
+        self.assertEqual(single.r.dtype, float32)
+        self.assertTrue(allclose(single.fingerprint, double.fingerprint, rtol=1e-5, atol=1e-5))
+    
+    def testAlign(self):
+        """
+        Tests single precision DP matrices give the double precision alignments.
+        """
+        names = ('1FXIa', '1UBQ')
+        
+        double = [Protein(ProteinParser.factory('ca', HARD[name])) for name in names]
+        global_double = EIGAs.global_align(*double)
+        local_double = EIGAs.local_align(*double, k=3)
+        counts_double = EIGAs.global_counts(*double)
+        
+        Precision.set('float32')
+        single = [Protein(ProteinParser.factory('ca', HARD[name])) for name in names]
+        
+        matrix, s1, s2 = EIGAs.global_align(*single, matrix=True)
+        self.assertEqual(matrix.dtype['value'], float32)
+        self.assertEqual((None, s1, s2), global_double)
+        self.assertEqual(EIGAs.global_counts(*single), counts_double)
+        
+        matrix, seqs = EIGAs.local_align(*single, matrix=True, k=3)
+        self.assertEqual(matrix.dtype['value'], int32)
+        self.assertEqual(matrix.dtype['score'], float32)
+        self.assertEqual(seqs, local_double[1])
+
+if __name__ == "__main__":
+    unittest.main()
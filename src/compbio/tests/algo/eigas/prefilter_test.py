@@ -0,0 +1,134 @@
+"""
+Unit tests for the alignment prefilter.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import random
+import unittest
+
+from compbio.algo.eigas.allvsall import AllVsAll, global_compare, local_compare
+from compbio.algo.eigas.database import FingerprintDatabase
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.prefilter import Prefilter
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+class TestCompbioAlgoEIGAsPrefilter(unittest.TestCase):
+    
+    # Proteins to compare.
+    NAMES = ['1UBQ', '1TEN', '1FXIa', '1MOLa', '2AZAa', '1CEWi']
+    
+    def setUp(self):
+        """
+        Fingerprints the proteins.
+        """
+        self.proteins = [Protein(ProteinParser.factory('ca', HARD[name])) for name in self.NAMES]
+    
+    def testMatches(self):
+        """
+        Tests the number of matching residue pairs.
+        """
+        self.assertEqual(Prefilter.matches([1.0, 2.0, 3.0], [1.5, 2.6, 10.0]), 2)
+        self.assertEqual(Prefilter.matches([1.0, 1.1, 1.2], [1.05]), 1)
+        self.assertEqual(Prefilter.matches([1.0], [2.0]), 0)
+        self.assertEqual(Prefilter.matches([], [2.0]), 0)
+    
+    def testBound(self):
+        """
+        Tests the bounds are never below the alignment results.
+        """
+        for mode, compare, rank in (('global', global_compare, 0), ('local', local_compare, 1)):
+            prefilter = Prefilter(mode)
+            for protein1 in self.proteins:
+                for protein2 in self.proteins:
+                    self.assertTrue(prefilter.bound(protein1, protein2) >= compare(protein1, protein2)[rank])
+        
+        self.assertRaises(EIGAsException, Prefilter, 'semi')
+    
+    def families(self):
+        """
+        Returns proteins of three families with random fingerprints, within
+        the gap penalty of each other in a family and far apart otherwise.
+        """
+        rand = random.Random(0)
+        
+        proteins = []
+        for family in range(3):
+            fingerprint = [rand.uniform(0.0, 40.0) for _ in range(40)]
+            for member in range(2):
+                proteins.append(Protein.restore('{0}{1}'.format(family, member), None, None,
+                                                [value + rand.uniform(-0.25, 0.25) for value in fingerprint]))
+        
+        return proteins
+    
+    def testRun(self):
+        """
+        Tests the best run of matches and mismatches along a diagonal.
+        """
+        self.assertEqual(Prefilter.run([1.0, 2.0, 3.0], [1.5, 2.6, 10.0]), 4)
+        self.assertEqual(Prefilter.run([1.0, 5.0, 3.0], [1.0, 9.0, 3.0]), 3)
+        self.assertEqual(Prefilter.run([5.0, 1.0, 2.0], [1.0, 2.0]), 4)
+        self.assertEqual(Prefilter.run([1.0], [2.0]), 0)
+        self.assertEqual(Prefilter.run([], [2.0]), 0)
+        
+        # Residues matching out of order don't add up.
+        protein1 = Protein.restore('a', None, None, [1.0, 5.0, 9.0, 13.0])
+        protein2 = Protein.restore('b', None, None, [13.0, 9.0, 5.0, 1.0])
+        self.assertEqual(Prefilter.matches(protein1.fingerprint, protein2.fingerprint), 4)
+        self.assertEqual(Prefilter(Prefilter.LOCAL).bound(protein1, protein2), 2)
+        self.assertEqual(Prefilter(Prefilter.LOCAL, max_gaps=2).bound(protein1, protein2), 4)
+    
+    def testAllVsAll(self):
+        """
+        Tests pruned pairs have no result and the others are unchanged.
+        """
+        proteins = self.families()
+        
+        expected = AllVsAll(proteins).matrix()
+        
+        prefilter = Prefilter(Prefilter.LOCAL, 40)
+        matrix = AllVsAll(proteins, prefilter=prefilter).matrix()
+        
+        pruned = 0
+        for i in range(len(proteins)):
+            for j in range(len(proteins)):
+                if matrix[i][j] is None:
+                    pruned += 1
+                    self.assertTrue(expected[i][j][1] < 40)
+                else:
+                    self.assertEqual(matrix[i][j], expected[i][j])
+        
+        self.assertEqual(prefilter.pairs, 36)
+        self.assertEqual(prefilter.pruned, pruned)
+        self.assertEqual(pruned, 24)
+    
+    def testSearch(self):
+        """
+        Tests the search hits are unchanged by pruning.
+        """
+        for jobs in (1, 2):
+            database = FingerprintDatabase(self.proteins, jobs)
+            
+            for mode in ('global', 'local'):
+                for query in self.proteins:
+                    prefilter = Prefilter(mode)
+                    self.assertEqual(database.search(query, 2, mode, prefilter), database.search(query, 2, mode))
+                    self.assertEqual(prefilter.pairs, len(self.proteins))
+        
+        proteins = self.families()
+        
+        prefilter = Prefilter(Prefilter.LOCAL, 40)
+        hits = FingerprintDatabase(proteins).search(proteins[0], 10, 'local', prefilter)
+        self.assertEqual(hits, [hit for hit in FingerprintDatabase(proteins).search(proteins[0], 10, 'local')
+                                if hit.score >= 40])
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(prefilter.pruned, 4)
+        
+        self.assertRaises(EIGAsException, FingerprintDatabase(proteins).search, proteins[0], 1, 'global', prefilter)
+
+if __name__ == "__main__":
+    unittest.main()
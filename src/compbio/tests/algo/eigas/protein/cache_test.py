@@ -0,0 +1,85 @@
+"""
+Unit tests for the protein fingerprint cache.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.protein.cache import ProteinCache
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+import os
+import shutil
+import tempfile
+
+class TestCompbioAlgoEIGAsProteinCache(unittest.TestCase):
+    
+    def setUp(self):
+        """
+        Creates an empty cache directory.
+        """
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """
+        Removes the cache directory.
+        """
+        shutil.rmtree(self.directory)
+    
+    def testCache(self):
+        """
+        Tests a cached protein matches a parsed one.
+        """
+        cache = ProteinCache(self.directory)
+        
+        self.assertEqual(cache.get('pdb', HARD['1UBQ']), None)
+        
+        protein = Protein(ProteinParser.factory('pdb', HARD['1UBQ']))
+        cached = cache.protein('pdb', HARD['1UBQ'])
+        self.assertEqual(cached.fingerprint, protein.fingerprint)
+        
+        cached = cache.get('pdb', HARD['1UBQ'])
+        self.assertEqual(cached.name, protein.name)
+        self.assertEqual(cached.fingerprint, protein.fingerprint)
+        self.assertEqual(list(cached.eigenvalues), list(protein.eigenvalues))
+        self.assertEqual(cached.coords.tolist(), [list(map(float, coord)) for coord in protein.coords])
+    
+    def testKey(self):
+        """
+        Tests the key depends on the chain and cutoff.
+        """
+        cache = ProteinCache(self.directory)
+        
+        key = cache.key('pdb', HARD['1FXIa'])
+        self.assertNotEqual(key, cache.key('pdb', (HARD['1FXIa'][0], HARD['1FXIa'][1], 'B')))
+        
+        cutoff = Protein.cutoff
+        try:
+            Protein.cutoff = 10
+            self.assertNotEqual(key, cache.key('pdb', HARD['1FXIa']))
+        finally:
+            Protein.cutoff = cutoff
+    
+    def testEvict(self):
+        """
+        Tests the least recently used entries are evicted.
+        """
+        cache = ProteinCache(self.directory)
+        cache.protein('pdb', HARD['1TEN'])
+        
+        # Make the first entry the least recently used one.
+        path = cache.path(cache.key('pdb', HARD['1TEN']))
+        os.utime(path, (0, 0))
+        
+        cache.max_size = os.path.getsize(path)
+        cache.protein('pdb', HARD['1UBQ'])
+        
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(cache.path(cache.key('pdb', HARD['1UBQ'])))])
+
+if __name__ == "__main__":
+    unittest.main()
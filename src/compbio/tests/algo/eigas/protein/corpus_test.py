@@ -0,0 +1,115 @@
+"""
+Unit tests for the protein corpus.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.precision import Precision
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.corpus import ProteinCorpus
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+from numpy import array_equal, float32, memmap
+
+import os
+import shutil
+import tempfile
+
+class TestCompbioAlgoEIGAsProteinCorpus(unittest.TestCase):
+    
+    NAMES = ('1UBQ', '1FXIa', '1TEN')
+    
+    def setUp(self):
+        """
+        Creates an empty corpus directory.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'hard.corpus')
+    
+    def tearDown(self):
+        """
+        Removes the corpus directory and resets the protein settings.
+        """
+        shutil.rmtree(self.directory)
+        Protein.cutoff = 8
+        Precision.set('float64')
+    
+    def testCorpus(self):
+        """
+        Tests proteins read back from a corpus match the parsed ones.
+        """
+        args = [HARD[name] for name in self.NAMES]
+        corpus = ProteinCorpus.compile(self.path, 'ca', args, ['a', 'b', 'a'])
+        
+        self.assertEqual(len(corpus), 3)
+        self.assertEqual(corpus.names, list(self.NAMES))
+        self.assertEqual(corpus.chains, [None, 'A', None])
+        self.assertEqual(corpus.families, ['a', 'b', 'a'])
+        self.assertTrue(isinstance(corpus.fingerprint(1), memmap))
+        
+        for i, a in enumerate(args):
+            protein = Protein(ProteinParser.factory('pdb', a))
+            
+            for key in (i, a[0]):
+                restored = corpus.protein(key)
+                self.assertEqual(restored.name, protein.name)
+                self.assertEqual(restored.fingerprint, protein.fingerprint)
+                self.assertTrue(array_equal(restored.eigenvalues, protein.eigenvalues))
+                self.assertTrue(array_equal(restored.coords, ProteinParser.factory('ca', a).coords()))
+        
+        self.assertRaises(EIGAsException, corpus.index, '1MOLa')
+    
+    def testEmpty(self):
+        """
+        Tests an empty corpus.
+        """
+        ProteinCorpus.build(self.path, [])
+        
+        self.assertEqual(ProteinCorpus(self.path).proteins(), [])
+    
+    def testPrecision(self):
+        """
+        Tests a single precision corpus stores its arrays in single precision.
+        """
+        args = [HARD[name] for name in self.NAMES]
+        ProteinCorpus.compile(self.path, 'ca', args)
+        size = os.path.getsize(self.path)
+        
+        Precision.set('float32')
+        corpus = ProteinCorpus.compile(self.path, 'ca', args)
+        self.assertTrue(os.path.getsize(self.path) < 0.6 * size)
+        
+        for i, a in enumerate(args):
+            protein = Protein(ProteinParser.factory('ca', a))
+            
+            restored = corpus.protein(i)
+            self.assertEqual(corpus.fingerprint(i).dtype, float32)
+            self.assertEqual(corpus.coords(i).dtype, float32)
+            self.assertTrue(array_equal(restored.fingerprint, protein.fingerprint))
+            self.assertTrue(array_equal(restored.eigenvalues, protein.eigenvalues))
+        
+        Precision.set('float64')
+        self.assertRaises(EIGAsException, ProteinCorpus, self.path)
+    
+    def testSettings(self):
+        """
+        Tests a corpus is not opened with other fingerprint settings, or when
+        the file isn't a corpus.
+        """
+        ProteinCorpus.compile(self.path, 'ca', [HARD['1UBQ']])
+        
+        Protein.cutoff = 7
+        self.assertRaises(EIGAsException, ProteinCorpus, self.path)
+        
+        with open(self.path, 'wb') as f:
+            f.write(b'HEADER')
+        self.assertRaises(EIGAsException, ProteinCorpus, self.path)
+
+if __name__ == "__main__":
+    unittest.main()
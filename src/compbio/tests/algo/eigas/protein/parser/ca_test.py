@@ -0,0 +1,111 @@
+"""
+Unit tests for the alpha carbon pdb parser.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.protein.parser.ca import CAProteinParser
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+from numpy import array_equal, asarray, float64
+
+import os
+import tempfile
+
+def record(serial, fullname, altloc, resname, chain, resseq, coord, occupancy=1.0, type='ATOM'):
+    """
+    Returns a pdb atom record.
+    
+    Key arguments:
+    serial    -- the atom serial number.
+    fullname  -- the atom name, with spaces.
+    altloc    -- the alternate location.
+    resname   -- the residue name.
+    chain     -- the chain.
+    resseq    -- the residue number.
+    coord     -- the coordinates.
+    occupancy -- the occupancy. [optional]
+    type      -- the record type. [optional]
+    """
+    return '%-6s%5d %-4s%1s%3s %1s%4d    %8.3f%8.3f%8.3f%6.2f%6.2f\n' % \
+        ((type, serial, fullname, altloc, resname, chain, resseq) + tuple(coord) + (occupancy, 0.0))
+
+class TestCompbioAlgoEIGAsProteinParserCA(unittest.TestCase):
+    
+    def setUp(self):
+        """
+        Writes a pdb file with alternate locations, a point mutation, a
+        calcium ion and a second model.
+        """
+        lines = [record(1, ' N  ', ' ', 'GLY', 'A', 1, (1.0, 1.0, 1.0)),
+                 record(2, ' CA ', ' ', 'GLY', 'A', 1, (1.5, 1.0, 1.0)),
+                 record(3, ' CA ', 'A', 'SER', 'A', 2, (2.0, 1.0, 1.0), 0.4),
+                 record(4, ' CA ', 'B', 'SER', 'A', 2, (2.5, 1.0, 1.0), 0.6),
+                 record(5, ' CA ', 'A', 'ALA', 'A', 3, (3.0, 1.0, 1.0), 0.5),
+                 record(6, ' CA ', 'B', 'VAL', 'A', 3, (3.5, 1.0, 1.0), 0.5),
+                 record(7, ' CA ', ' ', 'LYS', 'B', 1, (4.0, 1.0, 1.0)),
+                 record(8, 'CA  ', ' ', ' CA', 'A', 10, (5.0, 1.0, 1.0), type='HETATM'),
+                 'ENDMDL\n',
+                 'MODEL        2\n',
+                 record(9, ' CA ', ' ', 'GLY', 'A', 1, (6.0, 1.0, 1.0)),
+                 'ENDMDL\n',
+                 'END\n']
+        
+        fd, self.file_name = tempfile.mkstemp(suffix='.pdb')
+        with os.fdopen(fd, 'w') as f:
+            f.write('MODEL        1\n')
+            f.writelines(lines)
+    
+    def tearDown(self):
+        """
+        Removes the pdb file.
+        """
+        os.remove(self.file_name)
+    
+    def assertSameCoords(self, args):
+        """
+        Asserts the alpha carbon coordinates match the pdb parser.
+        
+        Key arguments:
+        args -- the parser arguments.
+        """
+        expected = asarray([[float(x) for x in coord] for coord in ProteinParser.factory('pdb', args).coords()], dtype=float64)
+        coords = ProteinParser.factory('ca', args).coords()
+        
+        self.assertEqual(coords.dtype, float64)
+        self.assertTrue(coords.flags['C_CONTIGUOUS'])
+        self.assertTrue(array_equal(coords, expected))
+    
+    def testHard(self):
+        """
+        Test the coordinates of the hard proteins match the pdb parser.
+        """
+        for name in sorted(HARD):
+            self.assertSameCoords(HARD[name])
+    
+    def testDisorder(self):
+        """
+        Test alternate locations, point mutations and models match the pdb parser.
+        """
+        self.assertSameCoords(('test', self.file_name, None))
+        self.assertSameCoords(('test', self.file_name, 'B'))
+        
+        coords = CAProteinParser.scan(self.file_name)
+        
+        self.assertEqual(sorted(coords), ['A', 'B'])
+        self.assertEqual(coords['A'].tolist(), [[1.5, 1.0, 1.0], [2.5, 1.0, 1.0], [3.5, 1.0, 1.0], [5.0, 1.0, 1.0]])
+    
+    def testChain(self):
+        """
+        Test a missing chain.
+        """
+        self.assertRaises(EIGAsException, ProteinParser.factory, 'ca', ('test', self.file_name, 'C'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Unit tests for the EIGAs protein.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.common.data import HARD
+
+from numpy import allclose, array_equal, zeros
+from numpy.linalg import svd
+from scipy.spatial.distance import cdist
+
+def cmatrix(dmatrix):
+    """
+    Contact matrix as defined in the report, one residue pair at a time.
+    
+    Key arguments:
+    dmatrix -- distance matrix
+    """
+    l = len(dmatrix)
+    
+    k = 1 / Protein.cutoff
+    
+    cmatrix = zeros((l, l))
+    for i in range(l):
+        for j in range(l):
+            value = dmatrix[i][j]
+            if value >= 0.0 and value <= Protein.cutoff:
+                cmatrix[i][j] = 1 - k * value
+    
+    return cmatrix
+
+def fingerprint(cmatrix):
+    """
+    Fingerprint as defined in the report, with the sign of each eigenvector
+    chosen so its largest component is positive.
+    
+    Key arguments:
+    cmatrix -- contact matrix
+    """
+    _, eigvalues, eigvectorsT = svd(cmatrix)
+    
+    l = len(cmatrix)
+    
+    r = zeros((l, l))
+    for i in range(l):
+        largest = max(range(l), key=lambda j: abs(eigvectorsT[i][j]))
+        s = 1.0 if eigvectorsT[i][largest] > 0 else -1.0
+        for j in range(l):
+            r[i][j] = eigvalues[i] ** 0.5 * s * eigvectorsT[i][j]
+    
+    fingerprint = []
+    for j in range(l):
+        max_index = None
+        for i in range(l):
+            if max_index is None or r[i][j] > r[max_index][j]:
+                max_index = i
+        fingerprint.append(eigvalues[max_index])
+    
+    return eigvalues, fingerprint
+
+class TestCompbioAlgoEIGAsProtein(unittest.TestCase):
+    
+    def tearDown(self):
+        """
+        Restores the default fingerprint path.
+        """
+        Protein.fast = False
+        Protein.sparse = False
+    
+    def testCmatrix(self):
+        """
+        Tests the contact matrix against its definition.
+        """
+        for name in sorted(HARD):
+            parser = ProteinParser.factory('pdb', HARD[name])
+            dmatrix = cdist(parser.coords(), parser.coords())
+            
+            self.assertTrue(array_equal(Protein.cmatrix(dmatrix), cmatrix(dmatrix)), name)
+    
+    def testFast(self):
+        """
+        Tests the symmetric eigensolver fingerprint against its definition
+        on the hard dataset.
+        """
+        Protein.fast = True
+        
+        for name in sorted(HARD):
+            parser = ProteinParser.factory('pdb', HARD[name])
+            protein = Protein(parser)
+            
+            eigvalues, expected = fingerprint(cmatrix(cdist(parser.coords(), parser.coords())))
+            
+            self.assertTrue(allclose(protein.eigenvalues, eigvalues, rtol=0, atol=1e-10), name)
+            self.assertTrue(allclose(protein.fingerprint, expected, rtol=0, atol=1e-10), name)
+    
+    def testSparse(self):
+        """
+        Tests the sparse contact matrix and eigensolver against the dense ones.
+        """
+        parser = ProteinParser.factory('pdb', HARD['1UBQ'])
+        
+        cmatrix = Protein.sparse_cmatrix(parser.coords())
+        self.assertTrue(array_equal(cmatrix.toarray(), Protein.cmatrix(cdist(parser.coords(), parser.coords()))))
+        
+        eigvalues, eigvectorsT = Protein.eigen(cmatrix.toarray())
+        sparse_eigvalues, sparse_eigvectorsT = Protein.sparse_eigen(cmatrix, 16)
+        self.assertTrue(allclose(sparse_eigvalues, eigvalues[:16]))
+        self.assertTrue(allclose(sparse_eigvectorsT, eigvectorsT[:16]))
+        
+        # All the eigenvalues give the dense fingerprint.
+        Protein.fast = True
+        Protein.sparse = True
+        components = Protein.components
+        try:
+            Protein.components = len(parser.coords())
+            protein = Protein(parser)
+        finally:
+            Protein.components = components
+        
+        Protein.sparse = False
+        self.assertTrue(allclose(protein.fingerprint, Protein(parser).fingerprint))
+
+if __name__ == "__main__":
+    unittest.main()
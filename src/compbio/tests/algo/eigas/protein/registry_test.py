@@ -0,0 +1,98 @@
+"""
+Unit tests for the protein registry.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import unittest
+
+from compbio.algo.eigas.protein.registry import ProteinRegistry
+from compbio.algo.eigas.protein.parser.ca import CAProteinParser
+from compbio.common.data import HARD, SKOLNICK
+
+class TestCompbioAlgoEIGAsProteinRegistry(unittest.TestCase):
+    
+    def testRegistry(self):
+        """
+        Tests repeated lookups return the same protein.
+        """
+        registry = ProteinRegistry()
+        
+        protein = registry.protein('pdb', HARD['1UBQ'])
+        self.assertTrue(registry.protein('pdb', HARD['1UBQ']) is protein)
+        self.assertTrue(registry.protein('pdb', HARD['1TEN']) is not protein)
+        
+        stats = registry.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['proteins']), (1, 2, 2))
+        self.assertEqual(stats['size'], ProteinRegistry.nbytes(protein) + ProteinRegistry.nbytes(registry.protein('pdb', HARD['1TEN'])))
+    
+    def testEvict(self):
+        """
+        Tests the least recently used protein is evicted.
+        """
+        registry = ProteinRegistry()
+        registry.protein('pdb', HARD['1TEN'])
+        registry.protein('pdb', HARD['1MOLa'])
+        
+        # 1TEN becomes the most recently used protein.
+        registry.protein('pdb', HARD['1TEN'])
+        
+        # 1UBQ is smaller than 1MOLa, so only 1MOLa has to go.
+        registry.max_size = registry.size
+        registry.protein('pdb', HARD['1UBQ'])
+        
+        self.assertEqual(registry.evictions, 1)
+        self.assertEqual(registry.stats()['misses'], 3)
+        
+        registry.protein('pdb', HARD['1TEN'])
+        self.assertEqual(registry.stats()['misses'], 3)
+        
+        registry.protein('pdb', HARD['1MOLa'])
+        self.assertEqual(registry.stats()['misses'], 4)
+    
+    def testRaw(self):
+        """
+        Tests raw proteins are keyed by their coordinates.
+        """
+        coords = CAProteinParser(*HARD['1UBQ']).coords()
+        
+        registry = ProteinRegistry()
+        protein = registry.protein('raw', ('1UBQ', {'coords': coords}))
+        self.assertTrue(registry.protein('raw', ('1UBQ', {'coords': coords.tolist()})) is protein)
+        self.assertTrue(registry.protein('raw', ('1UBQ', {'coords': coords[:50]})) is not protein)
+        self.assertEqual((registry.hits, registry.misses), (1, 2))
+        
+        self.assertEqual(protein.fingerprint, registry.protein('ca', HARD['1UBQ']).fingerprint)
+    
+    def testProteins(self):
+        """
+        Tests the chains of a file are built from a single read.
+        """
+        names = ('1RN1A', '1RN1B', '1RN1C')
+        args = [SKOLNICK['MICROBIAL_RIBONUCLEASE'][name] for name in names]
+        
+        scans = []
+        scan = CAProteinParser.scan
+        def counted(file_name, chains=None):
+            scans.append(file_name)
+            return scan(file_name, chains)
+        
+        CAProteinParser.scan = staticmethod(counted)
+        try:
+            registry = ProteinRegistry()
+            proteins = registry.proteins('ca', args + [args[0]])
+        finally:
+            CAProteinParser.scan = staticmethod(scan)
+        
+        self.assertEqual(len(scans), 1)
+        self.assertEqual([protein.name for protein in proteins], list(names) + ['1RN1A'])
+        self.assertTrue(proteins[3] is proteins[0])
+        self.assertEqual((registry.hits, registry.misses), (1, 3))
+        
+        for protein, a in zip(proteins, args):
+            self.assertEqual(protein.fingerprint, ProteinRegistry().protein('pdb', a).fingerprint)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Unit tests for the sharded all-vs-all comparison.
+
+@author Aaron Zampaglione <azapagl@azampagl.com>
+@package EIGAs
+@copyright 2011 (c) Aaron Zampaglione
+@license MIT
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from compbio.algo.eigas.allvsall import AllVsAll, global_compare
+from compbio.algo.eigas.exception import EIGAsException
+from compbio.algo.eigas.protein.core import Protein
+from compbio.algo.eigas.protein.parser.core import ProteinParser
+from compbio.algo.eigas.shard import ShardQueue
+from compbio.common.data import HARD
+
+def work(directory, proteins, shards, key):
+    """
+    Runs a worker against the queue.
+    
+    Key arguments:
+    directory -- the shared directory.
+    proteins  -- the proteins.
+    shards    -- number of shards.
+    key       -- identity of the run.
+    """
+    allvsall = AllVsAll(proteins, global_compare)
+    ShardQueue(directory, allvsall.pairs(), shards, key).work(allvsall)
+
+class TestCompbioAlgoEIGAsShard(unittest.TestCase):
+    
+    # Proteins to compare.
+    NAMES = ['1UBQ', '1TEN', '1FXIa', '1MOLa', '2AZAa', '1PAZ']
+    
+    def setUp(self):
+        """
+        Fingerprints the proteins and creates the shared directory.
+        """
+        self.proteins = [Protein(ProteinParser.factory('ca', HARD[name])) for name in self.NAMES]
+        self.allvsall = AllVsAll(self.proteins, global_compare)
+        self.dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """
+        Removes the shared directory.
+        """
+        shutil.rmtree(self.dir)
+    
+    def testShards(self):
+        """
+        Tests the shards split the pairs in order.
+        """
+        pairs = self.allvsall.pairs()
+        queue = ShardQueue(self.dir, pairs, 4, self.NAMES)
+        
+        self.assertEqual(sum((queue.shard(shard) for shard in range(4)), []), pairs)
+        self.assertTrue(abs(len(queue.shard(0)) - len(queue.shard(3))) <= 1)
+        
+        self.assertRaises(EIGAsException, ShardQueue, self.dir, pairs, 5, self.NAMES)
+        self.assertRaises(EIGAsException, ShardQueue, self.dir, pairs, 4, self.NAMES[:-1])
+    
+    def testWorkers(self):
+        """
+        Tests several worker processes merge into the results of a single run.
+        """
+        workers = [multiprocessing.Process(target=work, args=(self.dir, self.proteins, 5, self.NAMES))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        
+        queue = ShardQueue(self.dir, self.allvsall.pairs(), 5, self.NAMES)
+        self.assertTrue(queue.done())
+        self.assertEqual(list(queue.results()), list(self.allvsall.run()))
+    
+    def testLocks(self):
+        """
+        Tests locked shards are skipped until their lock is stale.
+        """
+        queue = ShardQueue(self.dir, self.allvsall.pairs(), 3, self.NAMES, timeout=60)
+        
+        self.assertEqual(queue.claim(), 0)
+        self.assertEqual(queue.claim(), 1)
+        
+        # The first worker died.
+        past = time.time() - 120
+        os.utime(os.path.join(self.dir, 'shard-00000.lock'), (past, past))
+        self.assertEqual(queue.claim(), 0)
+        
+        self.assertEqual(queue.claim(), 2)
+        self.assertEqual(queue.claim(), None)
+        
+        self.assertRaises(EIGAsException, list, queue.results())
+        
+        for shard in range(3):
+            queue.release(shard)
+        self.assertEqual(queue.work(self.allvsall), [0, 1, 2])
+        self.assertEqual(list(queue.results()), list(self.allvsall.run()))
+    
+    def testTakeover(self):
+        """
+        Tests a worker whose stale lock was taken over leaves the shard alone.
+        """
+        pairs = self.allvsall.pairs()
+        first = ShardQueue(self.dir, pairs, 3, self.NAMES, timeout=60)
+        second = ShardQueue(self.dir, pairs, 3, self.NAMES, timeout=60)
+        
+        self.assertEqual(first.claim(), 0)
+        
+        # The first worker stalled.
+        past = time.time() - 120
+        os.utime(os.path.join(self.dir, 'shard-00000.lock'), (past, past))
+        self.assertEqual(second.claim(), 0)
+        
+        self.assertFalse(first.touch(0))
+        first.release(0)
+        self.assertTrue(second.owns(0))
+        self.assertTrue(second.touch(0))
+        
+        # A third worker can't claim the shard.
+        third = ShardQueue(self.dir, pairs, 3, self.NAMES, timeout=60)
+        self.assertEqual(third.claim(), 1)
+        
+        # The first worker stops after the pair it was working on.
+        compared = []
+        def compare(protein1, protein2):
+            compared.append((protein1.name, protein2.name))
+            past = time.time() - 120
+            os.utime(os.path.join(self.dir, 'shard-00002.lock'), (past, past))
+            self.assertEqual(second.claim(), 2)
+            return global_compare(protein1, protein2)
+        
+        self.assertEqual(first.work(AllVsAll(self.proteins, compare)), [])
+        self.assertEqual(len(compared), 1)
+        self.assertFalse(first.done(2))
+        self.assertTrue(second.owns(2))
+        
+        second.release(0)
+        second.release(2)
+        third.release(1)
+        self.assertEqual(second.work(self.allvsall), [0, 1, 2])
+        self.assertEqual(list(second.results()), list(self.allvsall.run()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Unit tests for the data set fetcher, against a local stand-in server.
+
+@author  azampagl@azampagl.com (Aaron Zampaglione)
+@copyright MIT
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from email.utils import formatdate, mktime_tz, parsedate_tz
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from compbio.util.fetch import FAILED, FETCHED, NOT_MODIFIED, PRESENT, Fetcher, TokenBucket
+
+# Entries of the stand-in server: path -> (data, modified time).
+ENTRIES = {}
+
+# Requests received, and failures and truncated responses still to return,
+#  by path.
+REQUESTS = []
+FAILURES = {}
+TRUNCATED = {}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the entries, honouring If-Modified-Since.
+    """
+    
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        
+        if FAILURES.get(self.path):
+            FAILURES[self.path] -= 1
+            self.send_error(503)
+            return
+        
+        if self.path not in ENTRIES:
+            self.send_error(404)
+            return
+        
+        data, modified = ENTRIES[self.path]
+        
+        if TRUNCATED.get(self.path):
+            TRUNCATED[self.path] -= 1
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data) + 10))
+            self.end_headers()
+            self.wfile.write(data)
+            self.close_connection = 1
+            return
+        
+        since = self.headers.get('If-Modified-Since')
+        if since and parsedate_tz(since) and mktime_tz(parsedate_tz(since)) >= modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Last-Modified', formatdate(modified, usegmt=True))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+class TestCompbioUtilFetch(unittest.TestCase):
+    """
+    """
+    
+    def setUp(self):
+        """Starts the stand-in server and creates the data directory."""
+        ENTRIES.clear()
+        FAILURES.clear()
+        TRUNCATED.clear()
+        del REQUESTS[:]
+        
+        for i in range(8):
+            ENTRIES['/d{0}'.format(i)] = ('ATOM {0}\n'.format(i).encode('ascii'), 1300000000)
+        
+        self.server = HTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        
+        self.dir = tempfile.mkdtemp()
+        self.entries = [(self.url + '/d{0}'.format(i), os.path.join(self.dir, 'fold', 'd{0}.ent'.format(i)))
+                        for i in range(8)]
+    
+    def tearDown(self):
+        """Stops the stand-in server and removes the data directory."""
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+    
+    def test_fetch(self):
+        """Test entries are fetched once, then skipped or fetched conditionally."""
+        fetcher = Fetcher(jobs=4, rate=None)
+        
+        results = fetcher.fetch(self.entries)
+        self.assertEqual([result for _, _, result, _ in results], [FETCHED] * 8)
+        self.assertEqual([path for _, path, _, _ in results], [path for _, path in self.entries])
+        with open(self.entries[3][1], 'rb') as f:
+            self.assertEqual(f.read(), b'ATOM 3\n')
+        self.assertEqual(os.path.getmtime(self.entries[3][1]), 1300000000)
+        
+        # No temporary files left behind.
+        self.assertEqual(len(os.listdir(os.path.join(self.dir, 'fold'))), 8)
+        
+        # Present entries don't reach the server.
+        del REQUESTS[:]
+        results = fetcher.fetch(self.entries)
+        self.assertEqual([result for _, _, result, _ in results], [PRESENT] * 8)
+        self.assertEqual(REQUESTS, [])
+        
+        # Only the changed entry is downloaded again.
+        ENTRIES['/d5'] = (b'ATOM 5 changed\n', 1300000100)
+        results = fetcher.fetch(self.entries, refresh=True)
+        self.assertEqual([result for _, _, result, _ in results], [NOT_MODIFIED] * 5 + [FETCHED] + [NOT_MODIFIED] * 2)
+        with open(self.entries[5][1], 'rb') as f:
+            self.assertEqual(f.read(), b'ATOM 5 changed\n')
+    
+    def test_failures(self):
+        """Test server errors are retried and missing entries aren't written."""
+        FAILURES['/d1'] = 1
+        FAILURES['/d2'] = 5
+        entries = self.entries[:3] + [(self.url + '/missing', os.path.join(self.dir, 'fold', 'missing.ent'))]
+        
+        results = Fetcher(jobs=2, rate=None, retries=2).fetch(entries)
+        self.assertEqual([result for _, _, result, _ in results], [FETCHED, FETCHED, FAILED, FAILED])
+        self.assertTrue('503' in results[2][3])
+        self.assertEqual(REQUESTS.count('/d2'), 3)
+        self.assertEqual(REQUESTS.count('/missing'), 1)
+        self.assertFalse(os.path.exists(entries[2][1]))
+        self.assertFalse(os.path.exists(entries[3][1]))
+    
+    def test_truncated(self):
+        """Test truncated responses are retried, then fail the entry alone."""
+        TRUNCATED['/d1'] = 1
+        TRUNCATED['/d2'] = 5
+        
+        results = Fetcher(jobs=2, rate=None, retries=2).fetch(self.entries[:4])
+        self.assertEqual([result for _, _, result, _ in results], [FETCHED, FETCHED, FAILED, FETCHED])
+        self.assertTrue('IncompleteRead' in results[2][3])
+        self.assertEqual(REQUESTS.count('/d2'), 3)
+        self.assertFalse(os.path.exists(self.entries[2][1]))
+        with open(self.entries[1][1], 'rb') as f:
+            self.assertEqual(f.read(), b'ATOM 1\n')
+    
+    def test_rate(self):
+        """Test the bucket holds the rate across threads."""
+        bucket = TokenBucket(20, burst=2)
+        
+        start = time.time()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Two tokens at once, then one every 50ms.
+        self.assertTrue(time.time() - start >= 0.25)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,9 @@ Unit tests for the sequence modules of compbio.
 """
 import unittest
 
-from compbio.util.seq import global_align, local_align
+from compbio.util import seq as seq_module
+from compbio.util.seq import BLOSUM62, PAM250, SubstitutionMatrix, global_align, local_align
+from compbio.util.seq import affine_global_align, affine_local_align, affine_scores
 
 class TestCompbioUtilSeq(unittest.TestCase):
     """
@@ -39,6 +41,55 @@ class TestCompbioUtilSeq(unittest.TestCase):
         """Test local alignment."""
         for seq in self.local_seqs:
             self.assertTrue(local_align(seq[0], seq[1]) == seq[2])
+
+    def test_substitution_matrix(self):
+        """Test substitution matrix lookups."""
+        self.assertEqual(BLOSUM62["W", "W"], 11)
+        self.assertEqual(BLOSUM62["A", "R"], BLOSUM62["R", "A"])
+        self.assertEqual(PAM250["C", "C"], 12)
+        self.assertTrue((BLOSUM62.table == BLOSUM62.table.T).all())
+        self.assertEqual(list(BLOSUM62.encode("ARX")), [0, 1, 22])
+        self.assertRaises(ValueError, BLOSUM62.encode, "AJ")
+
+    def test_substitution_align(self):
+        """Test alignment with substitution matrices."""
+        identity = SubstitutionMatrix.identity("ACGT")
+        for seq in self.global_seqs:
+            self.assertEqual(global_align(seq[0], seq[1], identity), (seq[2], seq[3], seq[4]))
+
+        # Similar residues align, a gap costs more than a mismatch.
+        self.assertEqual(global_align("HEAGAWGHEE", "PAWHEAE", BLOSUM62, -8),
+                         ("EAGAWGHE E", "PA  W HEAE", -8))
+        self.assertEqual(local_align("HEAGAWGHEE", "PAWHEAE", BLOSUM62, -8), "AWGHE")
+
+    def test_affine_align(self):
+        """Test affine gap alignment."""
+        # One long gap scores better than two short ones.
+        self.assertEqual(affine_global_align("ACGTTTTACG", "ACGACG", gap_open=-3, gap_extend=-1),
+                         ("ACGTTTTACG", "ACG    ACG", 0))
+        self.assertEqual(affine_local_align("TTACGTTTTACGTT", "GGACGACGGG", gap_open=-3, gap_extend=-1),
+                         ("ACG", "ACG", 3))
+        self.assertEqual(affine_local_align("WWHEAGAWGHEE", "PAWHEAE", BLOSUM62, -11, -1),
+                         ("WHEA", "WHEA", 28))
+        self.assertRaises(ValueError, affine_global_align, "AC", "AC", None, -1, -3)
+
+        # Linear memory traceback, forced to divide the rows.
+        block = seq_module.LINEAR_BLOCK
+        try:
+            seq_module.LINEAR_BLOCK = 8
+            for seq1, seq2 in (("HEAGAWGHEE", "PAWHEAE"), ("PAWHEAE", "HEAGAWGHEE")):
+                for align in (affine_global_align, affine_local_align):
+                    self.assertEqual(align(seq1, seq2, BLOSUM62, -11, -1, linear=True),
+                                     align(seq1, seq2, BLOSUM62, -11, -1))
+        finally:
+            seq_module.LINEAR_BLOCK = block
+
+    def test_affine_scores(self):
+        """Test scoring one sequence against many."""
+        seqs = ["PAWHEAE", "HEAGAWGHEE", "", "W", "GAWGHEEHEAGAWGHEE"]
+        for local, align in ((False, affine_global_align), (True, affine_local_align)):
+            scores = affine_scores("HEAGAWGHEE", seqs, PAM250, -11, -1, local)
+            self.assertEqual(list(scores), [align("HEAGAWGHEE", s, PAM250, -11, -1)[2] for s in seqs])
         
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testGlobalCmp01']
@@ -0,0 +1,209 @@
+"""
+Concurrent, rate-limited downloads of data set entries.
+
+A pool of threads downloads the entries, each request first taking a token
+from a shared bucket, so the server sees at most `rate` requests a second
+(after an initial burst) however many threads are running.
+
+Entries already on disk are skipped. When refreshing, they are fetched
+conditionally (If-Modified-Since the time of the file, which is set to the
+Last-Modified time of the server), so unchanged entries cost one empty
+response. Every file is written to a temporary file in the same directory
+and renamed over the entry, so an interrupted run never leaves a truncated
+entry behind.
+
+@author  azampagl@azampagl.com (Aaron Zampaglione)
+@copyright MIT
+"""
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, mktime_tz, parsedate_tz
+
+import os
+import tempfile
+import threading
+import time
+
+try:
+    from http.client import HTTPException, IncompleteRead
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+except ImportError:
+    from httplib import HTTPException, IncompleteRead
+    from urllib2 import HTTPError, Request, urlopen
+
+# Results of a fetch.
+FETCHED = 'fetched'
+PRESENT = 'present'
+NOT_MODIFIED = 'not modified'
+FAILED = 'failed'
+
+class TokenBucket(object):
+    """
+    Limits the rate of requests shared by several threads.
+    """
+    
+    def __init__(self, rate, burst=1):
+        """Initializes a full bucket.
+        
+        Keyword arguments:
+        rate  -- tokens added per second, None for no limit.
+        burst -- most tokens held at once. [optional]
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.time()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Takes a token, waiting for one if the bucket is empty."""
+        if self.rate is None:
+            return
+        
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(wait)
+
+class Fetcher(object):
+    """
+    Downloads entries with a bounded number of threads.
+    """
+    
+    def __init__(self, jobs=4, rate=2.0, burst=1, retries=2, timeout=60):
+        """Initializes the fetcher.
+        
+        Keyword arguments:
+        jobs    -- number of concurrent downloads. [optional]
+        rate    -- requests per second, None for no limit. [optional]
+        burst   -- requests allowed at once before the rate applies. [optional]
+        retries -- further attempts of a failed download. [optional]
+        timeout -- seconds to wait for a server response. [optional]
+        """
+        self.jobs = jobs
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.timeout = timeout
+    
+    def fetch(self, entries, refresh=False):
+        """Returns the (url, path, result, error) of each entry, in order.
+        
+        Keyword arguments:
+        entries -- the (url, path) of each entry.
+        refresh -- fetch entries on disk again if they changed. [optional]
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, self.jobs))
+        try:
+            futures = [executor.submit(self.entry, url, path, refresh) for url, path in entries]
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=True)
+    
+    def entry(self, url, path, refresh=False):
+        """Returns the (url, path, result, error) of fetching one entry.
+        
+        Keyword arguments:
+        url     -- the location of the entry.
+        path    -- the file of the entry.
+        refresh -- fetch the entry again if it changed. [optional]
+        """
+        present = os.path.exists(path) and os.path.getsize(path) > 0
+        if present and not refresh:
+            return url, path, PRESENT, None
+        
+        error = None
+        for _ in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                return url, path, self.__download(url, path, os.path.getmtime(path) if present else None), None
+            except HTTPError as e:
+                # Client errors won't go away.
+                error = str(e)
+                if e.code < 500:
+                    break
+            except (HTTPException, IOError, OSError) as e:
+                # Truncated or malformed responses are retried too, some
+                #  of them have no message.
+                error = str(e) or type(e).__name__
+        
+        return url, path, FAILED, error
+    
+    def __download(self, url, path, modified):
+        """Downloads an entry, returning the result.
+        
+        Keyword arguments:
+        url      -- the location of the entry.
+        path     -- the file of the entry.
+        modified -- time of the entry on disk, None if there is none.
+        """
+        request = Request(url)
+        if modified is not None:
+            request.add_header('If-Modified-Since', formatdate(modified, usegmt=True))
+        
+        try:
+            response = urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            if e.code == 304:
+                return NOT_MODIFIED
+            raise
+        
+        try:
+            data = response.read()
+            length = response.info().get('Content-Length')
+            last_modified = response.info().get('Last-Modified')
+        finally:
+            response.close()
+        
+        # urllib2 returns a body cut short without complaint.
+        if length is not None and len(data) < int(length):
+            raise IncompleteRead(data, int(length) - len(data))
+        
+        Fetcher.__write(path, data)
+        
+        if last_modified:
+            parsed = parsedate_tz(last_modified)
+            if parsed is not None:
+                stamp = mktime_tz(parsed)
+                os.utime(path, (stamp, stamp))
+        
+        return FETCHED
+    
+    @staticmethod
+    def __write(path, data):
+        """Writes a file atomically, through a temporary file in its directory.
+        
+        Keyword arguments:
+        path -- the file.
+        data -- the contents.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created by another thread in the meantime.
+                if not os.path.isdir(directory):
+                    raise
+        
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            # Readable like any other entry, mkstemp only allows the owner.
+            os.chmod(temp, 0o644)
+            os.rename(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
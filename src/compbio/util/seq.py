@@ -1,6 +1,9 @@
 """
 Sequence methods for global and local alignment/comparison.
 
+Residues are encoded as integers, so a substitution matrix is a lookup table
+and the DP runs on typed arrays, one anti-diagonal at a time.
+
 @author  azampagl@azampagl.com (Aaron Zampaglione)
 @copyright MIT
 
@@ -8,179 +11,686 @@ Sequence methods for global and local alignment/comparison.
 @see http://en.wikipedia.org/wiki/Sequence_alignment
 @see http://en.wikipedia.org/wiki/Smith%E2%80%93Waterman_algorithm
 @see http://www.clcbio.com/index.php?id=1046
+@see http://en.wikipedia.org/wiki/Substitution_matrix
 """
 import numpy as np
 
-def global_align(seq1, seq2):
-    """Globally aligns two sequences and 
+# DP directions.
+NONE = 0
+TOP = 1
+DIAG = 2
+LEFT = 3
+
+# Affine gap states: a match, a gap in the second sequence (top) or in the
+#  first one (left).
+MATCH = 0
+GAP_TOP = 1
+GAP_LEFT = 2
+
+# Stands in for minus infinity, without overflowing when gaps are added.
+NEG = np.iinfo(np.int64).min // 4
+
+# DP cells of directions kept at once by the linear memory traceback.
+LINEAR_BLOCK = 2 ** 16
+
+# Targets scored at once by affine_scores.
+BATCH = 256
+
+class SubstitutionMatrix(object):
+    """
+    Scores for substituting one residue with another.
+    """
+    
+    def __init__(self, alphabet, table):
+        """Initializes the matrix.
+        
+        Keyword arguments:
+        alphabet -- the residues, in the order of the table.
+        table    -- square table of scores.
+        """
+        self.alphabet = alphabet
+        self.table = np.asarray(table, dtype=np.int64)
+        self.codes = dict((residue, code) for code, residue in enumerate(alphabet))
+    
+    @classmethod
+    def parse(cls, text):
+        """Returns the matrix of a table with a header row of residues and
+        one row of scores per residue.
+        
+        Keyword arguments:
+        text -- the table.
+        """
+        lines = text.strip().splitlines()
+        alphabet = "".join(lines[0].split())
+        table = [[int(score) for score in line.split()[1:]] for line in lines[1:]]
+        
+        return cls(alphabet, table)
+    
+    @classmethod
+    def identity(cls, alphabet, match=1, mismatch=-1):
+        """Returns a matrix scoring equal residues and different ones.
+        
+        Keyword arguments:
+        alphabet -- the residues.
+        match    -- score of equal residues. [optional]
+        mismatch -- score of different residues. [optional]
+        """
+        table = np.full((len(alphabet), len(alphabet)), mismatch, dtype=np.int64)
+        np.fill_diagonal(table, match)
+        
+        return cls(alphabet, table)
+    
+    def encode(self, seq):
+        """Returns the integer codes of a sequence.
+        
+        Keyword arguments:
+        seq -- the sequence.
+        """
+        try:
+            return np.array([self.codes[residue] for residue in seq], dtype=np.intp)
+        except KeyError as e:
+            raise ValueError("Residue not in the substitution matrix: " + str(e.args[0]))
+    
+    def scores(self, seq1, seq2):
+        """Returns the substitution scores of every pair of residues.
+        
+        Keyword arguments:
+        seq1 -- the first sequence.
+        seq2 -- the second sequence.
+        """
+        return self.table[np.ix_(self.encode(seq1), self.encode(seq2))]
+    
+    def __getitem__(self, pair):
+        """Returns the score of substituting a pair of residues.
+        
+        Keyword arguments:
+        pair -- the two residues.
+        """
+        return int(self.table[self.codes[pair[0]], self.codes[pair[1]]])
+
+BLOSUM62 = SubstitutionMatrix.parse("""
+   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  B  Z  X
+A  4 -1 -2 -2  0 -1 -1  0 -2 -1 -1 -1 -1 -2 -1  1  0 -3 -2  0 -2 -1  0
+R -1  5  0 -2 -3  1  0 -2  0 -3 -2  2 -1 -3 -2 -1 -1 -3 -2 -3 -1  0 -1
+N -2  0  6  1 -3  0  0  0  1 -3 -3  0 -2 -3 -2  1  0 -4 -2 -3  3  0 -1
+D -2 -2  1  6 -3  0  2 -1 -1 -3 -4 -1 -3 -3 -1  0 -1 -4 -3 -3  4  1 -1
+C  0 -3 -3 -3  9 -3 -4 -3 -3 -1 -1 -3 -1 -2 -3 -1 -1 -2 -2 -1 -3 -3 -2
+Q -1  1  0  0 -3  5  2 -2  0 -3 -2  1  0 -3 -1  0 -1 -2 -1 -2  0  3 -1
+E -1  0  0  2 -4  2  5 -2  0 -3 -3  1 -2 -3 -1  0 -1 -3 -2 -2  1  4 -1
+G  0 -2  0 -1 -3 -2 -2  6 -2 -4 -4 -2 -3 -3 -2  0 -2 -2 -3 -3 -1 -2 -1
+H -2  0  1 -1 -3  0  0 -2  8 -3 -3 -1 -2 -1 -2 -1 -2 -2  2 -3  0  0 -1
+I -1 -3 -3 -3 -1 -3 -3 -4 -3  4  2 -3  1  0 -3 -2 -1 -3 -1  3 -3 -3 -1
+L -1 -2 -3 -4 -1 -2 -3 -4 -3  2  4 -2  2  0 -3 -2 -1 -2 -1  1 -4 -3 -1
+K -1  2  0 -1 -3  1  1 -2 -1 -3 -2  5 -1 -3 -1  0 -1 -3 -2 -2  0  1 -1
+M -1 -1 -2 -3 -1  0 -2 -3 -2  1  2 -1  5  0 -2 -1 -1 -1 -1  1 -3 -1 -1
+F -2 -3 -3 -3 -2 -3 -3 -3 -1  0  0 -3  0  6 -4 -2 -2  1  3 -1 -3 -3 -1
+P -1 -2 -2 -1 -3 -1 -1 -2 -2 -3 -3 -1 -2 -4  7 -1 -1 -4 -3 -2 -2 -1 -2
+S  1 -1  1  0 -1  0  0  0 -1 -2 -2  0 -1 -2 -1  4  1 -3 -2 -2  0  0  0
+T  0 -1  0 -1 -1 -1 -1 -2 -2 -1 -1 -1 -1 -2 -1  1  5 -2 -2  0 -1 -1  0
+W -3 -3 -4 -4 -2 -2 -3 -2 -2 -3 -2 -3 -1  1 -4 -3 -2 11  2 -3 -4 -3 -2
+Y -2 -2 -2 -3 -2 -1 -2 -3  2 -1 -1 -2 -1  3 -3 -2 -2  2  7 -1 -3 -2 -1
+V  0 -3 -3 -3 -1 -2 -2 -3 -3  3  1 -2  1 -1 -2 -2  0 -3 -1  4 -3 -2 -1
+B -2 -1  3  4 -3  0  1 -1  0 -3 -4  0 -3 -3 -2  0 -1 -4 -3 -3  4  1 -1
+Z -1  0  0  1 -3  3  4 -2  0 -3 -3  1 -1 -3 -1  0 -1 -3 -2 -2  1  4 -1
+X  0 -1 -1 -1 -2 -1 -1 -1 -1 -1 -1 -1 -1 -1 -2  0  0 -2 -1 -1 -1 -1 -1
+""")
+
+PAM250 = SubstitutionMatrix.parse("""
+   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  B  Z  X
+A  2 -2  0  0 -2  0  0  1 -1 -1 -2 -1 -1 -3  1  1  1 -6 -3  0  0  0  0
+R -2  6  0 -1 -4  1 -1 -3  2 -2 -3  3  0 -4  0  0 -1  2 -4 -2 -1  0 -1
+N  0  0  2  2 -4  1  1  0  2 -2 -3  1 -2 -3  0  1  0 -4 -2 -2  2  1  0
+D  0 -1  2  4 -5  2  3  1  1 -2 -4  0 -3 -6 -1  0  0 -7 -4 -2  3  3 -1
+C -2 -4 -4 -5 12 -5 -5 -3 -3 -2 -6 -5 -5 -4 -3  0 -2 -8  0 -2 -4 -5 -3
+Q  0  1  1  2 -5  4  2 -1  3 -2 -2  1 -1 -5  0 -1 -1 -5 -4 -2  1  3 -1
+E  0 -1  1  3 -5  2  4  0  1 -2 -3  0 -2 -5 -1  0  0 -7 -4 -2  3  3 -1
+G  1 -3  0  1 -3 -1  0  5 -2 -3 -4 -2 -3 -5  0  1  0 -7 -5 -1  0  0 -1
+H -1  2  2  1 -3  3  1 -2  6 -2 -2  0 -2 -2  0 -1 -1 -3  0 -2  1  2 -1
+I -1 -2 -2 -2 -2 -2 -2 -3 -2  5  2 -2  2  1 -2 -1  0 -5 -1  4 -2 -2 -1
+L -2 -3 -3 -4 -6 -2 -3 -4 -2  2  6 -3  4  2 -3 -3 -2 -2 -1  2 -3 -3 -1
+K -1  3  1  0 -5  1  0 -2  0 -2 -3  5  0 -5 -1  0  0 -3 -4 -2  1  0 -1
+M -1  0 -2 -3 -5 -1 -2 -3 -2  2  4  0  6  0 -2 -2 -1 -4 -2  2 -2 -2 -1
+F -3 -4 -3 -6 -4 -5 -5 -5 -2  1  2 -5  0  9 -5 -3 -3  0  7 -1 -4 -5 -2
+P  1  0  0 -1 -3  0 -1  0  0 -2 -3 -1 -2 -5  6  1  0 -6 -5 -1 -1  0 -1
+S  1  0  1  0  0 -1  0  1 -1 -1 -3  0 -2 -3  1  2  1 -2 -3 -1  0  0  0
+T  1 -1  0  0 -2 -1  0  0 -1  0 -2  0 -1 -3  0  1  3 -5 -3  0  0 -1  0
+W -6  2 -4 -7 -8 -5 -7 -7 -3 -5 -2 -3 -4  0 -6 -2 -5 17  0 -6 -5 -6 -4
+Y -3 -4 -2 -4  0 -4 -4 -5  0 -1 -1 -4 -2  7 -5 -3 -3  0 10 -2 -3 -4 -2
+V  0 -2 -2 -2 -2 -2 -2 -1 -2  4  2 -2  2 -1 -1 -1  0 -6 -2  4 -2 -2 -1
+B  0 -1  2  3 -4  1  3  0  1 -2 -3  1 -2 -4 -1  0  0 -5 -3 -2  3  2 -1
+Z  0  0  1  3 -5  3  3  0  2 -2 -3  0 -2 -5  0  0 -1 -6 -4 -2  2  3 -1
+X  0 -1  0 -1 -3 -1 -1 -1 -1 -1 -1 -1 -1 -2 -1  0  0 -4 -2 -1 -1 -1 -1
+""")
+
+def global_align(seq1, seq2, matrix=None, gap=-2):
+    """Globally aligns two sequences and
     returns the alignment score and two
     globally aligned sequences.
     
     Keyword arguments:
-    seq1  -- the first sequence.
-    seq2  -- the second sequence.
-    """ 
-    # Init score matrix.
-    (rows, cols), score = __cmp_init(seq1, seq2, -2)
-    
-    # Build a matrix full of Prefix objects
-    vprefix = np.vectorize(__Prefix)
-    prefixes = np.empty((rows, cols), dtype=object)
-    prefixes[:,:] = vprefix(score)
-    
-    # Determine score using DP.
-    for i in range(1, rows):
-        for j in range(1, cols):
-            
-            # Find the previous top, diag, and left scores
-            top = prefixes[i - 1][j].score - 2
-            diag = prefixes[i - 1][j - 1].score + __p(seq1[i - 1], seq2[j - 1])
-            left = prefixes[i][j - 1].score - 2
-            
-            # Top
-            if (top > diag and top > left):
-                prefixes[i][j].prev = prefixes[i - 1][j]
-                prefixes[i][j].score = top
-                prefixes[i][j].seq1 = seq1[i - 1]
-            # Diagonal
-            elif (diag > top and diag > left):
-                prefixes[i][j].prev = prefixes[i - 1][j - 1]
-                prefixes[i][j].score = diag
-                prefixes[i][j].seq1 = seq1[i - 1]
-                prefixes[i][j].seq2 = seq2[j - 1]
-            # Left
-            else:
-                prefixes[i][j].prev = prefixes[i][j - 1]
-                prefixes[i][j].score = left
-                prefixes[i][j].seq2 = seq2[j - 1]
-    
-    # Follow the pointers backwards to rebuild the globally aligned sequences.
-    s1 = ""
-    s2 = ""
-    node = prefixes[i][j]
-    while node.prev != None:
-        s1 = node.seq1 + s1
-        s2 = node.seq2 + s2
-        node = node.prev
+    seq1   -- the first sequence.
+    seq2   -- the second sequence.
+    matrix -- the substitution matrix, 1 for equal residues and -1 otherwise
+              by default. [optional]
+    gap    -- the score of a gap. [optional]
+    """
+    value, direction = __fill(seq1, seq2, matrix, gap, False)
+    
+    # Follow the directions backwards to rebuild the globally aligned sequences.
+    s1, s2 = __traceback(seq1, seq2, direction, len(seq1), len(seq2))
     
     # Return the score
-    return s1, s2, prefixes[-1][-1].score
+    return s1, s2, int(value[-1, -1])
 
-def local_align(seq1, seq2):
+def local_align(seq1, seq2, matrix=None, gap=-2):
     """Returns the optimal (longest) local alignment (substring) of two sequences.
     
     Keyword arguments:
-    seq1 -- the first sequence.
-    seq2 -- the second sequence.
+    seq1   -- the first sequence.
+    seq2   -- the second sequence.
+    matrix -- the substitution matrix, 1 for equal residues and -1 otherwise
+              by default. [optional]
+    gap    -- the score of a gap. [optional]
     """
-    # Init score matrix.
-    (rows, cols), score = __cmp_init(seq1, seq2, 0)
+    value, direction = __fill(seq1, seq2, matrix, gap, True)
     
-    # Build a matrix full of Prefix objects
-    vprefix = np.vectorize(__Prefix)
-    prefixes = np.empty((rows, cols), dtype=object)
-    prefixes[:,:] = vprefix(score)
+    # The first cell with the highest score is optimal.
+    i, j = np.unravel_index(np.argmax(value), value.shape)
     
-    # Initialize max/optimal
-    optimal = prefixes[0][0]
-    
-    # Determine score using DP.
-    for i in range(1, rows):
-        for j in range(1, cols):
-            
-            # Find the previous top, diag, and left scores
-            top = prefixes[i - 1][j].score - 2
-            diag = prefixes[i - 1][j - 1].score + __p(seq1[i - 1], seq2[j - 1])
-            left = prefixes[i][j - 1].score - 2
-            
-            # Top
-            if (top > diag and top > left and top > 0):
-                prefixes[i][j].prev = prefixes[i - 1][j]
-                prefixes[i][j].score = top
-                prefixes[i][j].seq1 = seq1[i - 1]
-            # Diagonal
-            elif (diag > top and diag > left and diag > 0):
-                prefixes[i][j].prev = prefixes[i - 1][j - 1]
-                prefixes[i][j].score = diag
-                prefixes[i][j].seq1 = seq1[i - 1]
-                prefixes[i][j].seq2 = seq2[j - 1]
-            # Left
-            elif (left > top and left > diag and left > 0):
-                prefixes[i][j].prev = prefixes[i][j - 1]
-                prefixes[i][j].score = left
-                prefixes[i][j].seq2 = seq2[j - 1]
-    
-            if prefixes[i][j].score > optimal.score:
-                optimal = prefixes[i][j]
-            
-    # Follow the pointers backwards to rebuild the optimal aligned sequence.
-    s = ""
-    node = optimal
-    while node.prev != None:
-        s = node.seq1 + s
-        node = node.prev
+    # Follow the directions backwards to rebuild the optimal aligned sequence.
+    s, _ = __traceback(seq1, seq2, direction, i, j)
     
     # Return the optimal sequence
     return s
 
-class __Prefix():
+def affine_global_align(seq1, seq2, matrix=None, gap_open=-3, gap_extend=-1, linear=False):
+    """Globally aligns two sequences with affine gaps (Gotoh) and returns the
+    two globally aligned sequences and the alignment score.
+    
+    A gap of k residues scores gap_open + (k - 1) * gap_extend.
+    
+    Keyword arguments:
+    seq1       -- the first sequence.
+    seq2       -- the second sequence.
+    matrix     -- the substitution matrix, 1 for equal residues and -1
+                  otherwise by default. [optional]
+    gap_open   -- the score of the first residue of a gap. [optional]
+    gap_extend -- the score of every other residue of a gap. [optional]
+    linear     -- only keep a few rows of the DP matrices in memory. [optional]
+    """
+    return __affine_align(seq1, seq2, matrix, gap_open, gap_extend, False, linear)
+
+def affine_local_align(seq1, seq2, matrix=None, gap_open=-3, gap_extend=-1, linear=False):
+    """Locally aligns two sequences with affine gaps (Gotoh) and returns the
+    two optimal aligned substrings and their score.
+    
+    A gap of k residues scores gap_open + (k - 1) * gap_extend.
+    
+    Keyword arguments:
+    seq1       -- the first sequence.
+    seq2       -- the second sequence.
+    matrix     -- the substitution matrix, 1 for equal residues and -1
+                  otherwise by default. [optional]
+    gap_open   -- the score of the first residue of a gap. [optional]
+    gap_extend -- the score of every other residue of a gap. [optional]
+    linear     -- only keep a few rows of the DP matrices in memory. [optional]
+    """
+    return __affine_align(seq1, seq2, matrix, gap_open, gap_extend, True, linear)
+
+def affine_scores(seq, seqs, matrix=None, gap_open=-3, gap_extend=-1, local=False):
+    """Returns the affine gap alignment score of one sequence against each of
+    many, without tracing back.
+    
+    Up to BATCH sequences are scored at once, a single anti-diagonal of each
+    DP matrix kept at a time.
+    
+    Keyword arguments:
+    seq        -- the query sequence.
+    seqs       -- the target sequences.
+    matrix     -- the substitution matrix, 1 for equal residues and -1
+                  otherwise by default. [optional]
+    gap_open   -- the score of the first residue of a gap. [optional]
+    gap_extend -- the score of every other residue of a gap. [optional]
+    local      -- score local alignments. [optional]
     """
-    Prefix object for a similarity matrix.
+    __affine_check(gap_open, gap_extend)
+    
+    if matrix is None:
+        residues = set(seq)
+        for target in seqs:
+            residues |= set(target)
+        matrix = SubstitutionMatrix.identity("".join(sorted(residues)))
+    
+    query = matrix.encode(seq)
+    
+    scores = np.zeros(len(seqs), dtype=np.int64)
+    for start in range(0, len(seqs), BATCH):
+        targets = [matrix.encode(target) for target in seqs[start:start + BATCH]]
+        scores[start:start + len(targets)] = __affine_batch(query, targets, matrix.table,
+                                                            gap_open, gap_extend, local)
+    
+    return scores
+
+def __fill(seq1, seq2, matrix, gap, local):
+    """Fills the score and direction matrices, one anti-diagonal at a time.
+    
+    Diagonal moves score the substitution matrix entry of the two residues,
+    moves to the top or left score the gap. A move is only taken when it
+    scores strictly better than the other two, otherwise global alignments
+    move left and local alignments start over.
+    
+    Keyword arguments:
+    seq1   -- the first sequence.
+    seq2   -- the second sequence.
+    matrix -- the substitution matrix, or None.
+    gap    -- the score of a gap.
+    local  -- whether the alignment is local.
     """
+    rows = len(seq1) + 1
+    cols = len(seq2) + 1
+    
+    if matrix is None:
+        matrix = SubstitutionMatrix.identity("".join(sorted(set(seq1) | set(seq2))))
     
-    # Backpointer to the previous prefix.
-    prev = None
+    # Score of moving diagonally into each cell.
+    match = np.zeros((rows, cols), dtype=np.int64)
+    match[1:, 1:] = matrix.scores(seq1, seq2)
+    match = match.ravel()
     
-    # Score at the current prefix
-    score = 0
+    score = np.zeros((rows, cols), dtype=np.int64)
+    direction = np.zeros((rows, cols), dtype=np.int8)
     
-    # Sequence 1 modification at this prefix.
-    seq1 = " "
+    # Set the first column and row of global score values.
+    if not local:
+        score[:, 0] = np.arange(rows) * gap
+        score[0, :] = np.arange(cols) * gap
     
-    # Sequence 2 modification at this prefix.
-    seq2 = " "
+    score = score.ravel()
+    direction = direction.ravel()
+    
+    # Determine score using DP, unless there are no inner cells.
+    step = cols - 1
+    for d in range(2, rows + cols - 1 if step else 0):
+        # Flat positions of the first and last inner cells on this anti-diagonal.
+        first = d + max(1, d - step) * step
+        last = d + min(rows - 1, d - 1) * step
+        cell = slice(first, last + 1, step)
         
-    def __init__(self, score):
-        """
-        Initializes the score during vectorization.
+        # Find the previous top, diag, and left scores
+        top = score[first - cols:last - cols + 1:step] + gap
+        diag = score[first - cols - 1:last - cols:step] + match[cell]
+        left = score[first - 1:last:step] + gap
         
-        Key arguments:
-        score -- the score for this prefix.
-        """
-        self.score = score
+        is_top = (top > diag) & (top > left)
+        is_diag = (diag > top) & (diag > left)
+        
+        if local:
+            is_top &= top > 0
+            is_diag &= diag > 0
+            is_left = (left > top) & (left > diag) & (left > 0)
             
-def __cmp_init(seq1, seq2, v):
-    """Initializes a similarity matrix.
+            score[cell] = np.where(is_top, top, np.where(is_diag, diag, np.where(is_left, left, 0)))
+            direction[cell] = np.where(is_top, TOP, np.where(is_diag, DIAG, np.where(is_left, LEFT, NONE)))
+        else:
+            score[cell] = np.where(is_top, top, np.where(is_diag, diag, left))
+            direction[cell] = np.where(is_top, TOP, np.where(is_diag, DIAG, LEFT))
+    
+    return score.reshape(rows, cols), direction.reshape(rows, cols)
+
+def __traceback(seq1, seq2, direction, i, j):
+    """Rebuilds the aligned sequences ending at (i, j), with a space for
+    each gap.
     
     Keyword arguments:
-    seq1 -- the first sequence.
-    seq2 -- the second sequence.
-    v    -- multiple for the first row and column.
+    seq1      -- the first sequence.
+    seq2      -- the second sequence.
+    direction -- the direction matrix.
+    i         -- the row to start from.
+    j         -- the column to start from.
+    """
+    s1 = []
+    s2 = []
+    
+    while True:
+        d = direction.item(i, j)
+        if d == TOP:
+            s1.append(seq1[i - 1])
+            s2.append(" ")
+            i -= 1
+        elif d == DIAG:
+            s1.append(seq1[i - 1])
+            s2.append(seq2[j - 1])
+            i -= 1
+            j -= 1
+        elif d == LEFT:
+            s1.append(" ")
+            s2.append(seq2[j - 1])
+            j -= 1
+        else:
+            break
+    
+    return "".join(reversed(s1)), "".join(reversed(s2))
+
+def __affine_check(gap_open, gap_extend):
+    """Makes sure opening a gap doesn't score better than extending one.
+    
+    Keyword arguments:
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    """
+    if gap_open > gap_extend:
+        raise ValueError("Gap open score must not be higher than the gap extend score.")
+
+def __affine_align(seq1, seq2, matrix, gap_open, gap_extend, local, linear):
+    """Aligns two sequences with affine gaps.
+    
+    Keyword arguments:
+    seq1       -- the first sequence.
+    seq2       -- the second sequence.
+    matrix     -- the substitution matrix, or None.
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    local      -- whether the alignment is local.
+    linear     -- whether to only keep a few rows in memory.
+    """
+    __affine_check(gap_open, gap_extend)
+    
+    if matrix is None:
+        matrix = SubstitutionMatrix.identity("".join(sorted(set(seq1) | set(seq2))))
+    
+    # Substitution scores of each residue of the first sequence.
+    table = matrix.table[:, matrix.encode(seq2)]
+    codes = matrix.encode(seq1)
+    
+    first = __affine_init(len(seq2) + 1, gap_open, gap_extend, local)
+    rows = []
+    
+    # Find the cell to trace back from, keeping every row unless linear.
+    i, j = len(seq1), len(seq2)
+    best = first[0][-1]
+    if local:
+        i, j, best = 0, 0, 0
+    
+    prev = first
+    for row in range(1, len(seq1) + 1):
+        prev, directions = __affine_row(row, table[codes[row - 1]], prev, gap_open, gap_extend, local)
+        if not linear:
+            rows.append(directions)
+        
+        if local:
+            col = int(np.argmax(prev[0]))
+            if prev[0][col] > best:
+                i, j, best = row, col, prev[0][col]
+        elif row == len(seq1):
+            best = prev[0][-1]
+    
+    s1 = []
+    s2 = []
+    
+    if linear:
+        i, j, _, _ = __affine_linear_walk(seq1, seq2, table, codes, 0, first, i, j, MATCH,
+                                          gap_open, gap_extend, local, s1, s2)
+    else:
+        i, j, _, _ = __affine_walk(seq1, seq2, rows, 1, i, j, MATCH, 0, s1, s2)
+    
+    # Global alignments start with the rest of both sequences.
+    if not local:
+        while i > 0:
+            s1.append(seq1[i - 1])
+            s2.append(" ")
+            i -= 1
+        while j > 0:
+            s1.append(" ")
+            s2.append(seq2[j - 1])
+            j -= 1
+    
+    return "".join(reversed(s1)), "".join(reversed(s2)), int(best)
+
+def __affine_init(cols, gap_open, gap_extend, local):
+    """Returns the best scores ending in each state on the first row.
+    
+    Keyword arguments:
+    cols       -- number of columns.
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    local      -- whether the alignment is local.
+    """
+    match = np.zeros(cols, dtype=np.int64)
+    top = np.full(cols, NEG, dtype=np.int64)
+    left = np.full(cols, NEG, dtype=np.int64)
+    
+    if not local:
+        match[1:] = gap_open + np.arange(cols - 1) * gap_extend
+        left[1:] = match[1:]
+    
+    return match, top, left
+
+def __affine_row(i, row_score, prev, gap_open, gap_extend, local):
+    """Computes one row of the affine gap DP.
+    
+    The best score of a cell (match state) is the best of a diagonal move, a
+    gap in the second sequence (top state) or in the first one (left state).
+    Since opening a gap never scores better than extending one, a left gap
+    is opened after the best diagonal or top score of any cell before it,
+    which is a cumulative maximum over the row.
+    
+    Returns the scores of each state and the directions: the move of the
+    match state, and whether each gap state was just opened.
+    
+    Keyword arguments:
+    i          -- index of the row.
+    row_score  -- substitution scores of the residue of this row.
+    prev       -- scores of each state on the previous row.
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    local      -- whether the alignment is local.
+    """
+    prev_match, prev_top, prev_left = prev
+    cols = len(prev_match)
+    
+    # Gaps in the second sequence, from the previous row.
+    top = np.maximum(prev_top + gap_extend, prev_match + gap_open)
+    top_open = prev_match + gap_open >= prev_top + gap_extend
+    
+    diag = np.full(cols, NEG, dtype=np.int64)
+    diag[1:] = prev_match[:-1] + row_score
+    
+    # Best score without a left gap, the border starts the row.
+    best = np.maximum(diag, top)
+    best[0] = 0 if local else top[0]
+    if local:
+        best = np.maximum(best, 0)
+    
+    # Gaps in the first sequence, opened after any earlier cell of the row.
+    left = np.full(cols, NEG, dtype=np.int64)
+    steps = np.arange(cols) * gap_extend
+    left[1:] = steps[1:] + np.maximum.accumulate(best[:-1] + gap_open - gap_extend - steps[:-1])
+    
+    match = np.maximum(best, left)
+    match[0] = best[0]
+    
+    left_open = np.zeros(cols, dtype=bool)
+    left_open[1:] = match[:-1] + gap_open >= left[:-1] + gap_extend
+    
+    # Ties are broken diagonal, then top, then left.
+    direction = np.where(match == diag, DIAG, np.where(match == top, TOP, LEFT)).astype(np.int8)
+    direction[0] = NONE
+    if local:
+        direction[match == 0] = NONE
+    
+    return (match, top, left), (direction.tolist(), top_open.tolist(), left_open.tolist())
+
+def __affine_walk(seq1, seq2, rows, offset, i, j, state, stop, s1, s2):
+    """Follows the directions backwards from (i, j) in a state until
+    reaching the row stop or a cell without direction.
+    
+    The reversed residues are appended to s1 and s2. Returns the cell and
+    state the walk ended on, and whether it ended without direction.
+    
+    Keyword arguments:
+    seq1   -- the first sequence.
+    seq2   -- the second sequence.
+    rows   -- directions of each row.
+    offset -- row index of the first row in rows.
+    i      -- row to start from.
+    j      -- column to start from.
+    state  -- state to start from.
+    stop   -- row to stop at.
+    s1     -- reversed first aligned sequence.
+    s2     -- reversed second aligned sequence.
+    """
+    while i > stop:
+        direction, top_open, left_open = rows[i - offset]
+        if state == GAP_TOP:
+            s1.append(seq1[i - 1])
+            s2.append(" ")
+            if top_open[j]:
+                state = MATCH
+            i -= 1
+        elif state == GAP_LEFT:
+            s1.append(" ")
+            s2.append(seq2[j - 1])
+            if left_open[j]:
+                state = MATCH
+            j -= 1
+        else:
+            d = direction[j]
+            if d == DIAG:
+                s1.append(seq1[i - 1])
+                s2.append(seq2[j - 1])
+                i -= 1
+                j -= 1
+            elif d == TOP:
+                state = GAP_TOP
+            elif d == LEFT:
+                state = GAP_LEFT
+            else:
+                return i, j, state, True
+    
+    return i, j, state, False
+
+def __affine_linear_walk(seq1, seq2, table, codes, first, scores, last, j, state,
+                         gap_open, gap_extend, local, s1, s2):
+    """Traces back from (last, j) in a state to the row first.
+    
+    The rows are divided in half: the middle row is computed from the first
+    one, the bottom half is traced back down to the middle row, then the
+    top half from where the path entered it. Only blocks of at most
+    LINEAR_BLOCK cells of directions are kept at a time.
+    
+    Keyword arguments:
+    seq1       -- the first sequence.
+    seq2       -- the second sequence.
+    table      -- substitution scores of each residue against the second sequence.
+    codes      -- the encoded first sequence.
+    first      -- row to stop at.
+    scores     -- scores of each state on the row first.
+    last       -- row to start from.
+    j          -- column to start from.
+    state      -- state to start from.
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    local      -- whether the alignment is local.
+    s1         -- reversed first aligned sequence.
+    s2         -- reversed second aligned sequence.
     """
-    rows = len(seq1) + 1
     cols = len(seq2) + 1
     
-    # Build our score matrix.
-    score = np.zeros([rows, cols], dtype=np.int)
+    # Small enough to keep the directions of every row.
+    if (last - first) * cols <= LINEAR_BLOCK or last - first <= 1:
+        rows = []
+        for i in range(first + 1, last + 1):
+            scores, directions = __affine_row(i, table[codes[i - 1]], scores, gap_open, gap_extend, local)
+            rows.append(directions)
+        
+        return __affine_walk(seq1, seq2, rows, first + 1, last, j, state, first, s1, s2)
     
-    # Set the first column of score values.
-    for i in range(1, rows):
-        score[i][0] = i * v
+    # Compute the middle row.
+    middle = (first + last) // 2
+    middle_scores = scores
+    for i in range(first + 1, middle + 1):
+        middle_scores, _ = __affine_row(i, table[codes[i - 1]], middle_scores, gap_open, gap_extend, local)
     
-    # Set the first row of our score values.
-    for i in range(1, cols):
-        score[0][i] = i * v
+    # Bottom half, then the top half if the path didn't end early.
+    i, j, state, done = __affine_linear_walk(seq1, seq2, table, codes, middle, middle_scores, last, j, state,
+                                             gap_open, gap_extend, local, s1, s2)
+    if done:
+        return i, j, state, done
     
-    return (rows, cols), score
+    return __affine_linear_walk(seq1, seq2, table, codes, first, scores, middle, j, state,
+                                gap_open, gap_extend, local, s1, s2)
 
-def __p(a, b):
-    """Determines if two characters in a sequence are equivalent.
+def __affine_batch(query, targets, table, gap_open, gap_extend, local):
+    """Returns the affine gap alignment score of the encoded query against
+    each encoded target.
+    
+    The targets are padded to the same length. Each anti-diagonal of the DP
+    matrices is indexed by row and computed from the two previous ones for
+    every target at once. Padded cells never feed the cells of a target, so
+    its score is read on its own last column.
     
     Keyword arguments:
-    a -- the character in the first sequence.
-    b -- the character in the second sequence.
+    query      -- the encoded query.
+    targets    -- the encoded targets.
+    table      -- the substitution table.
+    gap_open   -- the score of the first residue of a gap.
+    gap_extend -- the score of every other residue of a gap.
+    local      -- whether the alignments are local.
     """
-    if (a == b):
-        return 1
+    count = len(targets)
+    rows = len(query) + 1
+    lengths = np.array([len(target) for target in targets], dtype=np.intp)
+    width = int(lengths.max()) if count else 0
+    
+    padded = np.zeros((count, max(1, width)), dtype=np.intp)
+    for t, target in enumerate(targets):
+        padded[t, :len(target)] = target
+    
+    scores = np.full(count, 0 if local else NEG, dtype=np.int64)
+    
+    # Scores of each state on the two previous anti-diagonals, by row.
+    match2 = np.full((count, rows), NEG, dtype=np.int64)
+    match1 = np.full((count, rows), NEG, dtype=np.int64)
+    top1 = np.full((count, rows), NEG, dtype=np.int64)
+    left1 = np.full((count, rows), NEG, dtype=np.int64)
+    
+    index = np.arange(rows)
+    for d in range(rows + width):
+        match = np.full((count, rows), NEG, dtype=np.int64)
+        top = np.full((count, rows), NEG, dtype=np.int64)
+        left = np.full((count, rows), NEG, dtype=np.int64)
+        
+        # Borders, a gap along the first row or column.
+        border = 0 if local or d == 0 else gap_open + (d - 1) * gap_extend
+        if d <= width:
+            match[:, 0] = border
+            if d and not local:
+                left[:, 0] = border
+        if 0 < d < rows:
+            match[:, d] = border
+            if not local:
+                top[:, d] = border
+        
+        # Inner cells (i, d - i).
+        i = index[max(1, d - width):min(rows - 1, d - 1) + 1]
+        if len(i):
+            j = d - i
+            
+            top[:, i] = np.maximum(top1[:, i - 1] + gap_extend, match1[:, i - 1] + gap_open)
+            left[:, i] = np.maximum(left1[:, i] + gap_extend, match1[:, i] + gap_open)
+            
+            diag = match2[:, i - 1] + table[query[i - 1][None, :], padded[:, j - 1]]
+            match[:, i] = np.maximum(np.maximum(diag, top[:, i]), left[:, i])
+            if local:
+                match[:, i] = np.maximum(match[:, i], 0)
+                inside = j[None, :] <= lengths[:, None]
+                scores = np.maximum(scores, np.where(inside, match[:, i], 0).max(axis=1))
+        
+        # Global scores end on the last row and column of each target.
+        if not local and d >= rows - 1:
+            done = lengths == d - (rows - 1)
+            scores[done] = match[done, rows - 1]
+        
+        match2, match1, top1, left1 = match1, match, top, left
     
-    return -1
\ No newline at end of file
+    return scores